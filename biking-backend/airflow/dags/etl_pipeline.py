@@ -2,6 +2,7 @@ from datetime import datetime, timedelta
 import os
 import sys
 import glob
+import time
 import shutil
 from airflow import DAG
 from airflow.operators.python import PythonOperator
@@ -10,9 +11,13 @@ from airflow.operators.python import PythonOperator
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(project_root)
 
-from etl.extract import extract_csv_data, extract_multiple_csvs
+from etl.extract import extract_csv_data, list_csv_files
 from etl.transform import transform_dataframe
-from etl.load import load_to_database, validate_database_connection
+from etl.load import load_chunks_to_database, get_pending_files, validate_database_connection
+from etl.pipeline import run_streaming_pipeline, run_parallel_pipeline
+from etl.staging import StageWriter, iter_stage, cleanup_run
+from etl.snapshot import write_snapshot
+from etl.metrics import etl_metrics, publish_task_metrics
 
 # Default arguments for the DAG
 # API: https://airflow.apache.org/docs/apache-airflow/1.10.3/_api/airflow/models/index.html
@@ -39,53 +44,80 @@ data_dir = os.path.join(project_root, 'data')
 # Define the processed directory path
 processed_dir = os.path.join(project_root, 'processed')
 
-def extract_task():
-    """Extract data from CSV files"""
+# How CSVs move through extract/transform/load:
+#   staged    - separate tasks handing Parquet files to each other (default)
+#   streaming - one task streaming chunks of ETL_CHUNK_SIZE rows
+#   parallel  - one task extracting/transforming files on ETL_WORKERS processes
+etl_mode = os.getenv('ETL_MODE', 'staged')
+
+# Whether to refresh the columnar trip snapshot read by the API's snapshot engine after loading
+snapshot_enabled = os.getenv('ETL_SNAPSHOT', 'true').lower() == 'true'
+
+@publish_task_metrics('extract_data')
+def extract_task(**context):
+    """Extract data from CSV files into the run's Parquet staging area"""
     try:
         
         # Create data directory if it doesn't exist
         os.makedirs(data_dir, exist_ok=True)
         
-        # Extract data from all CSV files in the data directory
-        dataframes = extract_multiple_csvs(data_dir)
-        
-        if dataframes is None or dataframes.empty:
-            print("No data extracted from CSV files")
+        # Files already in the ingestion ledger are skipped without being parsed
+        pending = get_pending_files(list_csv_files(data_dir))
+        if not pending:
+            print("No new CSV files to extract")
             return None
         
-        print(f"Successfully extracted data from {len(dataframes)} CSV files")
-        return dataframes
+        # Stage each CSV file as its own part so no combined frame is built
+        writer = StageWriter(context['run_id'], 'extract')
+        for fingerprint in pending:
+            started = time.perf_counter()
+            df = extract_csv_data(fingerprint['path'])
+            etl_metrics.record('extract', len(df), time.perf_counter() - started, bytes_read=fingerprint['size'])
+            writer.write(df, source=os.path.basename(fingerprint['path']), fingerprint=fingerprint)
+        
+        # Only the manifest (paths and row counts) goes through XCom
+        manifest = writer.manifest()
+        print(f"Successfully extracted {manifest['row_count']} records from {len(pending)} CSV files")
+        return manifest
     except Exception as e:
         print(f"Error in extract task: {str(e)}")
         raise
 
+@publish_task_metrics('transform_data')
 def transform_task(**context):
     """Transform the extracted data"""
     try:
-        # Get the dataframe from the previous task
-        df = context['task_instance'].xcom_pull(task_ids='extract_data')
+        # Get the staging manifest from the previous task
+        manifest = context['task_instance'].xcom_pull(task_ids='extract_data')
         
-        if df is None or df.empty:
+        if not manifest or not manifest['files']:
             print("No data to transform")
             return None
         
-        # Transform the data
-        transformed_df = transform_dataframe(df)
+        # Transform the staged parts one at a time
+        writer = StageWriter(context['run_id'], 'transform')
+        for part, df in zip(manifest['files'], iter_stage(manifest)):
+            started = time.perf_counter()
+            transformed = transform_dataframe(df)
+            etl_metrics.record('transform', len(transformed), time.perf_counter() - started)
+            writer.write(transformed, source=part['source'], fingerprint=part['fingerprint'])
         
-        print(f"Successfully transformed {len(transformed_df)} records")
-        return transformed_df
+        transformed_manifest = writer.manifest()
+        print(f"Successfully transformed {transformed_manifest['row_count']} records")
+        return transformed_manifest
         
     except Exception as e:
         print(f"Error in transform task: {str(e)}")
         raise
 
+@publish_task_metrics('load_data')
 def load_task(**context):
     """Load the transformed data into the database"""
     try:
-        # Get the transformed dataframe from the previous task
-        df = context['task_instance'].xcom_pull(task_ids='transform_data')
+        # Get the staging manifest from the previous task
+        manifest = context['task_instance'].xcom_pull(task_ids='transform_data')
         
-        if df is None or df.empty:
+        if not manifest or not manifest['files']:
             print("No data to load")
             return
         
@@ -93,19 +125,65 @@ def load_task(**context):
         if not validate_database_connection():
             raise Exception("Database connection validation failed")
         
-        # Load data to database
-        success = load_to_database(df, clear_existing=False)
+        # Each file's rows are committed together with its ledger entry
+        # (bulk COPY unless ETL_LOAD_METHOD overrides it)
+        loaded = 0
+        for part, df in zip(manifest['files'], iter_stage(manifest)):
+            loaded += load_chunks_to_database([df], clear_existing=False, fingerprint=part['fingerprint'])
         
-        if success:
-            print("Successfully loaded data into database")
-        else:
-            raise Exception("Failed to load data into database")
+        print(f"Successfully loaded {loaded} records into database")
         
     except Exception as e:
         print(f"Error in load task: {str(e)}")
         raise
 
-def move_to_processed_task():
+@publish_task_metrics('stream_etl')
+def stream_etl_task():
+    """Extract, transform and load the CSV files chunk by chunk"""
+    try:
+        os.makedirs(data_dir, exist_ok=True)
+
+        if not validate_database_connection():
+            raise Exception("Database connection validation failed")
+
+        loaded = run_streaming_pipeline(data_dir, clear_existing=False)
+        print(f"Successfully streamed {loaded} records into database")
+
+    except Exception as e:
+        print(f"Error in streaming ETL task: {str(e)}")
+        raise
+
+@publish_task_metrics('parallel_etl')
+def parallel_etl_task():
+    """Extract and transform the CSV files on a process pool and load them as they finish"""
+    try:
+        os.makedirs(data_dir, exist_ok=True)
+
+        if not validate_database_connection():
+            raise Exception("Database connection validation failed")
+
+        loaded = run_parallel_pipeline(data_dir, clear_existing=False)
+        print(f"Successfully loaded {loaded} records into database")
+
+    except Exception as e:
+        print(f"Error in parallel ETL task: {str(e)}")
+        raise
+
+@publish_task_metrics('write_snapshot')
+def snapshot_task():
+    """Write a columnar snapshot of bike_trips for the API when the loaded data changed"""
+    try:
+        started = time.perf_counter()
+        manifest = write_snapshot()
+        etl_metrics.record('snapshot', manifest['rows'], time.perf_counter() - started)
+        print(f"Trip snapshot {manifest['path']} holds {manifest['rows']} records at version {manifest['version']}")
+
+    except Exception as e:
+        print(f"Error writing trip snapshot: {str(e)}")
+        raise
+
+@publish_task_metrics('move_to_processed')
+def move_to_processed_task(**context):
     """Move CSV files from data directory to processed directory"""
     try:
         # Create processed directory if it doesn't exist
@@ -126,11 +204,17 @@ def move_to_processed_task():
         for csv_file in csv_files:
             filename = os.path.basename(csv_file)
             dest_path = os.path.join(processed_dir, filename)
+            size = os.path.getsize(csv_file)
+            started = time.perf_counter()
             shutil.move(csv_file, dest_path)
+            etl_metrics.record('move', 0, time.perf_counter() - started, bytes_read=size)
             moved_count += 1
             print(f"Moved {filename} to {processed_dir}")
         
         print(f"Successfully moved {moved_count} CSV file(s) to {processed_dir}")
+
+        # The run's staged Parquet files are no longer needed
+        cleanup_run(context['run_id'])
         
     except Exception as e:
         print(f"Error moving files to processed directory: {str(e)}")
@@ -143,30 +227,61 @@ validate_db = PythonOperator(
     dag=dag,
 )
 
-extract_data = PythonOperator(
-    task_id='extract_data',
-    python_callable=extract_task,
-    dag=dag,
-)
-
-transform_data = PythonOperator(
-    task_id='transform_data',
-    python_callable=transform_task,
-    dag=dag,
-)
-
-load_data = PythonOperator(
-    task_id='load_data',
-    python_callable=load_task,
-    dag=dag,
-)
-
 move_to_processed = PythonOperator(
     task_id='move_to_processed',
     python_callable=move_to_processed_task,
     dag=dag,
 )
 
+def with_snapshot(load):
+    """Chain the snapshot task after a load task when ETL_SNAPSHOT is enabled"""
+    if not snapshot_enabled:
+        return load
+    write_trip_snapshot = PythonOperator(
+        task_id='write_snapshot',
+        python_callable=snapshot_task,
+        dag=dag,
+    )
+    load >> write_trip_snapshot
+    return write_trip_snapshot
+
 # Define task dependencies
-validate_db >> extract_data >> transform_data >> load_data >> move_to_processed
+if etl_mode == 'streaming':
+    stream_etl = PythonOperator(
+        task_id='stream_etl',
+        python_callable=stream_etl_task,
+        dag=dag,
+    )
+
+    validate_db >> stream_etl
+    with_snapshot(stream_etl) >> move_to_processed
+elif etl_mode == 'parallel':
+    parallel_etl = PythonOperator(
+        task_id='parallel_etl',
+        python_callable=parallel_etl_task,
+        dag=dag,
+    )
+
+    validate_db >> parallel_etl
+    with_snapshot(parallel_etl) >> move_to_processed
+else:
+    extract_data = PythonOperator(
+        task_id='extract_data',
+        python_callable=extract_task,
+        dag=dag,
+    )
+
+    transform_data = PythonOperator(
+        task_id='transform_data',
+        python_callable=transform_task,
+        dag=dag,
+    )
+
+    load_data = PythonOperator(
+        task_id='load_data',
+        python_callable=load_task,
+        dag=dag,
+    )
 
+    validate_db >> extract_data >> transform_data >> load_data
+    with_snapshot(load_data) >> move_to_processed
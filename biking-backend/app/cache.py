@@ -0,0 +1,75 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+# Maximum number of cached responses kept per API process
+CACHE_MAX_ENTRIES = int(os.getenv("STATS_CACHE_MAX_ENTRIES", "256"))
+
+# Seconds a dataset version read from the database is reused before re-checking
+CACHE_VERSION_TTL = float(os.getenv("STATS_CACHE_VERSION_TTL", "1.0"))
+
+
+class ResponseCache:
+    """
+    In-process LRU cache of stats payloads. Entries are keyed by request key
+    and dataset version, so a version bump by the ETL loader makes every
+    older entry unreachable; those are then evicted as new entries arrive.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, version_ttl: float = CACHE_VERSION_TTL):
+        self.max_entries = max_entries
+        self.version_ttl = version_ttl
+        # Keyed by (key, dataset version)
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version: Optional[int] = None
+        self._version_checked_at = 0.0
+
+    async def dataset_version(self, load_version: Callable[[], Awaitable[int]]) -> int:
+        """Return the current dataset version, re-reading it at most every version_ttl seconds"""
+        if self._version is None or time.monotonic() - self._version_checked_at >= self.version_ttl:
+            self._version = await load_version()
+            self._version_checked_at = time.monotonic()
+        return self._version
+
+    def get(self, key: Hashable, version: int) -> Optional[Any]:
+        """Return the cached payload for key at version, or None"""
+        with self._lock:
+            entry = self._entries.get((key, version))
+            if entry is not None:
+                self._entries.move_to_end((key, version))
+            return entry
+
+    def set(self, key: Hashable, version: int, payload: Any) -> None:
+        """Store a payload, evicting the least recently used entries beyond max_entries"""
+        with self._lock:
+            self._entries[(key, version)] = payload
+            self._entries.move_to_end((key, version))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop every cached entry"""
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+
+
+def make_etag(key: Hashable, version: int) -> str:
+    """Build the ETag of a cached response from its request key and dataset version"""
+    digest = hashlib.sha1(repr(key).encode()).hexdigest()[:12]
+    return f'"v{version}-{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag (proxies may add W/)"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+stats_cache = ResponseCache()
@@ -0,0 +1,81 @@
+import os
+import asyncio
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+# Maximum number of distinct aggregate computations running at once per endpoint
+STATS_MAX_CONCURRENCY = int(os.getenv("STATS_MAX_CONCURRENCY", "4"))
+
+# Seconds clients are told to wait before retrying a rejected request
+STATS_RETRY_AFTER = int(os.getenv("STATS_RETRY_AFTER", "1"))
+
+
+class ConcurrencyLimitExceeded(Exception):
+    """Raised when an endpoint already runs its maximum number of computations"""
+
+    def __init__(self, endpoint: str, retry_after: int):
+        super().__init__(f"Too many concurrent {endpoint} computations")
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical computations: the first caller for a key
+    runs it and every caller arriving before it finishes awaits the same
+    result (or exception) instead of issuing its own query.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.coalesced: Counter = Counter()
+
+    async def do(self, endpoint: str, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Run compute for key, or join the computation already in flight for it"""
+        call = self._calls.get(key)
+        if call is not None:
+            self.coalesced[endpoint] += 1
+            return await asyncio.shield(call)
+
+        call = asyncio.ensure_future(compute())
+        self._calls[key] = call
+        call.add_done_callback(lambda done: self._forget(key, done))
+        # Shielded so a disconnecting first caller does not cancel the others
+        return await asyncio.shield(call)
+
+    def _forget(self, key: Hashable, call: asyncio.Future) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def in_flight(self) -> int:
+        """Number of computations currently running"""
+        return len(self._calls)
+
+
+class ConcurrencyLimiter:
+    """
+    Caps concurrent computations per endpoint. Requests over the cap are
+    rejected immediately rather than queued behind the database.
+    """
+
+    def __init__(self, max_concurrent: int = STATS_MAX_CONCURRENCY, retry_after: int = STATS_RETRY_AFTER):
+        self.max_concurrent = max_concurrent
+        self.retry_after = retry_after
+        self.active: Counter = Counter()
+        self.rejected: Counter = Counter()
+
+    async def run(self, endpoint: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Run compute if endpoint is below its cap, else raise ConcurrencyLimitExceeded"""
+        if self.active[endpoint] >= self.max_concurrent:
+            self.rejected[endpoint] += 1
+            raise ConcurrencyLimitExceeded(endpoint, self.retry_after)
+
+        self.active[endpoint] += 1
+        try:
+            return await compute()
+        finally:
+            self.active[endpoint] -= 1
+
+
+stats_flight = SingleFlight()
+stats_limiter = ConcurrencyLimiter()
@@ -1,30 +1,235 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc, select, case
+import os
+import asyncio
+from datetime import date, datetime
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, desc, select, delete, case, text, or_, tuple_, union_all, Integer, BigInteger
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import aliased
 import models, schemas
-from typing import List, Optional
+from snapshot import TripSnapshot, trip_snapshots
+from sketches import TDigest, HyperLogLog
+from typing import AsyncIterator, List, Optional
 
-def create_record(db: Session, record: schemas.BikeTripCreate):
-    """Create a new data record"""
-    db_record = models.BikeTrip(**record.dict())
+async def upsert_station(db: AsyncSession, station_id: int, name: Optional[str],
+                         latitude: Optional[float], longitude: Optional[float], last_seen: datetime):
+    """Insert or update one station within the current transaction, unless it was last seen on a later trip"""
+    stmt = insert(models.Station).values(id=station_id, name=name, latitude=latitude, longitude=longitude,
+                                         last_seen=last_seen)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.Station.id],
+        set_={"name": stmt.excluded.name, "latitude": stmt.excluded.latitude,
+              "longitude": stmt.excluded.longitude, "last_seen": stmt.excluded.last_seen,
+              "updated_at": func.now()},
+        where=or_(models.Station.last_seen.is_(None), stmt.excluded.last_seen >= models.Station.last_seen),
+    )
+    await db.execute(stmt)
+
+async def create_record(db: AsyncSession, record: schemas.BikeTripCreate):
+    """Create a new data record, storing its stations in the stations dimension"""
+    data = record.dict()
+    for prefix in ("start", "end"):
+        station = {attribute: data.pop(f"{prefix}_station_{attribute}") for attribute in ("name", "latitude", "longitude")}
+        if data[f"{prefix}_station_id"] is not None:
+            await upsert_station(db, data[f"{prefix}_station_id"], **station, last_seen=data["start_time"])
+
+    db_record = models.BikeTrip(**data)
     db.add(db_record)
-    db.commit()
-    db.refresh(db_record)
-    return db_record
+    await db.commit()
+    return await db.get(models.BikeTripDetail, (db_record.id, db_record.start_time))
 
-def get_top_records(db: Session, n: int = 10):
+async def get_top_records(db: AsyncSession, n: int = 10):
     """Get top N records ordered by start time"""
-    return db.query(models.BikeTrip).order_by(models.BikeTrip.start_time).limit(n).all()
+    result = await db.execute(select(models.BikeTripDetail).order_by(models.BikeTripDetail.start_time).limit(n))
+    return result.scalars().all()
+
+# Columns of bike_trips_detailed in the order schemas.BikeTrip serializes them
+TRIP_COLUMNS = [models.BikeTripDetail.__table__.c[name] for name in schemas.BikeTrip.model_fields]
+
+async def get_top_rows(db: AsyncSession, n: int = 10):
+    """Get top N records ordered by start time as plain row tuples, without ORM instances"""
+    stmt = select(*TRIP_COLUMNS).order_by(models.BikeTripDetail.start_time).limit(n)
+    return (await db.execute(stmt)).all()
+
+def trip_filter_clauses(filters: Optional[schemas.TripFilters], source=models.BikeTrip) -> list:
+    """
+    Build WHERE clauses on bike_trips (or the bike_trips_detailed view) for
+    the requested filters. Time bounds compare start_time directly so they
+    prune monthly partitions and can use the start_time indexes; a station
+    matches trips starting or ending there.
+    """
+    if filters is None:
+        return []
+
+    clauses = []
+    if filters.start is not None:
+        clauses.append(source.start_time >= filters.start)
+    if filters.end is not None:
+        clauses.append(source.start_time < filters.end)
+    if filters.station_id is not None:
+        clauses.append(or_(
+            source.start_station_id == filters.station_id,
+            source.end_station_id == filters.station_id
+        ))
+    if filters.user_type is not None:
+        clauses.append(source.user_type == filters.user_type)
+    if filters.gender is not None:
+        clauses.append(source.gender == filters.gender)
+    return clauses
+
+# Columns of bike_trips_detailed included in exports, in view order
+EXPORT_COLUMNS = [
+    column for column in models.BikeTripDetail.__table__.columns
+    if column.name not in ("created_at", "updated_at")
+]
+
+async def iter_trip_batches(db: AsyncSession, filters: Optional[schemas.TripFilters] = None,
+                            batch_size: int = 5000, page_size: int = 50000,
+                            limit: Optional[int] = None) -> AsyncIterator[list]:
+    """
+    Yield the trips matching filters in (start_time, id) order as lists of
+    row tuples. Pages are fetched by keyset on (start_time, id), each read
+    through a server-side cursor in batches, so memory stays at one batch
+    and no query or transaction lasts longer than one page.
+    """
+    trip = models.BikeTripDetail
+    clauses = trip_filter_clauses(filters, trip)
+    remaining = limit
+    last = None
+
+    while remaining is None or remaining > 0:
+        page_limit = page_size if remaining is None else min(page_size, remaining)
+        stmt = select(*EXPORT_COLUMNS).where(*clauses)
+        if last is not None:
+            stmt = stmt.where(tuple_(trip.start_time, trip.id) > tuple_(*last))
+        stmt = stmt.order_by(trip.start_time, trip.id).limit(page_limit)
+
+        fetched = 0
+        result = await db.stream(stmt)
+        async for batch in result.partitions(batch_size):
+            fetched += len(batch)
+            last = (batch[-1].start_time, batch[-1].id)
+            yield batch
+        await result.close()
+        # End the read transaction so a slow client does not hold it open between pages
+        await db.commit()
+
+        if remaining is not None:
+            remaining -= fetched
+        if fetched < page_limit:
+            break
+
+async def get_count_stats(db: AsyncSession, mode: Optional[str] = None,
+                          filters: Optional[schemas.TripFilters] = None):
+    """
+    Get count statistics using the given mode (defaults to COUNT_MODE). The
+    estimate and maintained modes fall back to an exact count while their
+    metadata is unavailable or when filters are given, the snapshot mode
+    while no snapshot of the current data exists; the returned mode says
+    which one answered.
+    """
+    mode = mode or COUNT_MODE
+    if mode not in COUNT_MODES:
+        raise ValueError(f"Unknown count mode: {mode}")
+
+    if mode == "snapshot":
+        total_records = await count_snapshot(db, filters)
+    else:
+        total_records = None if trip_filter_clauses(filters) else await COUNT_MODES[mode](db)
+    if total_records is None:
+        mode = "exact"
+        total_records = await count_exact(db, filters)
 
-def get_count_stats(db: Session):
-    """Get count statistics"""
-    total_records = db.query(models.BikeTrip).count()
-    
     return {
-        "total_records": total_records
+        "total_records": total_records,
+        "mode": mode
     }
 
-def get_trip_hourrange_stats(db: Session):
-    """Get trip hour range statistics"""
+async def count_exact(db: AsyncSession, filters: Optional[schemas.TripFilters] = None) -> int:
+    """Count the bike_trips rows matching filters"""
+    stmt = select(func.count()).select_from(models.BikeTrip).where(*trip_filter_clauses(filters))
+    return (await db.execute(stmt)).scalar_one()
+
+async def count_estimate(db: AsyncSession) -> Optional[int]:
+    """Read the planner's row estimate of bike_trips and its partitions, None if never analyzed"""
+    stmt = text("""
+        SELECT sum(c.reltuples) FILTER (WHERE c.reltuples >= 0)
+        FROM pg_class c
+        WHERE c.oid = to_regclass(:table)
+           OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = to_regclass(:table))
+    """)
+    estimate = (await db.execute(stmt, {"table": models.BikeTrip.__tablename__})).scalar()
+    return None if estimate is None else int(estimate)
+
+async def count_maintained(db: AsyncSession) -> Optional[int]:
+    """Read the bike_trips row count kept up to date by the ETL loader, None if never written"""
+    stmt = select(models.TableRowCount.row_count).where(
+        models.TableRowCount.table_name == models.BikeTrip.__tablename__
+    )
+    return (await db.execute(stmt)).scalar()
+
+async def current_snapshot(db: AsyncSession) -> Optional[TripSnapshot]:
+    """Get the trip snapshot written by the ETL if it holds the current dataset version, else None"""
+    snapshot = trip_snapshots.current()
+    if snapshot is None or snapshot.version != await get_dataset_version(db):
+        return None
+    return snapshot
+
+async def count_snapshot(db: AsyncSession, filters: Optional[schemas.TripFilters] = None) -> Optional[int]:
+    """Count the trips matching filters in the current trip snapshot, None without one"""
+    snapshot = await current_snapshot(db)
+    if snapshot is None:
+        return None
+    return await asyncio.to_thread(snapshot.count, filters)
+
+# Ways of answering /count, selectable per request or via COUNT_MODE
+COUNT_MODES = {
+    "exact": count_exact,
+    "estimate": count_estimate,
+    "maintained": count_maintained,
+    "snapshot": count_snapshot,
+}
+COUNT_MODE = os.getenv("COUNT_MODE", "maintained")
+
+async def get_trip_hourrange_stats(db: AsyncSession, engine: Optional[str] = None,
+                                   filters: Optional[schemas.TripFilters] = None):
+    """
+    Get trip hour range statistics using the given engine (defaults to
+    HOUR_RANGE_ENGINE). The rollup only holds totals, so filtered requests
+    are answered by the arithmetic engine instead.
+    """
+    engine = engine or HOUR_RANGE_ENGINE
+    if engine not in HOUR_RANGE_ENGINES:
+        raise ValueError(f"Unknown hour range engine: {engine}")
+
+    if engine == "rollup":
+        if not trip_filter_clauses(filters):
+            return await get_trip_hourrange_stats_rollup(db)
+        engine = "arithmetic"
+    return await HOUR_RANGE_ENGINES[engine](db, filters)
+
+async def get_trip_hourrange_stats_rollup(db: AsyncSession):
+    """Get trip hour range statistics from the hourly rollup maintained by the ETL loader"""
+    bucket_hour = func.extract("hour", models.TripHourRollup.bucket_start).cast(Integer).label("bucket_hour")
+
+    stmt = (
+        select(
+            bucket_hour,
+            func.sum(models.TripHourRollup.ride_count).cast(BigInteger).label("ride_count")
+        )
+        .where(models.TripHourRollup.ride_count > 0)
+        .group_by(bucket_hour)
+        .order_by(bucket_hour)
+    )
+    rows = (await db.execute(stmt)).all()
+
+    return {
+        "hour_bucket": [row.bucket_hour for row in rows],
+        "count": [row.ride_count for row in rows]
+    }
+
+async def get_trip_hourrange_stats_full_scan(db: AsyncSession, filters: Optional[schemas.TripFilters] = None):
+    """Get trip hour range statistics by scanning every trip in bike_trips matching filters"""
     rides_cte = (
         select(
             models.BikeTrip.id,
@@ -33,6 +238,7 @@ def get_trip_hourrange_stats(db: Session):
             func.date_trunc('hour', models.BikeTrip.start_time).label("start_hour"),
             func.tsrange(models.BikeTrip.start_time, models.BikeTrip.stop_time, "[)").label("ride_range")
         )
+        .where(*trip_filter_clauses(filters))
         .cte("rides")
     )
 
@@ -76,40 +282,131 @@ def get_trip_hourrange_stats(db: Session):
         .group_by(bucket_cte.c.bucket_hour)
         .order_by(bucket_cte.c.bucket_hour)
     )
-    rows = db.execute(stmt).all()
+    rows = (await db.execute(stmt)).all()
 
     return {
         "hour_bucket": [row.bucket_hour for row in rows],
         "count": [row.ride_count for row in rows]
     }
 
-def get_trip_duration_stats(db: Session):
-    """Get trip duration statistics"""
+async def get_trip_hourrange_stats_arithmetic(db: AsyncSession, filters: Optional[schemas.TripFilters] = None):
+    """
+    Get trip hour range statistics in closed form. A trip covers the run of
+    consecutive hour buckets starting at its start hour, one per hour
+    boundary it reaches (at most 24), so one scan grouping trips by
+    (start hour, bucket count) is enough; the at most 24 x 24 groups are
+    then spread over the hours of the day with a difference array.
+    """
+    start_hour = func.date_trunc('hour', models.BikeTrip.start_time)
+    span_hours = func.least(
+        func.ceil(func.extract("epoch", models.BikeTrip.stop_time - start_hour) / 3600),
+        24
+    ).cast(Integer).label("span_hours")
+    start_hour_of_day = func.extract("hour", models.BikeTrip.start_time).cast(Integer).label("start_hour")
+
+    stmt = (
+        select(start_hour_of_day, span_hours, func.count().label("ride_count"))
+        .where(models.BikeTrip.stop_time > models.BikeTrip.start_time, *trip_filter_clauses(filters))
+        .group_by(start_hour_of_day, span_hours)
+    )
+    rows = (await db.execute(stmt)).all()
+
+    # Each group adds ride_count to hours [start_hour, start_hour + span_hours)
+    # on a doubled 48-hour axis, which is then folded back onto 0-23
+    diff = np.zeros(49, dtype=np.int64)
+    if rows:
+        starts = np.array([row.start_hour for row in rows])
+        spans = np.array([row.span_hours for row in rows])
+        counts = np.array([row.ride_count for row in rows], dtype=np.int64)
+        np.add.at(diff, starts, counts)
+        np.add.at(diff, starts + spans, -counts)
+    totals = np.cumsum(diff[:48])
+    by_hour = totals[:24] + totals[24:]
+
+    hours = [hour for hour in range(24) if by_hour[hour] > 0]
+    return {
+        "hour_bucket": hours,
+        "count": [int(by_hour[hour]) for hour in hours]
+    }
+
+
+async def get_trip_hourrange_stats_snapshot(db: AsyncSession, filters: Optional[schemas.TripFilters] = None):
+    """
+    Get trip hour range statistics from the current trip snapshot with the
+    arithmetic engine's grouping, falling back to that engine without one
+    """
+    snapshot = await current_snapshot(db)
+    if snapshot is None:
+        return await get_trip_hourrange_stats_arithmetic(db, filters)
+
+    groups = await asyncio.to_thread(snapshot.hour_span_counts, filters)
+
+    # Spread each (start hour, span) group over the hours it covers, as in
+    # get_trip_hourrange_stats_arithmetic
+    diff = np.zeros(49, dtype=np.int64)
+    starts, spans = np.nonzero(groups)
+    counts = groups[starts, spans]
+    np.add.at(diff, starts, counts)
+    np.add.at(diff, starts + spans, -counts)
+    totals = np.cumsum(diff[:48])
+    by_hour = totals[:24] + totals[24:]
+
+    hours = [hour for hour in range(24) if by_hour[hour] > 0]
+    return {
+        "hour_bucket": hours,
+        "count": [int(by_hour[hour]) for hour in hours]
+    }
+
+# Implementations of the hour range statistic, selectable per request or via HOUR_RANGE_ENGINE
+HOUR_RANGE_ENGINES = {
+    "rollup": get_trip_hourrange_stats_rollup,
+    "arithmetic": get_trip_hourrange_stats_arithmetic,
+    "scan": get_trip_hourrange_stats_full_scan,
+    "snapshot": get_trip_hourrange_stats_snapshot,
+}
+HOUR_RANGE_ENGINE = os.getenv("HOUR_RANGE_ENGINE", "rollup")
+
+# Trip duration bins as (upper bound in hours, label) in display order;
+# longer trips fall into LONGEST_DURATION_BIN
+DURATION_BINS = [
+    # 0–2 hours → 30-min bins
+    (0.5, "< 30 minutes"),
+    (1, "30 minutes - 1 hour"),
+    (1.5, "1-1.5 hours"),
+    (2, "1.5-2 hours"),
+
+    # 2–6 hours → 1-hour bins
+    (3, "2-3 hours"),
+    (4, "3-4 hours"),
+    (5, "4-5 hours"),
+    (6, "5-6 hours"),
+
+    # 6–24 hours → 6-hour bins
+    (12, "6-12 hours"),
+    (18, "12-18 hours"),
+    (24, "18-24 hours"),
+
+    # 1–3 days → 1-day bins
+    (48, "1-2 days"),
+    (72, "2-3 days"),
+]
+LONGEST_DURATION_BIN = ">= 3 days"
+
+async def get_trip_duration_stats(db: AsyncSession, engine: Optional[str] = None,
+                                  filters: Optional[schemas.TripFilters] = None):
+    """Get trip duration statistics using the given engine (defaults to DURATION_ENGINE)"""
+    engine = engine or DURATION_ENGINE
+    if engine not in DURATION_ENGINES:
+        raise ValueError(f"Unknown trip duration engine: {engine}")
+    return await DURATION_ENGINES[engine](db, filters)
+
+async def get_trip_duration_stats_sql(db: AsyncSession, filters: Optional[schemas.TripFilters] = None):
+    """Get trip duration statistics of the trips matching filters"""
     hours = models.BikeTrip.tripduration / 3600.0
 
     bin_label = case(
-        # 0–2 hours → 30-min bins (0.25 h)
-        (hours < 0.5, "< 30 minutes"),
-        (hours < 1, "30 minutes - 1 hour"),
-        (hours < 1.5, "1-1.5 hours"),
-        (hours < 2, "1.5-2 hours"),
-
-        # 2–6 hours → 1-hour bins
-        (hours < 3, "2-3 hours"),
-        (hours < 4, "3-4 hours"),
-        (hours < 5, "4-5 hours"),
-        (hours < 6, "5-6 hours"),
-
-        # 6–24 hours → 6-hour bins
-        (hours < 12, "6-12 hours"),
-        (hours < 18, "12-18 hours"),
-        (hours < 24, "18-24 hours"),
-
-        # 1–3 days → 1-day bins
-        (hours < 48, "1-2 days"),
-        (hours < 72, "2-3 days"),
-
-        else_=">= 3 days"
+        *[(hours < upper, label) for upper, label in DURATION_BINS],
+        else_=LONGEST_DURATION_BIN
     ).label("duration_bin")
 
     stmt = (
@@ -117,30 +414,15 @@ def get_trip_duration_stats(db: Session):
             bin_label,
             func.count().label("count")
         )
+        .where(*trip_filter_clauses(filters))
         .group_by(bin_label)
     )
 
-    rows = db.execute(stmt).all()
-
-    # Define the order based on case statement order (logical duration order)
-    bin_order = {
-        "< 30 minutes": 0,
-        "30 minutes - 1 hour": 1,
-        "1-1.5 hours": 2,
-        "1.5-2 hours": 3,
-        "2-3 hours": 4,
-        "3-4 hours": 5,
-        "4-5 hours": 6,
-        "5-6 hours": 7,
-        "6-12 hours": 8,
-        "12-18 hours": 9,
-        "18-24 hours": 10,
-        "1-2 days": 11,
-        "2-3 days": 12,
-        ">= 3 days": 13
-    }
+    rows = (await db.execute(stmt)).all()
 
-    # Sort by the case statement order
+    # Sort by the bin order (logical duration order)
+    bin_order = {label: i for i, (_, label) in enumerate(DURATION_BINS)}
+    bin_order[LONGEST_DURATION_BIN] = len(DURATION_BINS)
     sorted_rows = sorted(rows, key=lambda row: bin_order.get(row.duration_bin, 999))
 
     return {
@@ -148,8 +430,238 @@ def get_trip_duration_stats(db: Session):
         "count": [row.count for row in sorted_rows]
     }
 
-def delete_all_records(db: Session):
+async def get_trip_duration_stats_snapshot(db: AsyncSession, filters: Optional[schemas.TripFilters] = None):
+    """Get trip duration statistics from the current trip snapshot, falling back to SQL without one"""
+    snapshot = await current_snapshot(db)
+    if snapshot is None:
+        return await get_trip_duration_stats_sql(db, filters)
+
+    edges = [int(upper * 3600) for upper, _ in DURATION_BINS]
+    counts = await asyncio.to_thread(snapshot.duration_histogram, edges, filters)
+    labels = [label for _, label in DURATION_BINS] + [LONGEST_DURATION_BIN]
+    present = [i for i, count in enumerate(counts) if count > 0]
+    return {
+        "hours": [labels[i] for i in present],
+        "count": [int(counts[i]) for i in present]
+    }
+
+# Implementations of the trip duration statistic, selectable per request or via DURATION_ENGINE
+DURATION_ENGINES = {
+    "sql": get_trip_duration_stats_sql,
+    "snapshot": get_trip_duration_stats_snapshot,
+}
+DURATION_ENGINE = os.getenv("DURATION_ENGINE", "sql")
+
+def day_clauses(day_column, start: Optional[date], end: Optional[date]) -> list:
+    """Restrict a per-day rollup or sketch table to the days in [start, end)"""
+    clauses = []
+    if start is not None:
+        clauses.append(day_column >= start)
+    if end is not None:
+        clauses.append(day_column < end)
+    return clauses
+
+# Station columns counted by get_top_stations for each ranking
+TOP_STATION_RANKINGS = ("start", "end", "both")
+
+async def get_top_stations(db: AsyncSession, k: int = 10, by: str = "start",
+                           start: Optional[date] = None, end: Optional[date] = None):
+    """
+    Get the k stations with the most trips starting there (by=start), ending
+    there (by=end) or either (by=both) between the start and end days, read
+    from station_pair_day_rollup
+    """
+    rollup = models.StationPairDayRollup
+    clauses = day_clauses(rollup.day, start, end)
+    sides = [rollup.start_station_id, rollup.end_station_id]
+    if by == "start":
+        sides = sides[:1]
+    elif by == "end":
+        sides = sides[1:]
+
+    per_side = union_all(*[
+        select(side.label("station_id"), func.sum(rollup.trip_count).label("trip_count"))
+        .where(*clauses)
+        .group_by(side)
+        for side in sides
+    ]).subquery()
+    counts = (
+        select(per_side.c.station_id, func.sum(per_side.c.trip_count).label("trip_count"))
+        .group_by(per_side.c.station_id)
+        .order_by(desc("trip_count"), per_side.c.station_id)
+        .limit(k)
+        .subquery()
+    )
+    station = models.Station
+    stmt = (
+        select(counts.c.station_id, station.name, station.latitude, station.longitude, counts.c.trip_count)
+        .outerjoin(station, station.id == counts.c.station_id)
+        .order_by(desc(counts.c.trip_count), counts.c.station_id)
+    )
+    rows = (await db.execute(stmt)).all()
+    return [
+        {"station_id": row.station_id, "name": row.name, "latitude": row.latitude,
+         "longitude": row.longitude, "trip_count": int(row.trip_count)}
+        for row in rows
+    ]
+
+async def get_od_matrix(db: AsyncSession, start: Optional[date] = None, end: Optional[date] = None,
+                        station_id: Optional[int] = None, min_trips: int = 1, limit: int = 1000):
+    """
+    Get the origin-destination matrix between the start and end days as a
+    sparse list of (start station, end station, trips) entries, busiest
+    first, read from station_pair_day_rollup. With station_id only flows
+    from or to that station are included. Pairs and trips are totals over
+    all entries that pass min_trips, including those cut off by limit.
+    """
+    rollup = models.StationPairDayRollup
+    clauses = day_clauses(rollup.day, start, end)
+    if station_id is not None:
+        clauses.append(or_(rollup.start_station_id == station_id, rollup.end_station_id == station_id))
+
+    trip_count = func.sum(rollup.trip_count)
+    pairs = (
+        select(
+            rollup.start_station_id,
+            rollup.end_station_id,
+            trip_count.label("trip_count"),
+            func.count().over().label("pairs"),
+            func.sum(trip_count).over().label("total_trips"),
+        )
+        .where(*clauses)
+        .group_by(rollup.start_station_id, rollup.end_station_id)
+        .having(trip_count >= min_trips)
+        .order_by(desc("trip_count"), rollup.start_station_id, rollup.end_station_id)
+        .limit(limit)
+        .subquery()
+    )
+    origin = aliased(models.Station)
+    destination = aliased(models.Station)
+    stmt = (
+        select(pairs, origin.name.label("start_station_name"), destination.name.label("end_station_name"))
+        .outerjoin(origin, origin.id == pairs.c.start_station_id)
+        .outerjoin(destination, destination.id == pairs.c.end_station_id)
+        .order_by(desc(pairs.c.trip_count), pairs.c.start_station_id, pairs.c.end_station_id)
+    )
+    rows = (await db.execute(stmt)).all()
+
+    return {
+        "flows": [
+            {"start_station_id": row.start_station_id, "start_station_name": row.start_station_name,
+             "end_station_id": row.end_station_id, "end_station_name": row.end_station_name,
+             "trip_count": int(row.trip_count)}
+            for row in rows
+        ],
+        "pairs": int(rows[0].pairs) if rows else 0,
+        "total_trips": int(rows[0].total_trips) if rows else 0,
+    }
+
+async def get_duration_percentiles(db: AsyncSession, quantiles: List[float],
+                                   start: Optional[date] = None, end: Optional[date] = None):
+    """
+    Estimate trip duration quantiles (each in [0, 1]) between the start and
+    end days by merging the per-day t-digests in trip_duration_sketches.
+    The cost depends on the number of days, not on the number of trips.
+    """
+    sketch = models.TripDurationSketch
+    stmt = select(sketch.digest).where(*day_clauses(sketch.day, start, end))
+    digests = (await db.execute(stmt)).scalars().all()
+
+    def merge():
+        return TDigest.merge_all(TDigest.from_bytes(digest) for digest in digests)
+
+    merged = await asyncio.to_thread(merge)
+    return {
+        "durations": merged.quantiles(quantiles),
+        "trip_count": merged.count,
+        "sketches": len(digests),
+    }
+
+# Reported distinct counts and the trip_distinct_sketches dimensions each one unions
+DISTINCT_COUNTS = {
+    "bikes": ("bike_id",),
+    "start_stations": ("start_station_id",),
+    "end_stations": ("end_station_id",),
+    "stations": ("start_station_id", "end_station_id"),
+}
+DISTINCT_GRANULARITIES = ("total", "day", "month")
+
+async def get_distinct_counts(db: AsyncSession, granularity: str = "total",
+                              start: Optional[date] = None, end: Optional[date] = None):
+    """
+    Estimate distinct bikes and stations between the start and end days, in
+    total or per day or month, by unioning the per-day HyperLogLogs in
+    trip_distinct_sketches instead of running COUNT(DISTINCT) on bike_trips.
+    """
+    if granularity not in DISTINCT_GRANULARITIES:
+        raise ValueError(f"Unknown granularity: {granularity}")
+    sketch = models.TripDistinctSketch
+    stmt = (
+        select(sketch.day, sketch.dimension, sketch.registers)
+        .where(*day_clauses(sketch.day, start, end))
+        .order_by(sketch.day)
+    )
+    rows = (await db.execute(stmt)).all()
+
+    def estimate():
+        # period -> dimension -> sketches of its days; a total is reported even with no trips
+        periods = {start: {}} if granularity == "total" else {}
+        for day, dimension, registers in rows:
+            if granularity == "day":
+                period = day
+            elif granularity == "month":
+                period = day.replace(day=1)
+            else:
+                period = start
+            periods.setdefault(period, {}).setdefault(dimension, []).append(HyperLogLog.from_bytes(registers))
+        return [
+            {
+                "period": period,
+                **{
+                    name: HyperLogLog.union(
+                        [hll for dimension in dimensions for hll in sketches.get(dimension, [])]
+                    ).estimate()
+                    for name, dimensions in DISTINCT_COUNTS.items()
+                },
+            }
+            for period, sketches in periods.items()
+        ]
+
+    return {"periods": await asyncio.to_thread(estimate), "sketches": len(rows)}
+
+async def get_dataset_version(db: AsyncSession) -> int:
+    """Get the dataset version bumped by every load, 0 before the first load"""
+    version = (await db.execute(select(models.DatasetVersion.version).where(models.DatasetVersion.id == 1))).scalar()
+    return version or 0
+
+async def bump_dataset_version(db: AsyncSession):
+    """Increment the dataset version within the current transaction"""
+    stmt = insert(models.DatasetVersion).values(id=1, version=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.DatasetVersion.id],
+        set_={"version": models.DatasetVersion.version + 1, "updated_at": func.now()},
+    )
+    await db.execute(stmt)
+
+async def reset_trip_count(db: AsyncSession):
+    """Set the maintained bike_trips row count to zero within the current transaction"""
+    stmt = insert(models.TableRowCount).values(table_name=models.BikeTrip.__tablename__, row_count=0)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.TableRowCount.table_name],
+        set_={"row_count": 0, "updated_at": func.now()},
+    )
+    await db.execute(stmt)
+
+async def delete_all_records(db: AsyncSession):
     """Delete all records (for refresh functionality)"""
-    db.query(models.BikeTrip).delete()
-    db.commit()
+    # TRUNCATE empties every monthly partition without a row by row DELETE
+    await db.execute(text(f"TRUNCATE {models.BikeTrip.__tablename__}"))
+    await db.execute(delete(models.IngestedFile))
+    await db.execute(delete(models.TripHourRollup))
+    await db.execute(delete(models.StationPairDayRollup))
+    await db.execute(delete(models.TripDurationSketch))
+    await db.execute(delete(models.TripDistinctSketch))
+    await reset_trip_count(db)
+    await bump_dataset_version(db)
+    await db.commit()
     return True
@@ -0,0 +1,136 @@
+import io
+import csv
+import json
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Callable, List, Sequence
+
+from sqlalchemy import DateTime, Float, Integer
+
+# Media type served for each export format
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _ndjson_writer(columns: Sequence) -> Callable[[List[tuple]], bytes]:
+    names = [column.name for column in columns]
+
+    def write(batch: List[tuple]) -> bytes:
+        lines = [json.dumps({name: _json_value(value) for name, value in zip(names, row)}) for row in batch]
+        return ("\n".join(lines) + "\n").encode()
+
+    return write
+
+
+def _csv_writer(columns: Sequence) -> Callable[[List[tuple]], bytes]:
+    def write(batch: List[tuple]) -> bytes:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(batch)
+        return buffer.getvalue().encode()
+
+    return write
+
+
+def _csv_header(columns: Sequence) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow([column.name for column in columns])
+    return buffer.getvalue().encode()
+
+
+def arrow_schema(columns: Sequence):
+    """Arrow schema matching the exported bike_trips columns"""
+    import pyarrow as pa
+
+    fields = []
+    for column in columns:
+        if isinstance(column.type, DateTime):
+            arrow_type = pa.timestamp("us")
+        elif isinstance(column.type, Integer):
+            arrow_type = pa.int32()
+        elif isinstance(column.type, Float):
+            arrow_type = pa.float64()
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(column.name, arrow_type, nullable=column.nullable))
+    return pa.schema(fields)
+
+
+class _ChunkSink:
+    """Write-only file object collecting what pyarrow writes until drained"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+async def _arrow_stream(batches: AsyncIterator[List[tuple]], columns: Sequence) -> AsyncIterator[bytes]:
+    # pyarrow is only imported by Arrow exports
+    import pyarrow as pa
+
+    schema = arrow_schema(columns)
+    sink = _ChunkSink()
+    writer = pa.ipc.new_stream(pa.PythonFile(sink, mode="w"), schema)
+
+    async for batch in batches:
+        arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*batch), schema)]
+        writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+async def encode_export(batches: AsyncIterator[List[tuple]], columns: Sequence, fmt: str) -> AsyncIterator[bytes]:
+    """Serialize batches of trip rows to an export format, one chunk per batch"""
+    if fmt == "arrow":
+        async for chunk in _arrow_stream(batches, columns):
+            yield chunk
+        return
+
+    if fmt == "csv":
+        yield _csv_header(columns)
+        write = _csv_writer(columns)
+    else:
+        write = _ndjson_writer(columns)
+    async for batch in batches:
+        yield write(batch)
+
+
+async def gzip_stream(chunks: AsyncIterator[bytes], level: int = 6) -> AsyncIterator[bytes]:
+    """Gzip a byte stream chunk by chunk"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
@@ -1,14 +1,19 @@
-from fastapi import FastAPI, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date, datetime, time, timezone
+from typing import List, Optional, Callable, Hashable, Any, Awaitable, Union
 import logging
+import orjson
 
-import crud, schemas, models
-from db import get_db, engine
+import crud, schemas
+from db import get_async_db, get_async_sessionmaker
 from utils import trigger_airflow_dag, check_airflow_health
-
-# Create database tables
-models.Base.metadata.create_all(bind=engine)
+from cache import stats_cache, make_etag, etag_matches
+from concurrency import stats_flight, stats_limiter, ConcurrencyLimitExceeded
+from export import EXPORT_MEDIA_TYPES, encode_export, gzip_stream
+from metrics import MetricsMiddleware, render_metrics, CONTENT_TYPE_LATEST
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -19,48 +24,270 @@ app = FastAPI(
     description="A comprehensive data flow management system with ETL capabilities",
     version="1.0.0"
 )
+app.add_middleware(MetricsMiddleware)
+
+@app.exception_handler(ConcurrencyLimitExceeded)
+async def concurrency_limit_handler(request: Request, exc: ConcurrencyLimitExceeded):
+    """Reject requests over an endpoint's concurrency cap with 503 and Retry-After"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+async def cached_stats(request: Request, response: Response, db: AsyncSession, key: Hashable,
+                       compute: Callable[[AsyncSession], Awaitable[Any]]):
+    """
+    Serve a stats payload from the response cache, keyed by the dataset version
+    the ETL loader bumps. Clients revalidating with a matching ETag get a 304.
+    Concurrent misses for the same key share one computation, and distinct
+    computations per endpoint are capped by stats_limiter. The computation gets
+    its own session, since the request's closes if its client disconnects
+    while coalesced requests still wait for the result.
+    """
+    version = await stats_cache.dataset_version(lambda: crud.get_dataset_version(db))
+    etag = make_etag(key, version)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+    payload = stats_cache.get(key, version)
+    if payload is None:
+        endpoint = key[0]
+
+        async def compute_and_store():
+            async with get_async_sessionmaker()() as session:
+                result = await stats_limiter.run(endpoint, lambda: compute(session))
+            stats_cache.set(key, version, result)
+            return result
+
+        payload = await stats_flight.do(endpoint, (key, version), compute_and_store)
+
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    return payload
+
+def trip_filters(start: Optional[Union[datetime, date]] = None, end: Optional[Union[datetime, date]] = None,
+                 station_id: Optional[int] = None, user_type: Optional[str] = None,
+                 gender: Optional[int] = None) -> schemas.TripFilters:
+    """Dependency collecting the optional trip filters of the stats endpoints (end is exclusive)"""
+    # Plain dates mean midnight
+    if start is not None and not isinstance(start, datetime):
+        start = datetime.combine(start, time.min)
+    if end is not None and not isinstance(end, datetime):
+        end = datetime.combine(end, time.min)
+    # Trip times are naive UTC; aware values are converted once so every engine and the cache key agree
+    if start is not None and start.tzinfo is not None:
+        start = start.astimezone(timezone.utc).replace(tzinfo=None)
+    if end is not None and end.tzinfo is not None:
+        end = end.astimezone(timezone.utc).replace(tzinfo=None)
+    if start is not None and end is not None and start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    return schemas.TripFilters(start=start, end=end, station_id=station_id, user_type=user_type, gender=gender)
+
+def filters_key(filters: schemas.TripFilters) -> tuple:
+    """Hashable cache key part for a set of trip filters"""
+    return tuple(sorted(filters.model_dump(exclude_none=True).items()))
 
 @app.get("/ping")
 async def ping():
     """Health check endpoint"""
     return {"status": "healthy", "message": "Data Flow Hub API is running"}
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: request latency per endpoint, in-flight requests and DB pool checkout wait"""
+    return Response(render_metrics(), headers={"Content-Type": CONTENT_TYPE_LATEST})
+
 @app.get("/count", response_model=schemas.CountResponse)
-async def get_count(db: Session = Depends(get_db)):
-    """Get count statistics of the data"""
+async def get_count(request: Request, response: Response, mode: Optional[str] = None,
+                    filters: schemas.TripFilters = Depends(trip_filters),
+                    db: AsyncSession = Depends(get_async_db)):
+    """Get count statistics of the data (mode: exact, estimate, maintained or snapshot; filtered counts are exact or snapshot)"""
+    if mode is not None and mode not in crud.COUNT_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(crud.COUNT_MODES)}")
+
     try:
-        stats = crud.get_count_stats(db)
-        return schemas.CountResponse(**stats)
+        async def compute(session: AsyncSession):
+            return schemas.CountResponse(**await crud.get_count_stats(session, mode, filters), filters=filters)
+
+        return await cached_stats(
+            request, response, db, ("count", mode or crud.COUNT_MODE, filters_key(filters)), compute
+        )
+    except ConcurrencyLimitExceeded:
+        raise
     except Exception as e:
         logger.error(f"Error getting count: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to get count statistics")
 
 @app.get("/hour-range-stats", response_model=schemas.TripHourRangeStatsResponse)
-async def get_hour_range_stats(db: Session = Depends(get_db)):
-    """Get trip hour range statistics"""
+async def get_hour_range_stats(request: Request, response: Response, engine: Optional[str] = None,
+                               filters: schemas.TripFilters = Depends(trip_filters),
+                               db: AsyncSession = Depends(get_async_db)):
+    """Get trip hour range statistics (engine: rollup, arithmetic, scan or snapshot)"""
+    if engine is not None and engine not in crud.HOUR_RANGE_ENGINES:
+        raise HTTPException(status_code=400, detail=f"engine must be one of {', '.join(crud.HOUR_RANGE_ENGINES)}")
+
     try:
-        stats = crud.get_trip_hourrange_stats(db)
-        return schemas.TripHourRangeStatsResponse(**stats)
+        async def compute(session: AsyncSession):
+            return schemas.TripHourRangeStatsResponse(
+                **await crud.get_trip_hourrange_stats(session, engine, filters), filters=filters
+            )
+
+        return await cached_stats(
+            request, response, db,
+            ("hour-range-stats", engine or crud.HOUR_RANGE_ENGINE, filters_key(filters)), compute
+        )
+    except ConcurrencyLimitExceeded:
+        raise
     except Exception as e:
         logger.error(f"Error getting hour range statistics: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to get trip hour range statistics")
 
 
 @app.get("/trip-duration-stats", response_model=schemas.TripDurationStatsResponse)
-async def get_trip_duration_stats(db: Session = Depends(get_db)):
-    """Get trip duration statistics"""
+async def get_trip_duration_stats(request: Request, response: Response, engine: Optional[str] = None,
+                                  filters: schemas.TripFilters = Depends(trip_filters),
+                                  db: AsyncSession = Depends(get_async_db)):
+    """Get trip duration statistics (engine: sql or snapshot)"""
+    if engine is not None and engine not in crud.DURATION_ENGINES:
+        raise HTTPException(status_code=400, detail=f"engine must be one of {', '.join(crud.DURATION_ENGINES)}")
+
     try:
-        stats = crud.get_trip_duration_stats(db)
-        return schemas.TripDurationStatsResponse(**stats)
+        async def compute(session: AsyncSession):
+            return schemas.TripDurationStatsResponse(
+                **await crud.get_trip_duration_stats(session, engine, filters), filters=filters
+            )
+
+        return await cached_stats(
+            request, response, db,
+            ("trip-duration-stats", engine or crud.DURATION_ENGINE, filters_key(filters)), compute
+        )
+    except ConcurrencyLimitExceeded:
+        raise
     except Exception as e:
         logger.error(f"Error getting trip duration statistics: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to get trip duration statistics")
 
+def day_window(start: Optional[date] = None, end: Optional[date] = None) -> tuple:
+    """Dependency collecting the optional day range of the rollup and sketch endpoints (end is exclusive)"""
+    if start is not None and end is not None and start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    return start, end
+
+@app.get("/trip-duration-percentiles", response_model=schemas.TripDurationPercentilesResponse)
+async def get_trip_duration_percentiles(request: Request, response: Response,
+                                        p: List[float] = Query([50, 95, 99]),
+                                        window: tuple = Depends(day_window),
+                                        db: AsyncSession = Depends(get_async_db)):
+    """Estimate trip duration percentiles (seconds) between two days from the per-day t-digest sketches"""
+    if not 1 <= len(p) <= 100:
+        raise HTTPException(status_code=400, detail="between 1 and 100 percentiles can be requested")
+    if any(not 0 <= percentile <= 100 for percentile in p):
+        raise HTTPException(status_code=400, detail="percentiles must be between 0 and 100")
+
+    start, end = window
+    try:
+        async def compute(session: AsyncSession):
+            result = await crud.get_duration_percentiles(session, [percentile / 100 for percentile in p], start, end)
+            return schemas.TripDurationPercentilesResponse(**result, percentiles=p, start=start, end=end)
+
+        return await cached_stats(
+            request, response, db, ("trip-duration-percentiles", tuple(p), start, end), compute
+        )
+    except ConcurrencyLimitExceeded:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting trip duration percentiles: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to get trip duration percentiles")
+
+@app.get("/distinct-counts", response_model=schemas.DistinctCountsResponse)
+async def get_distinct_counts(request: Request, response: Response, granularity: str = "total",
+                              window: tuple = Depends(day_window), db: AsyncSession = Depends(get_async_db)):
+    """Estimate distinct bikes and active stations between two days, in total or per day or month"""
+    if granularity not in crud.DISTINCT_GRANULARITIES:
+        raise HTTPException(
+            status_code=400, detail=f"granularity must be one of {', '.join(crud.DISTINCT_GRANULARITIES)}"
+        )
+
+    start, end = window
+    try:
+        async def compute(session: AsyncSession):
+            result = await crud.get_distinct_counts(session, granularity, start, end)
+            return schemas.DistinctCountsResponse(**result, granularity=granularity, start=start, end=end)
+
+        return await cached_stats(request, response, db, ("distinct-counts", granularity, start, end), compute)
+    except ConcurrencyLimitExceeded:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting distinct counts: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to get distinct counts")
+
+@app.get("/stations/top", response_model=schemas.TopStationsResponse)
+async def get_top_stations(request: Request, response: Response, k: int = 10, by: str = "start",
+                           window: tuple = Depends(day_window), db: AsyncSession = Depends(get_async_db)):
+    """Get the k busiest stations by trips starting (by=start), ending (by=end) or both between two days"""
+    if not 1 <= k <= 1000:
+        raise HTTPException(status_code=400, detail="k must be between 1 and 1000")
+    if by not in crud.TOP_STATION_RANKINGS:
+        raise HTTPException(status_code=400, detail=f"by must be one of {', '.join(crud.TOP_STATION_RANKINGS)}")
+
+    start, end = window
+    try:
+        async def compute(session: AsyncSession):
+            return schemas.TopStationsResponse(
+                stations=await crud.get_top_stations(session, k, by, start, end), by=by, start=start, end=end
+            )
+
+        return await cached_stats(request, response, db, ("stations-top", k, by, start, end), compute)
+    except ConcurrencyLimitExceeded:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting top stations: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to get top stations")
+
+@app.get("/stations/od-matrix", response_model=schemas.ODMatrixResponse)
+async def get_od_matrix(request: Request, response: Response, station_id: Optional[int] = None,
+                        min_trips: int = 1, limit: int = 1000, window: tuple = Depends(day_window),
+                        db: AsyncSession = Depends(get_async_db)):
+    """Get the sparse origin-destination matrix of trips between two days, busiest pairs first"""
+    if min_trips < 1:
+        raise HTTPException(status_code=400, detail="min_trips must be a positive integer")
+    if not 1 <= limit <= 100000:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 100000")
+
+    start, end = window
+    try:
+        async def compute(session: AsyncSession):
+            return schemas.ODMatrixResponse(
+                **await crud.get_od_matrix(session, start, end, station_id, min_trips, limit),
+                start=start, end=end, station_id=station_id
+            )
+
+        return await cached_stats(
+            request, response, db, ("stations-od-matrix", start, end, station_id, min_trips, limit), compute
+        )
+    except ConcurrencyLimitExceeded:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting origin-destination matrix: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to get origin-destination matrix")
+
+@app.get("/stats-metrics", response_model=schemas.StatsMetricsResponse)
+async def get_stats_metrics():
+    """Get request coalescing and concurrency limit counters of the stats endpoints"""
+    return schemas.StatsMetricsResponse(
+        coalesced=dict(stats_flight.coalesced),
+        rejected=dict(stats_limiter.rejected),
+        active={endpoint: n for endpoint, n in stats_limiter.active.items() if n},
+        in_flight=stats_flight.in_flight(),
+        max_concurrency=stats_limiter.max_concurrent,
+    )
+
 @app.post("/refresh")
 async def refresh_data():
     """Trigger the ETL pipeline manually"""
     try:
-        result = trigger_airflow_dag()
+        result = await run_in_threadpool(trigger_airflow_dag)
         if result["status"] == "success":
             return {"status": "success", "message": "ETL pipeline triggered successfully"}
         else:
@@ -70,7 +297,7 @@ async def refresh_data():
         raise HTTPException(status_code=500, detail=f"Failed to trigger ETL pipeline: {str(e)}")
 
 @app.get("/top/{n}", response_model=schemas.TopNResponse)
-async def get_top_n(n: int, db: Session = Depends(get_db)):
+async def get_top_n(n: int, db: AsyncSession = Depends(get_async_db)):
     """Get top N records ordered by start time"""
     if n <= 0:
         raise HTTPException(status_code=400, detail="N must be a positive integer")
@@ -79,17 +306,46 @@ async def get_top_n(n: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="N cannot exceed 1000")
     
     try:
-        records = crud.get_top_records(db, n)
-        return schemas.TopNResponse(records=records, count=len(records))
+        # Rows go straight to JSON; building ORM instances and validating them
+        # through schemas.BikeTrip cost far more than the query
+        rows = await crud.get_top_rows(db, n)
+        names = [column.name for column in crud.TRIP_COLUMNS]
+        payload = {"records": [dict(zip(names, row)) for row in rows], "count": len(rows)}
+        return Response(orjson.dumps(payload, option=orjson.OPT_UTC_Z), media_type="application/json")
     except Exception as e:
         logger.error(f"Error getting top {n} records: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to get top records")
 
+@app.get("/export")
+async def export_trips(format: str = "ndjson", gzip: bool = False, limit: Optional[int] = None,
+                       batch_size: int = 5000, filters: schemas.TripFilters = Depends(trip_filters)):
+    """Stream trips in (start_time, id) order as NDJSON, CSV or Arrow IPC, optionally gzipped"""
+    if format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_MEDIA_TYPES)}")
+    if limit is not None and limit <= 0:
+        raise HTTPException(status_code=400, detail="limit must be a positive integer")
+    if not 1 <= batch_size <= 50000:
+        raise HTTPException(status_code=400, detail="batch_size must be between 1 and 50000")
+
+    async def stream():
+        # The session lives as long as the response body, not the request handler
+        async with get_async_sessionmaker()() as db:
+            batches = crud.iter_trip_batches(db, filters, batch_size=batch_size, limit=limit)
+            async for chunk in encode_export(batches, crud.EXPORT_COLUMNS, format):
+                yield chunk
+
+    body = stream()
+    headers = {"Content-Disposition": f'attachment; filename="bike_trips.{format}"'}
+    if gzip:
+        body = gzip_stream(body)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body, media_type=EXPORT_MEDIA_TYPES[format], headers=headers)
+
 @app.get("/health/airflow")
 async def check_airflow():
     """Check Airflow health status"""
     try:
-        health_status = check_airflow_health()
+        health_status = await run_in_threadpool(check_airflow_health)
         return health_status
     except Exception as e:
         logger.error(f"Error checking Airflow health: {str(e)}")
@@ -0,0 +1,103 @@
+import os
+import time
+from typing import Callable, Dict
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Gauge, Histogram, generate_latest, multiprocess,
+)
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# With several uvicorn workers every process writes its samples under this
+# directory and /metrics aggregates them; it must be emptied before start
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+REQUEST_LATENCY = Histogram(
+    "api_request_duration_seconds",
+    "Time from receiving a request to sending the last byte of its response",
+    ["method", "endpoint", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "api_requests_in_flight", "Requests being handled", multiprocess_mode="livesum",
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "api_db_pool_checkout_wait_seconds",
+    "Time spent waiting for a database connection from the pool, including opening new ones",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0),
+)
+DB_POOL_IN_USE = Gauge(
+    "api_db_pool_connections_in_use", "Database connections checked out of the pool", multiprocess_mode="livesum",
+)
+
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """Async queue pool recording how long each checkout waits for a connection"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started)
+
+
+def instrument_pool(engine) -> None:
+    """Track the connections checked out of an engine's pool"""
+    event.listen(engine, "checkout", lambda *args: DB_POOL_IN_USE.inc())
+    event.listen(engine, "checkin", lambda *args: DB_POOL_IN_USE.dec())
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request per route template, up to the
+    last body chunk so streamed exports are measured in full
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._paths: Dict[Callable, str] = {}
+
+    def _route_path(self, scope) -> str:
+        # Starlette records the matched endpoint in the scope; label by its path template, not the raw path
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if endpoint not in self._paths:
+            self._paths[endpoint] = next(
+                (route.path for route in scope["app"].routes if getattr(route, "endpoint", None) is endpoint),
+                "unmatched",
+            )
+        return self._paths[endpoint]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            REQUEST_LATENCY.labels(scope["method"], self._route_path(scope), str(status)).observe(
+                time.perf_counter() - started
+            )
+
+
+def render_metrics() -> bytes:
+    """Metrics of this process, or of every worker when PROMETHEUS_MULTIPROC_DIR is set"""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
@@ -1,22 +1,26 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Date, DateTime, LargeBinary, UniqueConstraint, Index
 from sqlalchemy.sql import func
 from db import Base
 
 class BikeTrip(Base):
     __tablename__ = "bike_trips"
+    # Partitioned by start_time month (migrations/versions/0003_partition_bike_trips.py);
+    # the ETL loader creates the monthly partitions
+    __table_args__ = (
+        Index("ix_bike_trips_start_time_id", "start_time", "id"),
+        Index("brin_bike_trips_start_time", "start_time", postgresql_using="brin"),
+        Index("ix_bike_trips_start_station_id", "start_station_id"),
+        Index("ix_bike_trips_end_station_id", "end_station_id"),
+        {"postgresql_partition_by": "RANGE (start_time)"},
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     tripduration = Column(Integer, nullable=False)
-    start_time = Column(DateTime(timezone=False), nullable=False)
+    start_time = Column(DateTime(timezone=False), primary_key=True)
     stop_time = Column(DateTime(timezone=False), nullable=False)
+    # Station names and coordinates live in stations
     start_station_id = Column(Integer, nullable=True)
-    start_station_name = Column(String(255), nullable=True)
-    start_station_latitude = Column(Float, nullable=True)
-    start_station_longitude = Column(Float, nullable=True)
     end_station_id = Column(Integer, nullable=True)
-    end_station_name = Column(String(255), nullable=True)
-    end_station_latitude = Column(Float, nullable=True)
-    end_station_longitude = Column(Float, nullable=True)
     bike_id = Column(Integer, nullable=True)
     user_type = Column(String(50), nullable=True)
     birth_year = Column(Integer, nullable=True)
@@ -29,3 +33,148 @@ class BikeTrip(Base):
             f"<BikeTrip(id={self.id}, bike_id={self.bike_id}, start='{self.start_time}', "
             f"end='{self.stop_time}', duration={self.tripduration})>"
         )
+
+
+class Station(Base):
+    """Station dimension referenced by bike_trips start and end station ids, upserted by the ETL loader"""
+    __tablename__ = "stations"
+
+    # Citi Bike's own station ids, not generated
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    name = Column(String(255), nullable=True)
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    # Latest trip start_time the attributes were taken from; older trips do not overwrite them
+    last_seen = Column(DateTime(timezone=False), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<Station(id={self.id}, name='{self.name}')>"
+
+
+class BikeTripDetail(Base):
+    """
+    Read-only mapping of the bike_trips_detailed view: bike_trips joined with
+    its start and end stations, i.e. the trip layout from before stations
+    were split out. The view is created by migrations, not by this model.
+    """
+    __tablename__ = "bike_trips_detailed"
+    __table_args__ = {"info": {"is_view": True}}
+
+    id = Column(Integer, primary_key=True)
+    tripduration = Column(Integer)
+    start_time = Column(DateTime(timezone=False), primary_key=True)
+    stop_time = Column(DateTime(timezone=False))
+    start_station_id = Column(Integer)
+    start_station_name = Column(String(255))
+    start_station_latitude = Column(Float)
+    start_station_longitude = Column(Float)
+    end_station_id = Column(Integer)
+    end_station_name = Column(String(255))
+    end_station_latitude = Column(Float)
+    end_station_longitude = Column(Float)
+    bike_id = Column(Integer)
+    user_type = Column(String(50))
+    birth_year = Column(Integer)
+    gender = Column(Integer)
+    created_at = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True))
+
+
+class IngestedFile(Base):
+    """Ledger of CSV files whose rows have been committed to bike_trips"""
+    __tablename__ = "ingested_files"
+    __table_args__ = (UniqueConstraint("content_hash", name="uq_ingested_files_content_hash"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    file_path = Column(String(1024), nullable=False, index=True)
+    file_size = Column(BigInteger, nullable=False)
+    file_mtime = Column(Float, nullable=False)
+    content_hash = Column(String(64), nullable=False)
+    row_count = Column(Integer, nullable=False)
+    ingested_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return (
+            f"<IngestedFile(id={self.id}, path='{self.file_path}', size={self.file_size}, "
+            f"hash='{self.content_hash[:12]}', rows={self.row_count})>"
+        )
+
+
+class TripHourRollup(Base):
+    """Number of trips overlapping each calendar hour, maintained by the ETL loader"""
+    __tablename__ = "trip_hour_rollup"
+
+    bucket_start = Column(DateTime(timezone=False), primary_key=True)
+    ride_count = Column(BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<TripHourRollup(bucket_start='{self.bucket_start}', ride_count={self.ride_count})>"
+
+
+class StationPairDayRollup(Base):
+    """Number of trips per start day and (start station, end station) pair, maintained by the ETL loader"""
+    __tablename__ = "station_pair_day_rollup"
+
+    day = Column(Date, primary_key=True)
+    start_station_id = Column(Integer, primary_key=True, autoincrement=False)
+    end_station_id = Column(Integer, primary_key=True, autoincrement=False)
+    trip_count = Column(BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return (f"<StationPairDayRollup(day='{self.day}', start_station_id={self.start_station_id}, "
+                f"end_station_id={self.end_station_id}, trip_count={self.trip_count})>")
+
+
+class TripDurationSketch(Base):
+    """t-digest of trip durations per start day and source file, maintained by the ETL loader"""
+    __tablename__ = "trip_duration_sketches"
+
+    day = Column(Date, primary_key=True)
+    # File name of the loaded CSV; '' for loads without a source file and for rebuilt days
+    source = Column(String(255), primary_key=True)
+    trip_count = Column(BigInteger, nullable=False)
+    # sketches.TDigest.to_bytes
+    digest = Column(LargeBinary, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<TripDurationSketch(day='{self.day}', source='{self.source}', trip_count={self.trip_count})>"
+
+class TripDistinctSketch(Base):
+    """HyperLogLog of the distinct values of one bike_trips column per start day, maintained by the ETL loader"""
+    __tablename__ = "trip_distinct_sketches"
+
+    day = Column(Date, primary_key=True)
+    # bike_id, start_station_id or end_station_id
+    dimension = Column(String(32), primary_key=True)
+    # sketches.HyperLogLog.to_bytes
+    registers = Column(LargeBinary, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<TripDistinctSketch(day='{self.day}', dimension='{self.dimension}')>"
+
+
+class DatasetVersion(Base):
+    """Single-row counter bumped by every commit that changes the trip data"""
+    __tablename__ = "dataset_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<DatasetVersion(version={self.version}, updated_at='{self.updated_at}')>"
+
+
+class TableRowCount(Base):
+    """Row count of a table kept transactionally up to date by every writer"""
+    __tablename__ = "table_row_counts"
+
+    table_name = Column(String(255), primary_key=True)
+    row_count = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<TableRowCount(table='{self.table_name}', rows={self.row_count})>"
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
-from datetime import datetime
-from typing import Optional, List
+from datetime import date, datetime
+from typing import Optional, List, Dict
 
 class BikeTripBase(BaseModel):
     tripduration: int
@@ -30,8 +30,17 @@ class BikeTrip(BikeTripBase):
     class Config:
         from_attributes = True
 
+class TripFilters(BaseModel):
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    station_id: Optional[int] = None
+    user_type: Optional[str] = None
+    gender: Optional[int] = None
+
 class CountResponse(BaseModel):
     total_records: int
+    mode: str
+    filters: TripFilters = TripFilters()
 
 class TopNResponse(BaseModel):
     records: List[BikeTrip]
@@ -40,7 +49,67 @@ class TopNResponse(BaseModel):
 class TripDurationStatsResponse(BaseModel):
     hours: List[str]
     count: List[int]
+    filters: TripFilters = TripFilters()
 
 class TripHourRangeStatsResponse(BaseModel):
     hour_bucket: List[int]
-    count: List[int]
\ No newline at end of file
+    count: List[int]
+    filters: TripFilters = TripFilters()
+
+class TripDurationPercentilesResponse(BaseModel):
+    percentiles: List[float]
+    durations: List[Optional[float]]
+    trip_count: int
+    sketches: int
+    start: Optional[date] = None
+    end: Optional[date] = None
+
+class DistinctCounts(BaseModel):
+    # First day of the day or month; the requested start for granularity=total
+    period: Optional[date] = None
+    bikes: int
+    start_stations: int
+    end_stations: int
+    stations: int
+
+class DistinctCountsResponse(BaseModel):
+    periods: List[DistinctCounts]
+    granularity: str
+    sketches: int
+    start: Optional[date] = None
+    end: Optional[date] = None
+
+class StationTripCount(BaseModel):
+    station_id: int
+    name: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    trip_count: int
+
+class TopStationsResponse(BaseModel):
+    stations: List[StationTripCount]
+    by: str
+    start: Optional[date] = None
+    end: Optional[date] = None
+
+class StationFlow(BaseModel):
+    start_station_id: int
+    start_station_name: Optional[str] = None
+    end_station_id: int
+    end_station_name: Optional[str] = None
+    trip_count: int
+
+class ODMatrixResponse(BaseModel):
+    flows: List[StationFlow]
+    pairs: int
+    total_trips: int
+    start: Optional[date] = None
+    end: Optional[date] = None
+    station_id: Optional[int] = None
+
+class StatsMetricsResponse(BaseModel):
+    coalesced: Dict[str, int]
+    rejected: Dict[str, int]
+    active: Dict[str, int]
+    in_flight: int
+    max_concurrency: int
\ No newline at end of file
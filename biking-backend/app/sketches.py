@@ -0,0 +1,175 @@
+import os
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+
+# t-digest compression: larger keeps more centroids (about compression / 2) and is more accurate
+TDIGEST_COMPRESSION = int(os.getenv("TDIGEST_COMPRESSION", "200"))
+
+
+class TDigest:
+    """
+    Mergeable t-digest of a distribution: centroids (mean, weight) sorted by
+    mean, sized by the k1 scale function so they are small near the tails,
+    which keeps extreme quantiles accurate. Digests of disjoint sets of
+    values merge into a digest of their union, so per-day sketches can be
+    combined for any range of days.
+    """
+
+    def __init__(self, means: Optional[np.ndarray] = None, weights: Optional[np.ndarray] = None,
+                 minimum: float = np.inf, maximum: float = -np.inf,
+                 compression: int = TDIGEST_COMPRESSION):
+        self.means = np.zeros(0) if means is None else np.asarray(means, dtype=np.float64)
+        self.weights = np.zeros(0) if weights is None else np.asarray(weights, dtype=np.float64)
+        self.min = float(minimum)
+        self.max = float(maximum)
+        self.compression = compression
+
+    @property
+    def count(self) -> int:
+        """Number of values summarized"""
+        return int(round(self.weights.sum()))
+
+    @classmethod
+    def from_values(cls, values, compression: int = TDIGEST_COMPRESSION) -> "TDigest":
+        """Build a digest of an array of values"""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return cls(compression=compression)
+        digest = cls(np.sort(values), np.ones(values.size), values.min(), values.max(), compression)
+        return digest._compressed()
+
+    @classmethod
+    def merge_all(cls, digests: Iterable["TDigest"], compression: int = TDIGEST_COMPRESSION) -> "TDigest":
+        """Merge digests into one digest of all their values"""
+        digests = [digest for digest in digests if digest.means.size]
+        if not digests:
+            return cls(compression=compression)
+        means = np.concatenate([digest.means for digest in digests])
+        weights = np.concatenate([digest.weights for digest in digests])
+        order = np.argsort(means, kind="stable")
+        merged = cls(
+            means[order], weights[order],
+            min(digest.min for digest in digests), max(digest.max for digest in digests),
+            compression,
+        )
+        return merged._compressed()
+
+    def _compressed(self) -> "TDigest":
+        """
+        Merge neighbouring centroids (sorted by mean) so that each resulting
+        centroid stays within one unit of k(q) = compression / (2 pi) * asin(2q - 1),
+        assigning every input centroid to the unit its left edge falls into
+        """
+        total = self.weights.sum()
+        left = (np.cumsum(self.weights) - self.weights) / total
+        k = self.compression / (2 * np.pi) * np.arcsin(2 * left - 1)
+        groups = np.floor(k - k[0]).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+        weights = np.add.reduceat(self.weights, starts)
+        means = np.add.reduceat(self.means * self.weights, starts) / weights
+        return TDigest(means, weights, self.min, self.max, self.compression)
+
+    def quantiles(self, qs: Sequence[float]) -> list:
+        """Estimate the values at quantiles qs (each in [0, 1]); None for an empty digest"""
+        if self.means.size == 0:
+            return [None for _ in qs]
+        total = self.weights.sum()
+        # Each centroid's mean sits at the middle of its weight; the extremes are exact
+        centers = np.cumsum(self.weights) - self.weights / 2
+        positions = np.r_[0.0, centers, total]
+        values = np.r_[self.min, self.means, self.max]
+        return [float(value) for value in np.interp(np.asarray(qs, dtype=np.float64) * total, positions, values)]
+
+    def to_bytes(self) -> bytes:
+        """Serialize as little-endian float64: min, max, then the means and the weights"""
+        return np.concatenate([[self.min, self.max], self.means, self.weights]).astype("<f8").tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes, compression: int = TDIGEST_COMPRESSION) -> "TDigest":
+        """Deserialize a digest written by to_bytes"""
+        values = np.frombuffer(data, dtype="<f8")
+        size = (values.size - 2) // 2
+        return cls(values[2:2 + size], values[2 + size:], values[0], values[1], compression)
+
+
+# HyperLogLog precision: 2**precision one-byte registers, relative error about 1.04 / sqrt(2**precision)
+HLL_PRECISION = int(os.getenv("HLL_PRECISION", "14"))
+
+_HASH_MULTIPLIERS = (np.uint64(0xBF58476D1CE4E5B9), np.uint64(0x94D049BB133111EB))
+
+
+def _hash64(values: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer: a fast, well-mixed 64-bit hash of integer values"""
+    x = values.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    x ^= x >> np.uint64(30)
+    x *= _HASH_MULTIPLIERS[0]
+    x ^= x >> np.uint64(27)
+    x *= _HASH_MULTIPLIERS[1]
+    x ^= x >> np.uint64(31)
+    return x
+
+
+class HyperLogLog:
+    """
+    HyperLogLog sketch of the distinct integer values seen. The union of
+    two sketches is their register-wise maximum, so per-day sketches can be
+    combined into distinct counts for any range of days; adding the same
+    values twice does not change a sketch.
+    """
+
+    def __init__(self, registers: Optional[np.ndarray] = None, precision: int = HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8) if registers is None else registers
+
+    @classmethod
+    def from_values(cls, values, precision: int = HLL_PRECISION) -> "HyperLogLog":
+        """Build a sketch of an array of integer values (NaN/None are ignored)"""
+        sketch = cls(precision=precision)
+        sketch.add(values)
+        return sketch
+
+    def add(self, values) -> None:
+        """Add an array of integer values to the sketch"""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)].astype(np.int64)
+        if values.size == 0:
+            return
+        hashes = _hash64(values)
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        # Position of the first 1 bit in the remaining 64 - precision bits
+        rest = (hashes & np.uint64((1 << (64 - self.precision)) - 1)).astype(np.float64)
+        _, exponent = np.frexp(rest)
+        rank = np.where(rest > 0, 64 - self.precision - exponent + 1, 64 - self.precision + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    @classmethod
+    def union(cls, sketches: Iterable["HyperLogLog"], precision: int = HLL_PRECISION) -> "HyperLogLog":
+        """Sketch of the union of the sets summarized by sketches"""
+        registers = np.zeros(1 << precision, dtype=np.uint8)
+        for sketch in sketches:
+            if sketch.precision != precision:
+                raise ValueError(f"Cannot union HyperLogLog sketches of precision {sketch.precision} and {precision}")
+            np.maximum(registers, sketch.registers, out=registers)
+        return cls(registers, precision)
+
+    def estimate(self) -> int:
+        """Estimated number of distinct values, with linear counting for small cardinalities"""
+        m = self.registers.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            return int(round(m * np.log(m / zeros)))
+        return int(round(raw))
+
+    def to_bytes(self) -> bytes:
+        """Serialize as the raw registers, one byte each"""
+        return self.registers.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        """Deserialize a sketch written by to_bytes; the precision follows from its size"""
+        registers = np.frombuffer(data, dtype=np.uint8).copy()
+        return cls(registers, int(registers.size).bit_length() - 1)
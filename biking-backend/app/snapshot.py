@@ -0,0 +1,209 @@
+import os
+import json
+import time
+import logging
+import threading
+import calendar
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Directory holding the trip snapshots written by the ETL (etl/snapshot.py):
+# biking-backend/snapshots in the repository, next to this module in the API image
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR") or next(
+    (path for path in (
+        os.path.join(os.path.dirname(__file__), "snapshots"),
+        os.path.join(os.path.dirname(__file__), "..", "snapshots"),
+    ) if os.path.isdir(path)),
+    os.path.join(os.path.dirname(__file__), "..", "snapshots")
+)
+
+# Seconds between checks of the manifest for a newer snapshot
+SNAPSHOT_CHECK_INTERVAL = float(os.getenv("SNAPSHOT_CHECK_INTERVAL", "1.0"))
+
+# Rows processed per vectorized step, bounding the temporary arrays
+SNAPSHOT_CHUNK_ROWS = int(os.getenv("SNAPSHOT_CHUNK_ROWS", "4000000"))
+
+# File naming the current snapshot directory; replaced atomically by the ETL
+MANIFEST_NAME = "manifest.json"
+
+# Snapshot columns and their dtypes. Trips are stored in (start_time, id)
+# order, times as epoch microseconds of the naive timestamps (the resolution
+# of PostgreSQL timestamps, so they compare exactly like the SQL filters),
+# missing ids and genders as -1 and user types as codes into the manifest's
+# user_types.
+SNAPSHOT_COLUMNS = {
+    "start_us": "int64",
+    "stop_us": "int64",
+    "tripduration": "int32",
+    "start_station_id": "int32",
+    "end_station_id": "int32",
+    "user_type": "int8",
+    "gender": "int8",
+}
+
+HOUR_US = 3600 * 1000000
+
+
+def epoch_us(value: datetime) -> int:
+    """Epoch microseconds of a naive (or UTC-converted aware) datetime"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return calendar.timegm(value.timetuple()) * 1000000 + value.microsecond
+
+
+class TripSnapshot:
+    """
+    Read-only columnar copy of bike_trips for one dataset version. Columns
+    are memory-mapped .npy files, so every API worker process maps the same
+    page cache pages instead of holding its own copy.
+    """
+
+    def __init__(self, path: str, manifest: Dict[str, Any]):
+        self.path = path
+        self.version = manifest["version"]
+        self.rows = manifest["rows"]
+        self.user_types = manifest["user_types"]
+        self.columns = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+            for name in SNAPSHOT_COLUMNS
+        }
+
+    def _chunks(self, filters) -> Iterator[Tuple[slice, Optional[np.ndarray]]]:
+        """
+        Yield the row ranges matching the time filters, in chunks, with a
+        boolean mask of the rows in the chunk matching the other filters
+        (None when every row matches)
+        """
+        # -1 stands for a missing station id or gender, which SQL's = never matches
+        if filters is not None and any(
+            value is not None and value < 0 for value in (filters.station_id, filters.gender)
+        ):
+            return
+
+        start_us = self.columns["start_us"]
+        lo, hi = 0, self.rows
+        # Rows are sorted by start time, so time bounds are binary searches
+        if filters is not None and filters.start is not None:
+            lo = int(np.searchsorted(start_us, epoch_us(filters.start), side="left"))
+        if filters is not None and filters.end is not None:
+            hi = int(np.searchsorted(start_us, epoch_us(filters.end), side="left"))
+
+        user_type = None
+        if filters is not None and filters.user_type is not None:
+            if filters.user_type not in self.user_types:
+                return
+            user_type = self.user_types.index(filters.user_type)
+
+        for chunk_lo in range(lo, hi, SNAPSHOT_CHUNK_ROWS):
+            rows = slice(chunk_lo, min(chunk_lo + SNAPSHOT_CHUNK_ROWS, hi))
+            mask = None
+            if filters is not None and filters.station_id is not None:
+                mask = ((self.columns["start_station_id"][rows] == filters.station_id)
+                        | (self.columns["end_station_id"][rows] == filters.station_id))
+            if user_type is not None:
+                matches = self.columns["user_type"][rows] == user_type
+                mask = matches if mask is None else mask & matches
+            if filters is not None and filters.gender is not None:
+                matches = self.columns["gender"][rows] == filters.gender
+                mask = matches if mask is None else mask & matches
+            yield rows, mask
+
+    def _column(self, name: str, rows: slice, mask: Optional[np.ndarray]) -> np.ndarray:
+        values = self.columns[name][rows]
+        return values if mask is None else values[mask]
+
+    def count(self, filters=None) -> int:
+        """Number of trips matching filters"""
+        total = 0
+        for rows, mask in self._chunks(filters):
+            total += (rows.stop - rows.start) if mask is None else int(np.count_nonzero(mask))
+        return total
+
+    def hour_span_counts(self, filters=None) -> np.ndarray:
+        """
+        Trips matching filters grouped by (start hour of day, number of hour
+        buckets covered), as a 24 x 25 array; the same grouping as the
+        arithmetic hour range engine
+        """
+        counts = np.zeros(24 * 25, dtype=np.int64)
+        for rows, mask in self._chunks(filters):
+            start = self._column("start_us", rows, mask)
+            stop = self._column("stop_us", rows, mask)
+            hour = start // HOUR_US
+            # Hour boundaries reached after the start hour: ceil((stop - start hour) / 1h), capped
+            span = stop - hour * HOUR_US
+            span += HOUR_US - 1
+            span //= HOUR_US
+            np.minimum(span, 24, out=span)
+            # Trips that do not end after they start cover no bucket
+            span[stop <= start] = 0
+            hour %= 24
+            hour *= 25
+            hour += span
+            counts += np.bincount(hour, minlength=24 * 25)
+        return counts.reshape(24, 25)
+
+    def duration_histogram(self, edges_seconds, filters=None) -> np.ndarray:
+        """Trips matching filters per tripduration bin, bins split at edges_seconds"""
+        counts = np.zeros(len(edges_seconds) + 1, dtype=np.int64)
+        for rows, mask in self._chunks(filters):
+            durations = self._column("tripduration", rows, mask)
+            # One comparison pass per edge is cheaper than searchsorted for a dozen bins
+            below = [np.count_nonzero(durations < edge) for edge in edges_seconds]
+            counts += np.diff(below + [len(durations)], prepend=0)
+        return counts
+
+
+class SnapshotStore:
+    """
+    Holds the current TripSnapshot of an API process. The manifest is
+    checked at most every check_interval seconds; when the ETL has replaced
+    it, the new snapshot is mapped and swapped in with a single reference
+    assignment, while requests still using the previous one keep it alive.
+    """
+
+    def __init__(self, snapshot_dir: str = SNAPSHOT_DIR, check_interval: float = SNAPSHOT_CHECK_INTERVAL):
+        self.snapshot_dir = snapshot_dir
+        self.check_interval = check_interval
+        self._snapshot: Optional[TripSnapshot] = None
+        self._manifest_id: Optional[Tuple[int, int]] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def current(self) -> Optional[TripSnapshot]:
+        """Return the latest snapshot, or None if the ETL has not written one"""
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            with self._lock:
+                if time.monotonic() - self._checked_at >= self.check_interval:
+                    self._refresh()
+                    self._checked_at = time.monotonic()
+        return self._snapshot
+
+    def _refresh(self) -> None:
+        manifest_path = os.path.join(self.snapshot_dir, MANIFEST_NAME)
+        try:
+            stat = os.stat(manifest_path)
+        except FileNotFoundError:
+            self._snapshot, self._manifest_id = None, None
+            return
+
+        manifest_id = (stat.st_ino, stat.st_mtime_ns)
+        if manifest_id == self._manifest_id:
+            return
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            snapshot = TripSnapshot(os.path.join(self.snapshot_dir, manifest["path"]), manifest)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Could not load trip snapshot from {manifest_path}: {e}")
+            return
+
+        self._snapshot, self._manifest_id = snapshot, manifest_id
+        logger.info(f"Loaded trip snapshot version {snapshot.version} ({snapshot.rows} rows) from {snapshot.path}")
+
+
+trip_snapshots = SnapshotStore()
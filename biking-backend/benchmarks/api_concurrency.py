@@ -0,0 +1,121 @@
+"""
+Concurrency benchmark for the API.
+
+Fires requests at a running API from an increasing number of parallel
+clients and reports throughput and latency per level, plus /ping latency
+measured while the load runs (a blocked event loop shows up there first).
+
+Usage (from biking-backend/):
+    python benchmarks/api_concurrency.py --url http://localhost:8000 \
+        --path "/hour-range-stats?engine=arithmetic" --levels 1,2,4,8,16,32
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List
+
+import requests
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _client_loop(url: str, deadline: float, latencies: List[float], errors: List[int]) -> None:
+    session = requests.Session()
+    # Always fetch the full payload rather than revalidating against the ETag
+    headers = {"Cache-Control": "no-cache"}
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            resp = session.get(url, headers=headers, timeout=60)
+            if resp.status_code >= 400:
+                errors.append(resp.status_code)
+        except requests.RequestException:
+            errors.append(0)
+        latencies.append(time.perf_counter() - started)
+
+
+def _ping_loop(url: str, stop: threading.Event, latencies: List[float]) -> None:
+    session = requests.Session()
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            session.get(url, timeout=60)
+        except requests.RequestException:
+            pass
+        latencies.append(time.perf_counter() - started)
+        time.sleep(0.05)
+
+
+def run_level(base_url: str, path: str, clients: int, duration: float) -> Dict[str, Any]:
+    """Run one concurrency level and return its throughput and latency summary"""
+    latencies: List[float] = []
+    errors: List[int] = []
+    ping_latencies: List[float] = []
+    stop = threading.Event()
+
+    ping_thread = threading.Thread(target=_ping_loop, args=(f"{base_url}/ping", stop, ping_latencies))
+    ping_thread.start()
+
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        for _ in range(clients):
+            pool.submit(_client_loop, f"{base_url}{path}", deadline, latencies, errors)
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    ping_thread.join()
+
+    return {
+        "clients": clients,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "latency_p50_ms": _percentile(latencies, 50) * 1000,
+        "latency_p95_ms": _percentile(latencies, 95) * 1000,
+        "ping_p50_ms": _percentile(ping_latencies, 50) * 1000,
+        "ping_max_ms": max(ping_latencies, default=0.0) * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="API concurrency benchmark")
+    parser.add_argument("--url", default="http://localhost:8000", help="Base URL of the API")
+    parser.add_argument("--path", default="/hour-range-stats?engine=arithmetic", help="Endpoint to load")
+    parser.add_argument("--levels", default="1,2,4,8,16,32", help="Comma-separated client counts")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per level")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = []
+    for clients in [int(level) for level in args.levels.split(",")]:
+        result = run_level(args.url.rstrip("/"), args.path, clients, args.duration)
+        results.append(result)
+        print(
+            f"{clients:>4} clients: {result['throughput_rps']:8.1f} req/s  "
+            f"p50 {result['latency_p50_ms']:7.1f} ms  p95 {result['latency_p95_ms']:7.1f} ms  "
+            f"ping p50 {result['ping_p50_ms']:6.1f} ms  max {result['ping_max_ms']:6.1f} ms  "
+            f"errors {result['errors']}"
+        )
+
+    if len(results) > 1 and results[0]["throughput_rps"]:
+        scaling = [r["throughput_rps"] / results[0]["throughput_rps"] for r in results]
+        print("scaling vs 1 client: " + ", ".join(f"{r['clients']}={s:.2f}x" for r, s in zip(results, scaling)))
+        print(f"mean p50 latency: {statistics.mean(r['latency_p50_ms'] for r in results):.1f} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"path": args.path, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Query plan check for bike_trips.
+
+Runs EXPLAIN on the query shapes the API depends on and fails when one of
+them is planned as a sequential scan of bike_trips (or, for /top/{n}, a
+full sort) instead of using the indexes from migrations/.
+
+Usage (from biking-backend/, against a migrated and loaded database):
+    python benchmarks/explain_plans.py
+    python benchmarks/explain_plans.py --disable-seqscan   # tiny dev tables
+"""
+import os
+import sys
+import json
+import argparse
+from typing import Dict, Any, List, Iterator
+
+from sqlalchemy import create_engine, text
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from db import DATABASE_URL
+
+# name -> (query, index names one of which the plan must use)
+PLAN_CHECKS = {
+    "top_n_by_start_time": (
+        "SELECT * FROM bike_trips ORDER BY start_time LIMIT 10",
+        {"ix_bike_trips_start_time_id"},
+    ),
+    "start_time_range": (
+        "SELECT count(*) FROM bike_trips "
+        "WHERE start_time >= (SELECT min(start_time) FROM bike_trips) "
+        "AND start_time < (SELECT min(start_time) FROM bike_trips) + interval '1 day'",
+        {"ix_bike_trips_start_time_id", "brin_bike_trips_start_time"},
+    ),
+    "export_keyset_page": (
+        "SELECT * FROM bike_trips "
+        "WHERE (start_time, id) > ((SELECT min(start_time) FROM bike_trips), 0) "
+        "ORDER BY start_time, id LIMIT 5000",
+        {"ix_bike_trips_start_time_id"},
+    ),
+    "start_station": (
+        "SELECT count(*) FROM bike_trips WHERE start_station_id = 72",
+        {"ix_bike_trips_start_station_id"},
+    ),
+    "station_within_month": (
+        "SELECT count(*) FROM bike_trips "
+        "WHERE start_time >= date_trunc('month', (SELECT min(start_time) FROM bike_trips)) "
+        "AND start_time < date_trunc('month', (SELECT min(start_time) FROM bike_trips)) + interval '1 month' "
+        "AND (start_station_id = 72 OR end_station_id = 72)",
+        {"ix_bike_trips_start_station_id", "ix_bike_trips_end_station_id",
+         "ix_bike_trips_start_time_id", "brin_bike_trips_start_time"},
+    ),
+    "end_station": (
+        "SELECT count(*) FROM bike_trips WHERE end_station_id = 72",
+        {"ix_bike_trips_end_station_id"},
+    ),
+}
+
+
+def _walk(plan: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _walk(child)
+
+
+# Indexes of the monthly partitions, each attached to an index of bike_trips
+PARTITION_INDEXES_SQL = """
+    SELECT child.relname, parent.relname
+    FROM pg_inherits
+    JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+    JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+    WHERE child.relkind = 'i'
+"""
+
+
+def check_plan(plan: Dict[str, Any], indexes: set, parent_indexes: Dict[str, str]) -> List[str]:
+    """Return the problems found in a JSON query plan"""
+    problems = []
+    nodes = list(_walk(plan))
+    for node in nodes:
+        relation = node.get("Relation Name", "")
+        if node["Node Type"] == "Seq Scan" and relation.startswith("bike_trips"):
+            problems.append(f"sequential scan on {relation}")
+    if plan["Node Type"] == "Limit" and any(node["Node Type"] == "Sort" for node in nodes):
+        problems.append("sort under LIMIT")
+    used = {
+        parent_indexes.get(node["Index Name"], node["Index Name"])
+        for node in nodes if node.get("Index Name")
+    }
+    if not used & indexes:
+        problems.append(f"none of {', '.join(sorted(indexes))} used")
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check bike_trips query plans")
+    parser.add_argument("--database-url", default=DATABASE_URL)
+    parser.add_argument("--disable-seqscan", action="store_true",
+                        help="Discourage sequential scans so small tables still show index plans")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    failed = False
+    with engine.connect() as conn:
+        if args.disable_seqscan:
+            conn.execute(text("SET enable_seqscan = off"))
+        parent_indexes = dict(conn.execute(text(PARTITION_INDEXES_SQL)).all())
+        for name, (query, indexes) in PLAN_CHECKS.items():
+            plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {query}")).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            problems = check_plan(plan[0]["Plan"], indexes, parent_indexes)
+            failed = failed or bool(problems)
+            print(f"{'FAIL' if problems else 'ok  '} {name}: {'; '.join(problems) or plan[0]['Plan']['Node Type']}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Accuracy and cost of the distinct bike and station HyperLogLogs.
+
+Builds one sketch per synthetic day of bike ids with the ETL's
+distinct_sketches, from nullable id columns with some ids missing as in
+transformed CSVs, serializes them, unions them back per month and over
+the whole range (as /distinct-counts does) and compares the estimates
+with exact distinct counts of the non-null ids.
+
+Usage (from biking-backend/):
+    python benchmarks/hll_accuracy.py --days 365 --trips-per-day 60000
+
+Set HLL_PRECISION to try another sketch precision.
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app.sketches import HyperLogLog, HLL_PRECISION
+from etl.sketches import distinct_sketches
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Distinct count HyperLogLog accuracy")
+    parser.add_argument("--days", type=int, default=90, help="Days, one sketch each")
+    parser.add_argument("--trips-per-day", type=int, default=50000, help="Mean trips per day")
+    parser.add_argument("--bikes", type=int, default=20000, help="Size of the bike fleet")
+    parser.add_argument("--null-fraction", type=float, default=0.01, help="Share of trips with missing ids")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    # The fleet grows over the period, so later months see bikes earlier ones did not
+    fleet = np.linspace(args.bikes // 2, args.bikes, args.days).astype(np.int64)
+    days = []
+    for day in range(args.days):
+        n = int(rng.integers(args.trips_per_day // 2, args.trips_per_day * 3 // 2))
+        days.append(14000 + rng.integers(0, fleet[day], n))
+
+    # One frame per day shaped like transform_dataframe's output: nullable Int ids, some missing
+    frames = []
+    for day, bikes in enumerate(days):
+        missing = rng.random((3, bikes.size)) < args.null_fraction
+        stations = rng.integers(72, 4000, (2, bikes.size))
+        frames.append(pd.DataFrame({
+            'start_time': pd.Timestamp('2019-01-01') + pd.Timedelta(days=day),
+            'bike_id': pd.Series(bikes, dtype='Int32').mask(missing[0]),
+            'start_station_id': pd.Series(stations[0], dtype='Int16').mask(missing[1]),
+            'end_station_id': pd.Series(stations[1], dtype='Int16').mask(missing[2]),
+        }))
+        days[day] = bikes[~missing[0]]
+
+    started = time.perf_counter()
+    blobs = [
+        distinct_sketches(frame)[(frame['start_time'].iloc[0].date(), 'bike_id')].to_bytes()
+        for frame in frames
+    ]
+    build_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    total = HyperLogLog.union((HyperLogLog.from_bytes(blob) for blob in blobs)).estimate()
+    union_ms = (time.perf_counter() - started) * 1000
+
+    print(f"{sum(map(len, frames))} trips in {args.days} sketches of {len(blobs[0])} bytes; "
+          f"built in {build_seconds:.2f} s, unioned and estimated in {union_ms:.1f} ms")
+    print(f"{'days':>12} {'estimate':>10} {'exact':>10} {'error':>8}")
+    windows = [(lo, min(lo + 30, args.days)) for lo in range(0, args.days, 30)] + [(0, args.days)]
+    for lo, hi in windows:
+        estimate = total if (lo, hi) == (0, args.days) else HyperLogLog.union(
+            (HyperLogLog.from_bytes(blob) for blob in blobs[lo:hi])
+        ).estimate()
+        exact = np.unique(np.concatenate(days[lo:hi])).size
+        print(f"{f'{lo}-{hi}':>12} {estimate:>10} {exact:>10} {(estimate - exact) / exact:>8.2%}")
+
+
+if __name__ == "__main__":
+    main()
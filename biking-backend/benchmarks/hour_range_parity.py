@@ -0,0 +1,117 @@
+"""
+Parity check of the hour range statistic engines.
+
+Computes /hour-range-stats with every engine in crud.HOUR_RANGE_ENGINES and
+compares each result with the original generate_series/tsrange overlap
+query, kept below as REFERENCE_SQL, over the same window. Fails when any
+engine disagrees with it on any hour bucket.
+
+The rollup holds totals only, so it is compared on the whole table; a
+snapshot is only compared when it holds the current dataset version
+(otherwise the snapshot engine falls back to the arithmetic one).
+
+Usage (from biking-backend/, against a migrated and loaded database):
+    python benchmarks/hour_range_parity.py
+    python benchmarks/hour_range_parity.py --start 2019-06-01 --end 2019-07-01 --station-id 72
+"""
+import os
+import sys
+import asyncio
+import argparse
+from datetime import datetime
+from typing import Dict, List
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+import crud, schemas
+from db import get_async_sessionmaker
+
+# The hour range query the engines replaced: one row per trip and offset
+# hour, counted where the trip's [start, stop) range overlaps the hour.
+# tsrange rejects stop_time < start_time, so those trips (which no engine
+# counts) are left out.
+REFERENCE_SQL = """
+    WITH rides AS (
+        SELECT date_trunc('hour', start_time) AS start_hour,
+               tsrange(start_time, stop_time, '[)') AS ride_range
+        FROM bike_trips
+        WHERE stop_time >= start_time {conditions}
+    )
+    SELECT mod(extract(hour FROM start_hour)::int + offset_hour, 24) AS bucket_hour,
+           count(*) AS ride_count
+    FROM rides
+    CROSS JOIN generate_series(0, 23) AS offset_hour
+    WHERE ride_range && tsrange(start_hour + make_interval(hours => offset_hour),
+                                start_hour + make_interval(hours => offset_hour + 1), '[)')
+    GROUP BY bucket_hour
+    ORDER BY bucket_hour
+"""
+
+
+async def reference_counts(db: AsyncSession, filters: schemas.TripFilters) -> Dict[int, int]:
+    """Rides per hour of the day from REFERENCE_SQL"""
+    conditions, params = [], {}
+    if filters.start is not None:
+        conditions.append("start_time >= :start")
+        params["start"] = filters.start
+    if filters.end is not None:
+        conditions.append("start_time < :end")
+        params["end"] = filters.end
+    if filters.station_id is not None:
+        conditions.append("(start_station_id = :station_id OR end_station_id = :station_id)")
+        params["station_id"] = filters.station_id
+    sql = REFERENCE_SQL.format(conditions="".join(f" AND {condition}" for condition in conditions))
+    rows = (await db.execute(text(sql), params)).all()
+    return {int(row.bucket_hour): int(row.ride_count) for row in rows}
+
+
+def differences(expected: Dict[int, int], result: dict) -> List[str]:
+    """Hours where an engine's result differs from the reference"""
+    actual = {int(hour): int(count) for hour, count in zip(result["hour_bucket"], result["count"])}
+    return [
+        f"hour {hour}: {actual.get(hour, 0)} != {expected.get(hour, 0)}"
+        for hour in range(24) if actual.get(hour, 0) != expected.get(hour, 0)
+    ]
+
+
+async def check(windows: List[schemas.TripFilters]) -> bool:
+    failed = False
+    async with get_async_sessionmaker()() as db:
+        # The reference query is the slow one being replaced; do not let the API timeout cut it short
+        await db.execute(text("SET statement_timeout = 0"))
+        for filters in windows:
+            label = ", ".join(f"{key}={value}" for key, value in filters.model_dump(exclude_none=True).items()) or "all trips"
+            expected = await reference_counts(db, filters)
+            print(f"{label}: {sum(expected.values())} trip-hours in the reference")
+            for engine in crud.HOUR_RANGE_ENGINES:
+                if engine == "rollup" and crud.trip_filter_clauses(filters):
+                    continue
+                if engine == "snapshot" and await crud.current_snapshot(db) is None:
+                    print(f"skip {engine}: no snapshot of the current dataset version")
+                    continue
+                problems = differences(expected, await crud.get_trip_hourrange_stats(db, engine, filters))
+                failed = failed or bool(problems)
+                print(f"{'FAIL' if problems else 'ok  '} {engine}{': ' + '; '.join(problems) if problems else ''}")
+    return not failed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check the hour range engines against the tsrange query")
+    parser.add_argument("--start", type=datetime.fromisoformat, help="Window start (inclusive)")
+    parser.add_argument("--end", type=datetime.fromisoformat, help="Window end (exclusive)")
+    parser.add_argument("--station-id", type=int, help="Only trips starting or ending at this station")
+    args = parser.parse_args()
+
+    windows = [schemas.TripFilters()]
+    window = schemas.TripFilters(start=args.start, end=args.end, station_id=args.station_id)
+    if crud.trip_filter_clauses(window):
+        windows.append(window)
+
+    sys.exit(0 if asyncio.run(check(windows)) else 1)
+
+
+if __name__ == "__main__":
+    main()
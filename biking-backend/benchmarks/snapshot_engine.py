@@ -0,0 +1,92 @@
+"""
+Microbenchmark of the trip snapshot engine.
+
+Writes a synthetic snapshot of --rows trips with etl.snapshot's writer
+into a temporary directory, maps it the way an API worker does and times
+the computations behind /count, /hour-range-stats and /trip-duration-stats
+with no filters, a one-month range and a station filter. No database is
+needed; compare with the SQL engines through benchmarks/api_concurrency.py.
+
+Usage (from biking-backend/):
+    python benchmarks/snapshot_engine.py --rows 20000000 --repeat 5
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+import crud, schemas
+from snapshot import SnapshotStore
+from etl.snapshot import write_snapshot_frames
+
+YEAR_START_US = int(datetime(2019, 1, 1).timestamp()) * 1000000
+YEAR_US = 365 * 24 * 3600 * 1000000
+
+
+def synthetic_frames(rows: int, chunk: int = 1000000, seed: int = 0):
+    """Frames in the snapshot layout with trips spread evenly over 2019"""
+    rng = np.random.default_rng(seed)
+    for lo in range(0, rows, chunk):
+        n = min(chunk, rows - lo)
+        start = YEAR_START_US + (np.arange(lo, lo + n, dtype=np.int64) * YEAR_US) // rows
+        duration = rng.gamma(2.0, 500.0, n).astype(np.int64) + 60
+        yield pd.DataFrame({
+            "start_us": start,
+            "stop_us": start + duration * 1000000,
+            "tripduration": duration,
+            "start_station_id": rng.integers(72, 3500, n),
+            "end_station_id": rng.integers(72, 3500, n),
+            "user_type": rng.choice(["Subscriber", "Customer"], n, p=[0.9, 0.1]),
+            "gender": rng.integers(0, 3, n),
+        })
+
+
+def measure(func, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Trip snapshot engine microbenchmark")
+    parser.add_argument("--rows", type=int, default=5000000, help="Trips in the synthetic snapshot")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed repetitions per query")
+    args = parser.parse_args()
+
+    snapshot_dir = tempfile.mkdtemp(prefix="trip-snapshot-")
+    try:
+        started = time.perf_counter()
+        write_snapshot_frames(synthetic_frames(args.rows), args.rows, 1, snapshot_dir)
+        print(f"wrote {args.rows} rows in {time.perf_counter() - started:.1f} s")
+
+        snapshot = SnapshotStore(snapshot_dir, check_interval=0).current()
+        edges = [int(upper * 3600) for upper, _ in crud.DURATION_BINS]
+        cases = {
+            "all": None,
+            "one month": schemas.TripFilters(start=datetime(2019, 6, 1), end=datetime(2019, 7, 1)),
+            "station": schemas.TripFilters(station_id=500),
+        }
+        for name, filters in cases.items():
+            count = measure(lambda: snapshot.count(filters), args.repeat)
+            hours = measure(lambda: snapshot.hour_span_counts(filters), args.repeat)
+            durations = measure(lambda: snapshot.duration_histogram(edges, filters), args.repeat)
+            print(f"{name:>10}: count {count:8.1f} ms  hour-range {hours:8.1f} ms  duration {durations:8.1f} ms")
+    finally:
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+"""
+End-to-end benchmark suite.
+
+Generates (or reuses) synthetic Citi Bike files with synthetic_trips.py,
+runs them through the ETL stages against the local database, starts the
+API from this working tree and times its endpoints, then records peak
+resident memory of both. Results are written as JSON; --compare flags
+metrics that got worse than an earlier run by more than --threshold
+percent and exits with status 1, so a change to etl/transform.py,
+etl/load.py or crud.py can be checked before and after.
+
+The load stage empties bike_trips and every table derived from it first:
+point DATABASE_URL at a database used for benchmarking only.
+
+Usage (from biking-backend/, with a migrated local Postgres):
+    python benchmarks/suite.py --rows 1000000 --output before.json
+    python benchmarks/suite.py --rows 1000000 --output after.json --compare before.json
+"""
+import os
+import sys
+import json
+import time
+import socket
+import logging
+import argparse
+import platform
+import resource
+import statistics
+import tempfile
+import subprocess
+from datetime import date, datetime, timezone
+from typing import Dict, Any, Callable, Iterable, Iterator, List, Optional
+
+import requests
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import synthetic_trips
+from etl.extract import iter_csv_chunks, CHUNK_SIZE
+from etl.transform import transform_dataframe
+from etl.ledger import file_fingerprint
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# name -> path, timed with the response cache disabled; {month} and {next_month} are the first loaded month
+ENDPOINTS = {
+    "count": "/count",
+    "count_exact": "/count?mode=exact",
+    "count_month": "/count?start={month}&end={next_month}",
+    "hour_range_rollup": "/hour-range-stats?engine=rollup",
+    "hour_range_arithmetic": "/hour-range-stats?engine=arithmetic",
+    "duration_stats": "/trip-duration-stats",
+    "duration_stats_station": "/trip-duration-stats?station_id={station_id}",
+    "duration_percentiles": "/trip-duration-percentiles?p=50&p=95&p=99",
+    "distinct_counts_month": "/distinct-counts?granularity=month",
+    "stations_top": "/stations/top?k=20",
+    "od_matrix": "/stations/od-matrix?limit=1000",
+    "top_100": "/top/100",
+    "export_10k": "/export?limit=10000",
+}
+# Only timed when the snapshot stage ran
+SNAPSHOT_ENDPOINTS = {
+    "count_snapshot_month": "/count?mode=snapshot&start={month}&end={next_month}",
+    "hour_range_snapshot": "/hour-range-stats?engine=snapshot",
+    "duration_stats_snapshot": "/trip-duration-stats?engine=snapshot",
+}
+
+# Absolute changes below these are noise, whatever the percentage
+NOISE_FLOORS = {"seconds": 0.05, "ms": 2.0, "mb": 8.0}
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far (ru_maxrss is KiB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def process_peak_rss_mb(pid: int) -> Optional[float]:
+    """Peak resident set size of another process from /proc, or None where unavailable"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 2**10
+    except OSError:
+        pass
+    return None
+
+
+class StageTimer:
+    """Wall time per ETL stage, accumulated across chunks and files"""
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    def call(self, stage: str, func: Callable, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.add(stage, time.perf_counter() - started)
+
+    def iterate(self, stage: str, iterable: Iterable) -> Iterator:
+        """Yield from iterable, charging the time spent producing each item to stage"""
+        iterator = iter(iterable)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.add(stage, time.perf_counter() - started)
+            yield item
+
+
+def run_etl(paths: List[str], chunk_size: int, load: bool, snapshot: bool) -> Dict[str, Any]:
+    """Extract, transform and (optionally) load every file, then rebuild rollups and write a snapshot"""
+    timer = StageTimer()
+    rss = {}
+    rows = 0
+
+    if load:
+        from etl.load import load_chunks_to_database, clear_existing_data, rebuild_rollups
+        timer.call("clear", clear_existing_data)
+
+    for path in paths:
+        transformed = (
+            timer.call("transform", transform_dataframe, chunk)
+            for chunk in timer.iterate("extract", iter_csv_chunks(path, chunk_size))
+        )
+        if load:
+            started = time.perf_counter()
+            before = dict(timer.seconds)
+            rows += load_chunks_to_database(transformed, fingerprint=file_fingerprint(path))
+            # The loader pulls chunks through extract and transform; charge it only for its own time
+            pulled = sum(timer.seconds.get(stage, 0.0) - before.get(stage, 0.0) for stage in ("extract", "transform"))
+            timer.add("load", time.perf_counter() - started - pulled)
+        else:
+            rows += sum(len(chunk) for chunk in transformed)
+    rss["etl"] = peak_rss_mb()
+
+    if load:
+        timer.call("rebuild_rollups", rebuild_rollups)
+        if snapshot:
+            from etl.snapshot import write_snapshot
+            timer.call("snapshot", write_snapshot, force=True)
+        rss["etl_maintenance"] = peak_rss_mb()
+
+    # Throughput only means something for the stages every row goes through
+    per_row = ("extract", "transform", "load")
+    stages = {
+        stage: {"seconds": seconds, "rows_per_s": rows / seconds if seconds and stage in per_row else None}
+        for stage, seconds in timer.seconds.items()
+    }
+    return {"rows": rows, "stages": stages, "rss_mb": rss}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_api(port: int) -> subprocess.Popen:
+    """Run uvicorn on this working tree's app with the response cache disabled"""
+    env = dict(os.environ, STATS_CACHE_MAX_ENTRIES="0")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=os.path.join(BACKEND_DIR, "app"), env=env,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"API exited with status {process.returncode}")
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/ping", timeout=1).ok:
+                return process
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("API did not start within 60 s")
+
+
+def time_endpoint(session: requests.Session, url: str, repeat: int) -> Dict[str, Any]:
+    """Median, p95 and minimum latency of a GET, after one warm-up request"""
+    session.get(url, timeout=300).raise_for_status()
+    timings = []
+    size = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = session.get(url, timeout=300)
+        response.raise_for_status()
+        size = len(response.content)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        "median_ms": statistics.median(timings),
+        "p95_ms": timings[min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))],
+        "min_ms": timings[0],
+        "bytes": size,
+    }
+
+
+def run_api(base_url: str, repeat: int, params: Dict[str, Any], snapshot: bool) -> Dict[str, Any]:
+    endpoints = dict(ENDPOINTS, **(SNAPSHOT_ENDPOINTS if snapshot else {}))
+    session = requests.Session()
+    results = {}
+    for name, path in endpoints.items():
+        try:
+            results[name] = time_endpoint(session, base_url + path.format(**params), repeat)
+        except requests.RequestException as e:
+            results[name] = {"error": str(e)}
+    return results
+
+
+def metrics_of(result: Dict[str, Any]) -> Dict[str, float]:
+    """Flat name -> value map of the compared metrics, all lower-is-better"""
+    metrics = {}
+    for stage, timing in result.get("etl", {}).get("stages", {}).items():
+        metrics[f"etl.{stage}.seconds"] = timing["seconds"]
+    for name, timing in result.get("api", {}).items():
+        if "median_ms" in timing:
+            metrics[f"api.{name}.median_ms"] = timing["median_ms"]
+    for name, value in result.get("rss_mb", {}).items():
+        if value is not None:
+            metrics[f"rss.{name}.mb"] = value
+    return metrics
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Print every metric next to its baseline and return the names of regressions"""
+    if result["params"] != baseline.get("params"):
+        print(f"warning: parameters differ from the baseline ({baseline.get('params')}), results may not be comparable")
+    current, before = metrics_of(result), metrics_of(baseline)
+    regressions = []
+    print(f"{'metric':<45} {'baseline':>12} {'current':>12} {'change':>9}")
+    for name, value in current.items():
+        old = before.get(name)
+        if old is None:
+            print(f"{name:<45} {'-':>12} {value:>12.2f}")
+            continue
+        change = (value - old) / old * 100 if old else 0.0
+        floor = NOISE_FLOORS[name.rsplit(".", 1)[-1].split("_")[-1]]
+        regressed = change > threshold and value - old > floor
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<45} {old:>12.2f} {value:>12.2f} {change:>+8.1f}%{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ETL and API benchmark suite on synthetic trips")
+    parser.add_argument("--rows", type=int, default=1000000, help="Synthetic trips (10k to 50M)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--months", type=int, default=12, help="Months of data, one file each")
+    parser.add_argument("--data-dir", help="Directory of the synthetic files (default <tmp>/synthetic-trips-<rows>)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Rows per extract chunk")
+    parser.add_argument("--repeat", type=int, default=10, help="Timed requests per endpoint")
+    parser.add_argument("--skip-load", action="store_true", help="Only extract and transform; no database needed")
+    parser.add_argument("--skip-api", action="store_true", help="Do not benchmark the API")
+    parser.add_argument("--skip-snapshot", action="store_true", help="Do not write or query the trip snapshot")
+    parser.add_argument("--api-url", help="Benchmark an already running API instead of starting one")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Percent slowdown reported as a regression")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    params = {"rows": args.rows, "seed": args.seed, "months": args.months, "chunk_size": args.chunk_size}
+    # Kept between runs: files generated with the same parameters are reused
+    data_dir = args.data_dir or os.path.join(tempfile.gettempdir(), f"synthetic-trips-{args.rows}")
+    result: Dict[str, Any] = {
+        "params": params,
+        "environment": {
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "started_at": datetime.now(timezone.utc).isoformat(),
+        },
+        "rss_mb": {},
+    }
+
+    # Generated in a child process, so its memory does not count towards the ETL's peak RSS
+    started = time.perf_counter()
+    subprocess.run([sys.executable, synthetic_trips.__file__, "--rows", str(args.rows), "--seed", str(args.seed),
+                    "--months", str(args.months), "--output-dir", data_dir], check=True)
+    result["generate_seconds"] = time.perf_counter() - started
+    paths = [os.path.join(data_dir, f"{first:%Y%m}-citibike-tripdata.csv")
+             for first in synthetic_trips.month_starts(date(2019, 1, 1), args.months)]
+
+    snapshot = not args.skip_snapshot and not args.skip_load
+    etl = run_etl(paths, args.chunk_size, load=not args.skip_load, snapshot=snapshot)
+    result["etl"] = etl
+    result["rss_mb"].update({f"{name}_peak": value for name, value in etl["rss_mb"].items()})
+    for stage, timing in etl["stages"].items():
+        rate = f" ({timing['rows_per_s']:.0f} rows/s)" if timing["rows_per_s"] else ""
+        print(f"etl {stage:>16}: {timing['seconds']:8.2f} s{rate}")
+
+    if not args.skip_api and not args.skip_load:
+        first = synthetic_trips.month_starts(date(2019, 1, 1), 2)
+        url_params = {"month": first[0].isoformat(), "next_month": first[1].isoformat(),
+                      "station_id": synthetic_trips.StationNetwork(850, args.seed).ids[0]}
+        process = None
+        if args.api_url:
+            base_url = args.api_url.rstrip("/")
+        else:
+            port = _free_port()
+            process = start_api(port)
+            base_url = f"http://127.0.0.1:{port}"
+        try:
+            result["api"] = run_api(base_url, args.repeat, url_params, snapshot)
+            if process is not None:
+                result["rss_mb"]["api_peak"] = process_peak_rss_mb(process.pid)
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=30)
+        for name, timing in result["api"].items():
+            if "error" in timing:
+                print(f"api {name:>24}: error {timing['error']}")
+            else:
+                print(f"api {name:>24}: median {timing['median_ms']:8.1f} ms  p95 {timing['p95_ms']:8.1f} ms")
+
+    for name, value in result["rss_mb"].items():
+        if value is not None:
+            print(f"rss {name:>24}: {value:8.1f} MiB")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2, default=str)
+        print(f"results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) over {args.threshold:.0f}%: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
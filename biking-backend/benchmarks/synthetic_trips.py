@@ -0,0 +1,251 @@
+"""
+Deterministic synthetic Citi Bike trip data.
+
+Writes monthly CSV files (YYYYMM-citibike-tripdata.csv) with the headers
+of etl.schema.TRIP_SCHEMA, so they go through extract and transform like
+the real files. The data is shaped after the real system rather than
+uniform noise:
+
+- stations cluster around Midtown, with lognormal popularity
+- end stations favour stations near the start, with some round trips
+- trips follow the seasons, with weekday commute peaks and flatter weekends
+- durations follow distance and rider speed, with a long tail of bikes
+  returned hours or days later
+- bike, user type, birth year and gender mixes resemble the 2019 files
+
+Each day is generated from its own seed, so the same --seed, --rows,
+--start and --months always produce byte-identical files, whatever the
+chunking.
+
+Usage (from biking-backend/):
+    python benchmarks/synthetic_trips.py --rows 1000000 --output-dir /tmp/synthetic-trips
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import date, timedelta
+from typing import Iterator, List
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from etl.schema import TRIP_SCHEMA
+
+# Written next to the files, so a later run can reuse data generated with the same parameters
+PARAMS_FILE = "synthetic.json"
+
+CSV_COLUMNS = [spec["source"] for spec in TRIP_SCHEMA]
+# Timestamps are written with millisecond precision, e.g. 2019-01-01 00:01:47.401
+ARROW_TYPES = {"int": pa.int64(), "float": pa.float64(), "category": pa.string(), "datetime": pa.timestamp("ms")}
+CSV_SCHEMA = pa.schema([(spec["source"], ARROW_TYPES[spec["kind"]]) for spec in TRIP_SCHEMA])
+
+MIDTOWN = (40.754, -73.984)
+KM_PER_DEGREE_LAT = 111.0
+KM_PER_DEGREE_LON = 84.3
+
+# Share of trips per hour of day
+WEEKDAY_HOURS = np.array([
+    0.6, 0.3, 0.2, 0.1, 0.2, 0.8, 2.5, 6.0, 9.0, 6.0, 3.8, 3.8,
+    4.2, 4.2, 4.3, 5.0, 6.8, 9.5, 8.5, 6.0, 4.0, 3.0, 2.2, 1.3,
+])
+WEEKEND_HOURS = np.array([
+    1.5, 1.1, 0.7, 0.4, 0.3, 0.3, 0.6, 1.2, 2.6, 4.2, 5.8, 6.8,
+    7.4, 7.6, 7.6, 7.4, 7.0, 6.5, 5.6, 4.5, 3.5, 2.8, 2.2, 1.7,
+])
+AVENUES = ["1 Ave", "2 Ave", "3 Ave", "Lexington Ave", "Park Ave", "Madison Ave", "5 Ave",
+           "6 Ave", "7 Ave", "8 Ave", "9 Ave", "10 Ave", "11 Ave", "12 Ave", "Broadway"]
+
+
+def month_starts(start: date, months: int) -> List[date]:
+    """First day of each month from start"""
+    firsts = []
+    year, month = start.year, start.month
+    for _ in range(months):
+        firsts.append(date(year, month, 1))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return firsts
+
+
+def day_weights(days: List[date]) -> np.ndarray:
+    """Relative ridership of each day: summer peak, winter trough, quieter weekends"""
+    day_of_year = np.array([day.timetuple().tm_yday for day in days])
+    weekend = np.array([day.weekday() >= 5 for day in days])
+    seasonal = 1 + 0.55 * np.sin(2 * np.pi * (day_of_year - 110) / 365)
+    return seasonal * np.where(weekend, 0.75, 1.0)
+
+
+def split_rows(rows: int, weights: np.ndarray) -> np.ndarray:
+    """Split rows in proportion to weights, exactly, by largest remainder"""
+    shares = weights / weights.sum() * rows
+    counts = np.floor(shares).astype(np.int64)
+    counts[np.argsort(counts - shares)[:rows - counts.sum()]] += 1
+    return counts
+
+
+class StationNetwork:
+    """Stations with coordinates and popularity, and where trips from each one end"""
+
+    def __init__(self, stations: int, seed: int):
+        rng = np.random.default_rng([seed, 0])
+        self.ids = np.sort(rng.choice(np.arange(72, 4200), stations, replace=False))
+        self.lat = np.round(MIDTOWN[0] + rng.normal(0, 0.035, stations), 8)
+        self.lon = np.round(MIDTOWN[1] + rng.normal(0, 0.02, stations), 8)
+        self.names = np.array([
+            f"{'E' if lon > MIDTOWN[1] else 'W'} {max(1, int((lat - 40.70) * 1000))} St & {AVENUES[i % len(AVENUES)]}"
+            for i, (lat, lon) in enumerate(zip(self.lat, self.lon))
+        ], dtype=object)
+
+        midtown_km = self.distance_km(MIDTOWN[0], MIDTOWN[1], self.lat, self.lon)
+        popularity = rng.lognormal(0, 0.8, stations) * np.exp(-midtown_km / 5)
+        self.start_cdf = np.cumsum(popularity) / popularity.sum()
+
+        # Destinations: popular stations within a couple of kilometres, round trips now and then
+        self.distances = self.distance_km(self.lat[:, None], self.lon[:, None], self.lat, self.lon)
+        weights = popularity[None, :] * np.exp(-self.distances / 0.8)
+        np.fill_diagonal(weights, np.diag(weights) * 0.5)
+        cdf = np.cumsum(weights, axis=1)
+        cdf /= cdf[:, -1:]
+        # Row s of the end station cdf offset by s, so one searchsorted serves every start station
+        self.end_cdf = (cdf + np.arange(stations)[:, None]).ravel()
+
+    @staticmethod
+    def distance_km(lat1, lon1, lat2, lon2):
+        return np.hypot((lat2 - lat1) * KM_PER_DEGREE_LAT, (lon2 - lon1) * KM_PER_DEGREE_LON)
+
+    def sample(self, rng: np.random.Generator, n: int):
+        """Start and end station indexes of n trips"""
+        stations = self.ids.size
+        start = np.minimum(np.searchsorted(self.start_cdf, rng.random(n), side="right"), stations - 1)
+        flat = np.searchsorted(self.end_cdf, start + rng.random(n), side="right")
+        end = np.clip(flat - start * stations, 0, stations - 1)
+        return start, end
+
+
+def generate_day(network: StationNetwork, day: date, n: int, bikes: int, seed: int) -> pd.DataFrame:
+    """n trips starting on day, sorted by start time, with the CSV column names"""
+    rng = np.random.default_rng([seed, day.toordinal()])
+    hours = WEEKEND_HOURS if day.weekday() >= 5 else WEEKDAY_HOURS
+    hour = rng.choice(24, n, p=hours / hours.sum())
+    start_ms = np.sort(hour * 3600000 + rng.integers(0, 3600000, n))
+
+    start, end = network.sample(rng, n)
+    subscriber = rng.random(n) < np.where(day.weekday() >= 5, 0.78, 0.9)
+
+    # Ride at a rider-dependent speed along streets, plus docking and stops
+    distance = network.distances[start, end] * 1.35
+    speed = rng.lognormal(np.log(np.where(subscriber, 11.5, 8.5)), 0.25)
+    duration = distance / speed * 3600 + rng.gamma(2.0, 60.0, n) + 60
+    round_trip = start == end
+    duration[round_trip] = rng.gamma(1.6, 1100.0, int(round_trip.sum())) + 60
+    late = rng.random(n) < 0.0008
+    duration[late] *= rng.uniform(20, 400, int(late.sum()))
+    duration = np.round(duration).astype(np.int64)
+
+    # Citi Bike's default birth year shows up as a spike at 1969
+    birth_year = np.clip(np.round(rng.normal(1982, 11.5, n)), 1900, day.year - 16).astype(np.int64)
+    birth_year[rng.random(n) < np.where(subscriber, 0.02, 0.45)] = 1969
+    gender = np.where(
+        subscriber,
+        rng.choice(3, n, p=[0.03, 0.72, 0.25]),
+        rng.choice(3, n, p=[0.55, 0.28, 0.17]),
+    )
+
+    starttime = np.datetime64(day, "ms") + start_ms.astype("timedelta64[ms]")
+    stoptime = starttime + (duration * 1000 + rng.integers(0, 1000, n)).astype("timedelta64[ms]")
+    return pd.DataFrame({
+        "tripduration": duration,
+        "starttime": starttime,
+        "stoptime": stoptime,
+        "start station id": network.ids[start],
+        "start station name": network.names[start],
+        "start station latitude": network.lat[start],
+        "start station longitude": network.lon[start],
+        "end station id": network.ids[end],
+        "end station name": network.names[end],
+        "end station latitude": network.lat[end],
+        "end station longitude": network.lon[end],
+        "bikeid": 14529 + rng.integers(0, bikes, n),
+        "usertype": np.where(subscriber, "Subscriber", "Customer"),
+        "birth year": birth_year,
+        "gender": gender,
+    })[CSV_COLUMNS]
+
+
+def iter_month(network: StationNetwork, first: date, rows: int, bikes: int, seed: int,
+               chunk_rows: int = 1000000) -> Iterator[pd.DataFrame]:
+    """Trips of one month in start time order, in frames of whole days of about chunk_rows rows"""
+    days = [first + timedelta(days=i) for i in range(31) if (first + timedelta(days=i)).month == first.month]
+    counts = split_rows(rows, day_weights(days))
+    frames, pending = [], 0
+    for day, n in zip(days, counts):
+        frames.append(generate_day(network, day, int(n), bikes, seed))
+        pending += n
+        if pending >= chunk_rows:
+            yield pd.concat(frames, ignore_index=True)
+            frames, pending = [], 0
+    if frames:
+        yield pd.concat(frames, ignore_index=True)
+
+
+def generate(output_dir: str, rows: int, seed: int = 0, start: date = date(2019, 1, 1), months: int = 12,
+             stations: int = 850, bikes: int = 18000) -> List[str]:
+    """
+    Write rows synthetic trips as one CSV per month into output_dir,
+    reusing the files of an earlier run with the same parameters
+
+    Returns:
+        List[str]: Paths of the CSV files
+    """
+    params = {"rows": rows, "seed": seed, "start": start.isoformat(), "months": months,
+              "stations": stations, "bikes": bikes}
+    firsts = month_starts(start, months)
+    paths = [os.path.join(output_dir, f"{first:%Y%m}-citibike-tripdata.csv") for first in firsts]
+    params_path = os.path.join(output_dir, PARAMS_FILE)
+    if os.path.exists(params_path) and all(os.path.exists(path) for path in paths):
+        with open(params_path) as f:
+            if json.load(f) == params:
+                return paths
+
+    os.makedirs(output_dir, exist_ok=True)
+    network = StationNetwork(stations, seed)
+    days = [first + timedelta(days=i) for first in firsts for i in range(31)
+            if (first + timedelta(days=i)).month == first.month]
+    weights = day_weights(days)
+    month_weights = np.array([weights[[day.replace(day=1) == first for day in days]].sum() for first in firsts])
+    for first, path, month_rows in zip(firsts, paths, split_rows(rows, month_weights)):
+        # Arrow's writer is about ten times faster than DataFrame.to_csv and quotes like the real files
+        with pa_csv.CSVWriter(path, CSV_SCHEMA) as writer:
+            for frame in iter_month(network, first, int(month_rows), bikes, seed):
+                writer.write_table(pa.Table.from_pandas(frame, schema=CSV_SCHEMA, preserve_index=False))
+    with open(params_path, "w") as f:
+        json.dump(params, f)
+    return paths
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate synthetic Citi Bike trip CSV files")
+    parser.add_argument("--rows", type=int, default=1000000, help="Total trips (10k to 50M)")
+    parser.add_argument("--output-dir", required=True,
+                        help="Directory for the CSV files (data/ itself is where the DAG picks files up)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--start", type=date.fromisoformat, default=date(2019, 1, 1), help="First month")
+    parser.add_argument("--months", type=int, default=12, help="Months, one file each")
+    parser.add_argument("--stations", type=int, default=850)
+    parser.add_argument("--bikes", type=int, default=18000, help="Size of the bike fleet")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    paths = generate(args.output_dir, args.rows, args.seed, args.start, args.months, args.stations, args.bikes)
+    size = sum(os.path.getsize(path) for path in paths)
+    print(f"{args.rows} trips in {len(paths)} files ({size / 2**20:.1f} MiB) "
+          f"in {time.perf_counter() - started:.1f} s under {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
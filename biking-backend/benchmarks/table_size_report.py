@@ -0,0 +1,128 @@
+"""
+Storage and scan report for bike_trips.
+
+Measures the on-disk size of bike_trips (all monthly partitions, split into
+heap, TOAST and indexes) and of the stations dimension, then times the full
+scans the stats endpoints run. Results are printed and can be written as
+JSON, so a run before a schema change can be compared with one after it.
+
+Usage (from biking-backend/, against a migrated and loaded database):
+    python benchmarks/table_size_report.py --output before.json
+    alembic upgrade head        # then reload or VACUUM FULL the partitions
+    python benchmarks/table_size_report.py --compare before.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+from typing import Dict, Any, Optional
+
+from sqlalchemy import create_engine, text
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from db import DATABASE_URL
+
+# Sizes of a table and its partitions; a plain table is its own only part
+SIZE_SQL = """
+    WITH parts AS (
+        SELECT inhrelid AS oid FROM pg_inherits WHERE inhparent = to_regclass(:table)
+        UNION ALL
+        SELECT to_regclass(:table) WHERE to_regclass(:table) IS NOT NULL
+    )
+    SELECT coalesce(sum(pg_relation_size(oid)), 0) AS heap_bytes,
+           coalesce(sum(pg_table_size(oid) - pg_relation_size(oid)), 0) AS toast_bytes,
+           coalesce(sum(pg_indexes_size(oid)), 0) AS index_bytes,
+           coalesce(sum(pg_total_relation_size(oid)), 0) AS total_bytes
+    FROM parts
+"""
+
+# name -> query timed as a full scan of bike_trips
+SCAN_QUERIES = {
+    "count": "SELECT count(*) FROM bike_trips",
+    "duration_stats": "SELECT avg(tripduration), min(tripduration), max(tripduration) FROM bike_trips",
+    "hour_of_day": (
+        "SELECT extract(hour FROM start_time) AS hour, count(*) "
+        "FROM bike_trips GROUP BY 1"
+    ),
+}
+
+
+def table_size(conn, table: str) -> Dict[str, int]:
+    """Heap, TOAST, index and total bytes of a table across its partitions"""
+    row = conn.execute(text(SIZE_SQL), {"table": table}).mappings().one()
+    return {key: int(value) for key, value in row.items()}
+
+
+def time_query(conn, sql: str, repeat: int) -> Dict[str, float]:
+    """Median and minimum wall time of a query in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.execute(text(sql)).all()
+        timings.append(time.perf_counter() - started)
+    return {"median_ms": statistics.median(timings) * 1000, "min_ms": min(timings) * 1000}
+
+
+def collect(repeat: int, parallel: bool) -> Dict[str, Any]:
+    engine = create_engine(DATABASE_URL)
+    with engine.connect() as conn:
+        if not parallel:
+            conn.execute(text("SET max_parallel_workers_per_gather = 0"))
+        rows = conn.execute(text("SELECT count(*) FROM bike_trips")).scalar()
+        sizes = {table: table_size(conn, table) for table in ("bike_trips", "stations")}
+        trips = sizes["bike_trips"]
+        return {
+            "rows": rows,
+            "sizes": sizes,
+            "heap_bytes_per_row": trips["heap_bytes"] / rows if rows else None,
+            "scans": {name: time_query(conn, sql, repeat) for name, sql in SCAN_QUERIES.items()},
+        }
+
+
+def _change(before: Optional[float], after: Optional[float]) -> str:
+    if not before or after is None:
+        return ""
+    return f"  ({(after - before) / before * 100:+.1f}%)"
+
+
+def report(result: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> None:
+    baseline = baseline or {}
+    print(f"rows: {result['rows']}")
+    for table, sizes in result["sizes"].items():
+        before = baseline.get("sizes", {}).get(table, {})
+        for key, value in sizes.items():
+            print(f"{table:>10} {key:>12}: {value / 2**20:10.1f} MiB{_change(before.get(key), value)}")
+    if result["heap_bytes_per_row"] is not None:
+        print(f"heap bytes per row: {result['heap_bytes_per_row']:.1f}"
+              f"{_change(baseline.get('heap_bytes_per_row'), result['heap_bytes_per_row'])}")
+    for name, timing in result["scans"].items():
+        before = baseline.get("scans", {}).get(name, {})
+        print(f"{name:>15}: median {timing['median_ms']:9.1f} ms  min {timing['min_ms']:9.1f} ms"
+              f"{_change(before.get('median_ms'), timing['median_ms'])}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="bike_trips storage and scan report")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed repetitions per scan")
+    parser.add_argument("--parallel", action="store_true", help="Allow parallel workers in the scans")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    result = collect(args.repeat, args.parallel)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    report(result, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
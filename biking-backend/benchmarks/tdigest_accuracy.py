@@ -0,0 +1,67 @@
+"""
+Accuracy and cost of the trip duration t-digests.
+
+Builds one digest per synthetic day of trip durations (as the ETL does),
+serializes them, merges them back (as /trip-duration-percentiles does) and
+compares the estimated percentiles with exact ones. Rank error is the
+difference between the requested quantile and the true quantile of the
+estimate, which is what the t-digest bounds.
+
+Usage (from biking-backend/):
+    python benchmarks/tdigest_accuracy.py --days 365 --trips-per-day 60000
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from sketches import TDigest, TDIGEST_COMPRESSION
+
+PERCENTILES = [0.1, 1, 5, 25, 50, 75, 95, 99, 99.9, 99.99]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Trip duration t-digest accuracy")
+    parser.add_argument("--days", type=int, default=90, help="Days, one digest each")
+    parser.add_argument("--trips-per-day", type=int, default=50000, help="Mean trips per day")
+    parser.add_argument("--compression", type=int, default=TDIGEST_COMPRESSION, help="t-digest compression")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    days = []
+    for _ in range(args.days):
+        n = int(rng.integers(args.trips_per_day // 2, args.trips_per_day * 3 // 2))
+        # Mostly short rides with a long tail of bikes returned days later
+        durations = rng.gamma(1.5, 600, n) + 60
+        durations[rng.random(n) < 0.001] *= 100
+        days.append(durations.astype(np.int64))
+
+    started = time.perf_counter()
+    blobs = [TDigest.from_values(day, args.compression).to_bytes() for day in days]
+    build_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    merged = TDigest.merge_all((TDigest.from_bytes(blob) for blob in blobs), args.compression)
+    estimates = merged.quantiles([p / 100 for p in PERCENTILES])
+    merge_ms = (time.perf_counter() - started) * 1000
+
+    values = np.sort(np.concatenate(days))
+    print(f"{values.size} trips in {args.days} digests of {np.mean([len(b) for b in blobs]):.0f} bytes; "
+          f"built in {build_seconds:.2f} s, merged and queried in {merge_ms:.1f} ms")
+    print(f"{'percentile':>10} {'estimate':>12} {'exact':>12} {'rank error':>11}")
+    for percentile, estimate in zip(PERCENTILES, estimates):
+        exact = np.quantile(values, percentile / 100)
+        low = np.searchsorted(values, estimate, side="left") / values.size
+        high = np.searchsorted(values, estimate, side="right") / values.size
+        # Ties: any rank the estimate's value occupies counts as exact
+        error = max(0.0, low - percentile / 100, percentile / 100 - high)
+        print(f"{percentile:>10} {estimate:>12.1f} {exact:>12.1f} {error:>11.5f}")
+
+
+if __name__ == "__main__":
+    main()
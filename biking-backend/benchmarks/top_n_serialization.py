@@ -0,0 +1,100 @@
+"""
+Microbenchmark of the /top/{n} response path.
+
+Compares, for the same rows and without a database:
+  orm      - ORM instances validated through schemas.TopNResponse
+             (from_attributes) and rendered by FastAPI's JSON response,
+             the path /top/{n} used before
+  tuples   - plain row tuples zipped with column names and encoded with
+             orjson, the current path
+Both payloads are checked to decode to the same JSON.
+
+Usage (from biking-backend/):
+    python benchmarks/top_n_serialization.py --n 1000 --repeat 50
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+from datetime import datetime, timedelta, timezone
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+import crud, models, schemas
+
+
+def make_rows(n: int) -> list:
+    """Synthetic bike_trips_detailed rows in crud.TRIP_COLUMNS order"""
+    start = datetime(2019, 1, 1)
+    rows = []
+    for i in range(n):
+        values = {
+            "id": i + 1,
+            "tripduration": 300 + i,
+            "start_time": start + timedelta(seconds=17 * i, microseconds=401000),
+            "stop_time": start + timedelta(seconds=17 * i + 300 + i),
+            "start_station_id": 72 + i % 50,
+            "start_station_name": f"W {52 + i % 50} St & 11 Ave",
+            "start_station_latitude": 40.76727216,
+            "start_station_longitude": -73.99392888,
+            "end_station_id": 505 + i % 40,
+            "end_station_name": f"6 Ave & W {33 + i % 40} St",
+            "end_station_latitude": 40.74901271,
+            "end_station_longitude": -73.98848395,
+            "bike_id": 30000 + i,
+            "user_type": "Subscriber",
+            "birth_year": 1980 + i % 30,
+            "gender": i % 3,
+            "created_at": datetime(2024, 1, 1, tzinfo=timezone.utc),
+            "updated_at": None,
+        }
+        rows.append(tuple(values[column.name] for column in crud.TRIP_COLUMNS))
+    return rows
+
+
+def orm_path(rows: list) -> bytes:
+    names = [column.name for column in crud.TRIP_COLUMNS]
+    records = [models.BikeTripDetail(**dict(zip(names, row))) for row in rows]
+    response = schemas.TopNResponse(records=records, count=len(records))
+    return JSONResponse(content=jsonable_encoder(response)).body
+
+
+def tuple_path(rows: list) -> bytes:
+    names = [column.name for column in crud.TRIP_COLUMNS]
+    payload = {"records": [dict(zip(names, row)) for row in rows], "count": len(rows)}
+    return orjson.dumps(payload, option=orjson.OPT_UTC_Z)
+
+
+def measure(func, rows: list, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(rows)
+        timings.append(time.perf_counter() - started)
+    return {"median_ms": statistics.median(timings) * 1000, "min_ms": min(timings) * 1000}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="/top/{n} serialization microbenchmark")
+    parser.add_argument("--n", type=int, default=1000, help="Rows per response")
+    parser.add_argument("--repeat", type=int, default=50, help="Timed repetitions per path")
+    args = parser.parse_args()
+
+    rows = make_rows(args.n)
+    if json.loads(orm_path(rows)) != json.loads(tuple_path(rows)):
+        raise SystemExit("The two paths produce different JSON")
+
+    results = {"orm": measure(orm_path, rows, args.repeat), "tuples": measure(tuple_path, rows, args.repeat)}
+    for name, result in results.items():
+        print(f"{name:>7}: median {result['median_ms']:8.2f} ms  min {result['min_ms']:8.2f} ms")
+    print(f"speedup: {results['orm']['median_ms'] / results['tuples']['median_ms']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,34 @@
 import pandas as pd
 import os
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator
+
+from etl.schema import build_read_options
 
 logger = logging.getLogger(__name__)
 
+# Rows read per chunk when streaming CSV files
+CHUNK_SIZE = int(os.getenv("ETL_CHUNK_SIZE", "200000"))
+
+def read_options(file_path: str, typed: bool = True) -> Dict[str, Any]:
+    """
+    Build schema-driven pd.read_csv arguments for a trip file
+    
+    Args:
+        file_path: Path to the CSV file
+        typed: Request explicit numeric dtypes from the parser
+        
+    Returns:
+        Dict[str, Any]: usecols and dtype arguments
+    """
+    header = list(pd.read_csv(file_path, nrows=0).columns)
+    return build_read_options(header, typed)
+
 def extract_csv_data(file_path: str) -> pd.DataFrame:
     """
-    Extract data from CSV files
+    Extract data from CSV files. Only the columns in the trip schema are
+    parsed, with explicit dtypes and categorical station names and user
+    types; files with malformed numbers fall back to text numeric columns.
     
     Args:
         file_path: Path to the CSV file
@@ -20,7 +41,11 @@ def extract_csv_data(file_path: str) -> pd.DataFrame:
             raise FileNotFoundError(f"CSV file not found: {file_path}")
         
         logger.info(f"Extracting data from {file_path}")
-        df = pd.read_csv(file_path)
+        try:
+            df = pd.read_csv(file_path, **read_options(file_path))
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Typed parse of {file_path} failed ({str(e)}), reading numeric columns as text")
+            df = pd.read_csv(file_path, **read_options(file_path, typed=False))
         
         logger.info(f"Successfully extracted {len(df)} records from {file_path}")
         return df
@@ -67,6 +92,73 @@ def extract_multiple_csvs(directory_path: str) -> Optional[pd.DataFrame]:
         raise
         
 
+def list_csv_files(directory_path: str) -> List[str]:
+    """
+    List the CSV files in a directory in a stable order
+    
+    Args:
+        directory_path: Path to directory containing CSV files
+        
+    Returns:
+        List[str]: Full paths of the CSV files
+    """
+    if not os.path.exists(directory_path):
+        raise FileNotFoundError(f"Directory not found: {directory_path}")
+
+    csv_files = sorted(f for f in os.listdir(directory_path) if f.endswith('.csv'))
+    return [os.path.join(directory_path, f) for f in csv_files]
+
+def iter_csv_chunks(file_path: str, chunk_size: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """
+    Stream a CSV file as dataframes of at most chunk_size rows
+    
+    Args:
+        file_path: Path to the CSV file
+        chunk_size: Rows per chunk (defaults to CHUNK_SIZE)
+        
+    Yields:
+        pd.DataFrame: Next chunk of the file
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"CSV file not found: {file_path}")
+
+    logger.info(f"Streaming data from {file_path} in chunks of {chunk_size} rows")
+    yielded = 0
+    try:
+        with pd.read_csv(file_path, chunksize=chunk_size, **read_options(file_path)) as reader:
+            for chunk in reader:
+                yielded += len(chunk)
+                yield chunk
+    except (ValueError, TypeError) as e:
+        # Resume after the rows already yielded with numeric columns read as text
+        logger.warning(f"Typed parse of {file_path} failed ({str(e)}), reading numeric columns as text")
+        options = read_options(file_path, typed=False)
+        with pd.read_csv(file_path, chunksize=chunk_size, skiprows=range(1, yielded + 1), **options) as reader:
+            for chunk in reader:
+                yield chunk
+
+def iter_multiple_csvs(directory_path: str, chunk_size: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """
+    Stream every CSV file in a directory chunk by chunk, so peak memory is
+    bounded by chunk_size rather than by the total input size
+    
+    Args:
+        directory_path: Path to directory containing CSV files
+        chunk_size: Rows per chunk (defaults to CHUNK_SIZE)
+        
+    Yields:
+        pd.DataFrame: Next chunk across all files
+    """
+    csv_files = list_csv_files(directory_path)
+    if not csv_files:
+        logger.warning(f"No CSV files found in {directory_path}")
+        return
+
+    logger.info(f"Found {len(csv_files)} CSV files in {directory_path}")
+    for file_path in csv_files:
+        yield from iter_csv_chunks(file_path, chunk_size)
+
 def validate_dataframe(df: pd.DataFrame, required_columns: List[str]) -> bool:
     """
     Validate that the dataframe has required columns
@@ -0,0 +1,120 @@
+import os
+import sys
+import hashlib
+import logging
+from typing import Dict, Any, List, Optional
+from sqlalchemy.orm import Session
+
+# Add the app directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from app.models import IngestedFile
+
+logger = logging.getLogger(__name__)
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+def compute_content_hash(file_path: str) -> str:
+    """
+    Compute the SHA-256 digest of a file without loading it into memory
+
+    Args:
+        file_path: Path to the file
+
+    Returns:
+        str: Hex digest of the file contents
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def file_fingerprint(file_path: str, content_hash: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Build the ledger key of a file from its path, size, mtime and content hash
+
+    Args:
+        file_path: Path to the file
+        content_hash: Precomputed content hash (computed when omitted)
+
+    Returns:
+        Dict[str, Any]: JSON-serializable fingerprint
+    """
+    stat = os.stat(file_path)
+    return {
+        "path": os.path.abspath(file_path),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "content_hash": content_hash or compute_content_hash(file_path),
+    }
+
+def filter_new_files(db: Session, file_paths: List[str]) -> List[Dict[str, Any]]:
+    """
+    Return fingerprints of the files that are not in the ingestion ledger.
+    A file whose path, size and mtime match a ledger entry is skipped without
+    being read; otherwise its content hash is compared so renamed or touched
+    copies of an ingested file are skipped as well.
+
+    Args:
+        db: Database session
+        file_paths: Candidate CSV files
+
+    Returns:
+        List[Dict[str, Any]]: Fingerprints of files that still need ingesting
+    """
+    pending = []
+    for file_path in file_paths:
+        stat = os.stat(file_path)
+        path = os.path.abspath(file_path)
+
+        seen = db.query(IngestedFile.id).filter(
+            IngestedFile.file_path == path,
+            IngestedFile.file_size == stat.st_size,
+            IngestedFile.file_mtime == stat.st_mtime,
+        ).first()
+        if seen:
+            logger.info(f"Skipping {file_path}: already ingested")
+            continue
+
+        content_hash = compute_content_hash(file_path)
+        seen = db.query(IngestedFile.id).filter(IngestedFile.content_hash == content_hash).first()
+        if seen:
+            logger.info(f"Skipping {file_path}: identical content already ingested")
+            continue
+
+        pending.append(file_fingerprint(file_path, content_hash))
+
+    logger.info(f"{len(pending)} of {len(file_paths)} CSV files need ingesting")
+    return pending
+
+def is_file_ingested(db: Session, fingerprint: Dict[str, Any]) -> bool:
+    """
+    Check whether a file with the fingerprint's content hash is in the ledger
+
+    Args:
+        db: Database session
+        fingerprint: Fingerprint returned by file_fingerprint
+
+    Returns:
+        bool: True if the file's rows have already been committed
+    """
+    seen = db.query(IngestedFile.id).filter(IngestedFile.content_hash == fingerprint["content_hash"]).first()
+    return seen is not None
+
+def record_ingested_file(db: Session, fingerprint: Dict[str, Any], row_count: int) -> None:
+    """
+    Add a ledger entry for a file within the caller's transaction
+
+    Args:
+        db: Database session
+        fingerprint: Fingerprint returned by file_fingerprint
+        row_count: Number of rows loaded from the file
+    """
+    db.add(IngestedFile(
+        file_path=fingerprint["path"],
+        file_size=fingerprint["size"],
+        file_mtime=fingerprint["mtime"],
+        content_hash=fingerprint["content_hash"],
+        row_count=row_count,
+    ))
@@ -1,74 +1,283 @@
 import os
+import io
 import sys
+import time
 import logging
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
+from datetime import date
+from typing import Optional, Iterable, List, Dict, Any
+from sqlalchemy import create_engine, text, func
+from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.dialects.postgresql import insert
 import pandas as pd
 
 # Add the app directory to the Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'app'))
 
-from app.models import BikeTrip, Base
-from app.db import DATABASE_URL
+from app.models import (
+    BikeTrip, IngestedFile, TripHourRollup, StationPairDayRollup, TripDurationSketch, TripDistinctSketch,
+    DatasetVersion,
+)
+from app.db import DATABASE_URL, upgrade_database
+from etl.schema import INT_COLUMNS, FLOAT_COLUMNS
+from etl.ledger import filter_new_files, is_file_ingested, record_ingested_file
+from etl.rollups import (
+    update_hour_rollup, rebuild_hour_rollup, update_station_pair_rollup, rebuild_station_pair_rollup,
+    add_trip_count, rebuild_trip_count,
+)
+from etl.partitions import ensure_partitions, months_in, clear_partition, month_window, next_month
+from etl.stations import upsert_stations
+from etl.metrics import etl_metrics
+from etl.sketches import (
+    update_duration_sketches, rebuild_duration_sketches, update_distinct_sketches, rebuild_distinct_sketches,
+)
 
 logger = logging.getLogger(__name__)
 
-def load_to_database(df: pd.DataFrame, clear_existing: bool = True) -> bool:
+# Load method used when none is given: 'copy' streams rows with COPY FROM STDIN,
+# 'orm' builds one BikeTrip object per row
+LOAD_METHOD = os.getenv("ETL_LOAD_METHOD", "copy")
+
+# Number of rows serialized and sent per COPY statement
+COPY_BATCH_SIZE = int(os.getenv("ETL_COPY_BATCH_SIZE", "100000"))
+
+# Column order of the bike_trips rows written by the loader; station names
+# and coordinates go to the stations dimension instead
+TRIP_COLUMNS = [
+    'tripduration', 'start_time', 'stop_time',
+    'start_station_id', 'end_station_id',
+    'bike_id', 'user_type', 'birth_year', 'gender',
+]
+
+# Marker written for NULL values so that empty strings survive the COPY as ''
+COPY_NULL = r'\N'
+
+def prepare_copy_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Coerce a transformed dataframe into the column layout written by COPY.
+    Applies the same null rules as the per-row ORM loader: a missing
+    tripduration becomes 0, integer columns become nullable Int64 and
+    columns absent from the dataframe are left out so they load as NULL.
+    
+    Args:
+        df: Transformed dataframe
+        
+    Returns:
+        pd.DataFrame: Dataframe restricted to bike_trips columns in load order
+    """
+    columns = [c for c in TRIP_COLUMNS if c in df.columns or c == 'tripduration']
+    prepared = pd.DataFrame(index=df.index)
+
+    for col in columns:
+        if col not in df.columns:
+            prepared[col] = pd.Series(0, index=df.index, dtype='Int64')
+        elif col in INT_COLUMNS:
+            prepared[col] = pd.to_numeric(df[col], errors='coerce').astype('Int64')
+        elif col in FLOAT_COLUMNS:
+            prepared[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+        else:
+            prepared[col] = df[col]
+
+    prepared['tripduration'] = prepared['tripduration'].fillna(0)
+    return prepared
+
+def copy_dataframe(db: Session, df: pd.DataFrame, batch_size: Optional[int] = None) -> int:
+    """
+    Stream a transformed dataframe into bike_trips with COPY FROM STDIN.
+    Rows are serialized in batches of batch_size so only one CSV buffer is
+    held in memory at a time. The caller owns the transaction.
+    
+    Args:
+        db: Active database session
+        df: Transformed dataframe
+        batch_size: Rows per COPY statement (defaults to COPY_BATCH_SIZE)
+        
+    Returns:
+        int: Number of rows copied
+    """
+    batch_size = batch_size or COPY_BATCH_SIZE
+    prepared = prepare_copy_frame(df)
+    copy_sql = (
+        f"COPY {BikeTrip.__tablename__} ({', '.join(prepared.columns)}) "
+        f"FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')"
+    )
+
+    cursor = db.connection().connection.cursor()
+    try:
+        copied = 0
+        for start in range(0, len(prepared), batch_size):
+            batch = prepared.iloc[start:start + batch_size]
+            buffer = io.StringIO()
+            batch.to_csv(buffer, index=False, header=False, na_rep=COPY_NULL)
+            buffer.seek(0)
+            cursor.copy_expert(copy_sql, buffer)
+            copied += len(batch)
+            logger.info(f"Copied {copied}/{len(prepared)} records")
+        return copied
+    finally:
+        cursor.close()
+
+def _build_orm_records(df: pd.DataFrame) -> list:
+    """Convert dataframe rows into BikeTrip ORM objects"""
+    records = []
+    for _, row in df.iterrows():
+        record = BikeTrip(
+            tripduration=int(row['tripduration']) if pd.notna(row.get('tripduration')) else 0,
+            start_time=row.get('start_time'),
+            stop_time=row.get('stop_time'),
+            start_station_id=int(row['start_station_id']) if pd.notna(row.get('start_station_id')) else None,
+            end_station_id=int(row['end_station_id']) if pd.notna(row.get('end_station_id')) else None,
+            bike_id=int(row['bike_id']) if pd.notna(row.get('bike_id')) else None,
+            user_type=row.get('user_type'),
+            birth_year=int(row['birth_year']) if pd.notna(row.get('birth_year')) else None,
+            gender=int(row['gender']) if pd.notna(row.get('gender')) else None,
+        )
+        records.append(record)
+    return records
+
+_SessionLocal = None
+
+def _create_session() -> Session:
+    """Create a database session, applying pending migrations on first use"""
+    global _SessionLocal
+    if _SessionLocal is None:
+        engine = create_engine(DATABASE_URL)
+        
+        # Bring the schema up to date; migrations/ owns the tables
+        upgrade_database(DATABASE_URL)
+        
+        _SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    
+    return _SessionLocal()
+
+def _resolve_method(method: Optional[str]) -> str:
+    """Return the load method to use, validating explicit choices"""
+    method = method or LOAD_METHOD
+    if method not in ('copy', 'orm'):
+        raise ValueError(f"Unknown load method: {method}")
+    return method
+
+def _bump_dataset_version(db: Session) -> None:
+    """Increment the dataset version the API uses to invalidate cached stats"""
+    stmt = insert(DatasetVersion).values(id=1, version=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DatasetVersion.id],
+        set_={"version": DatasetVersion.version + 1, "updated_at": func.now()},
+    )
+    db.execute(stmt)
+
+def _clear_existing(db: Session) -> None:
+    """Delete all bike_trips rows together with the ledger and rollups derived from them"""
+    logger.info("Clearing existing bike_trips data")
+    # TRUNCATE empties every partition at once instead of deleting row by row
+    db.execute(text(f"TRUNCATE {BikeTrip.__tablename__}"))
+    db.query(IngestedFile).delete()
+    db.query(TripHourRollup).delete()
+    db.query(StationPairDayRollup).delete()
+    db.query(TripDurationSketch).delete()
+    db.query(TripDistinctSketch).delete()
+    rebuild_trip_count(db)
+    _bump_dataset_version(db)
+    db.commit()
+
+def _clear_months(db: Session, months: Iterable[date], drop: bool = False) -> int:
+    """Empty the partitions of the given months and repair the rollups derived from them"""
+    removed = 0
+    for month in months:
+        removed += clear_partition(db, month, drop=drop)
+        rebuild_hour_rollup(db, *month_window(month))
+        rebuild_station_pair_rollup(db, month, next_month(month))
+        rebuild_duration_sketches(db, month, next_month(month))
+        rebuild_distinct_sketches(db, month, next_month(month))
+    if removed:
+        add_trip_count(db, -removed)
+    return removed
+
+def clear_month(month: date, drop: bool = False) -> int:
+    """
+    Remove all trips that start in one month by truncating its partition,
+    or detaching and dropping it when drop is True
+    
+    Args:
+        month: Any day of the month to clear
+        drop: Detach and drop the partition instead of truncating it
+        
+    Returns:
+        int: Number of trips removed
+    """
+    db = _create_session()
+    try:
+        removed = _clear_months(db, [date(month.year, month.month, 1)], drop=drop)
+        _bump_dataset_version(db)
+        db.commit()
+        return removed
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def clear_existing_data() -> None:
+    """Delete all loaded trips and ledger entries so every file is ingested again"""
+    db = _create_session()
+    try:
+        _clear_existing(db)
+    finally:
+        db.close()
+
+def _write_rows(db: Session, df: pd.DataFrame, method: str, batch_size: Optional[int] = None,
+                source: str = '') -> int:
+    """Write a transformed dataframe into bike_trips, its rollups and sketches within the current transaction"""
+    ensure_partitions(db, months_in(df))
+    upsert_stations(db, df)
+
+    if method == 'copy':
+        written = copy_dataframe(db, df, batch_size)
+    else:
+        # Convert dataframe to database records
+        records = _build_orm_records(df)
+
+        # Bulk insert records
+        logger.info(f"Inserting {len(records)} records into database")
+        db.add_all(records)
+        written = len(records)
+
+    update_hour_rollup(db, df)
+    update_station_pair_rollup(db, df)
+    update_duration_sketches(db, df, source)
+    update_distinct_sketches(db, df)
+    add_trip_count(db, written)
+    return written
+
+def load_to_database(df: pd.DataFrame, clear_existing: bool = True, method: Optional[str] = None,
+                     batch_size: Optional[int] = None) -> bool:
     """
     Load transformed data into PostgreSQL database
     
     Args:
         df: Transformed dataframe
         clear_existing: Whether to clear existing data before loading
+        method: 'copy' for COPY FROM STDIN or 'orm' for per-row inserts (defaults to LOAD_METHOD)
+        batch_size: Rows per COPY statement when method is 'copy'
         
     Returns:
         bool: True if successful
     """
     try:
-        logger.info(f"Starting database load for {len(df)} records")
+        method = _resolve_method(method)
+        logger.info(f"Starting database load for {len(df)} records using {method}")
         
-        # Create database engine and session
-        engine = create_engine(DATABASE_URL)
-        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-        
-        # Create tables if they don't exist
-        Base.metadata.create_all(bind=engine)
-        
-        db = SessionLocal()
+        db = _create_session()
         
         try:
             # Clear existing data if requested
             if clear_existing:
-                logger.info("Clearing existing bike_trips data")
-                db.query(BikeTrip).delete()
-                db.commit()
-
-            # Convert dataframe to database records
-            records = []
-            for _, row in df.iterrows():
-                record = BikeTrip(
-                    tripduration=int(row['tripduration']) if pd.notna(row.get('tripduration')) else 0,
-                    start_time=row.get('start_time'),
-                    stop_time=row.get('stop_time'),
-                    start_station_id=int(row['start_station_id']) if pd.notna(row.get('start_station_id')) else None,
-                    start_station_name=row.get('start_station_name'),
-                    start_station_latitude=float(row['start_station_latitude']) if pd.notna(row.get('start_station_latitude')) else None,
-                    start_station_longitude=float(row['start_station_longitude']) if pd.notna(row.get('start_station_longitude')) else None,
-                    end_station_id=int(row['end_station_id']) if pd.notna(row.get('end_station_id')) else None,
-                    end_station_name=row.get('end_station_name'),
-                    end_station_latitude=float(row['end_station_latitude']) if pd.notna(row.get('end_station_latitude')) else None,
-                    end_station_longitude=float(row['end_station_longitude']) if pd.notna(row.get('end_station_longitude')) else None,
-                    bike_id=int(row['bike_id']) if pd.notna(row.get('bike_id')) else None,
-                    user_type=row.get('user_type'),
-                    birth_year=int(row['birth_year']) if pd.notna(row.get('birth_year')) else None,
-                    gender=int(row['gender']) if pd.notna(row.get('gender')) else None,
-                )
-                records.append(record)
+                _clear_existing(db)
 
-            # Bulk insert records
-            logger.info(f"Inserting {len(records)} records into database")
-            db.add_all(records)
+            started = time.perf_counter()
+            rows = _write_rows(db, df, method, batch_size)
+            _bump_dataset_version(db)
             db.commit()
+            etl_metrics.record('load', rows, time.perf_counter() - started)
             
             logger.info("Successfully loaded data into database")
             return True
@@ -85,6 +294,131 @@ def load_to_database(df: pd.DataFrame, clear_existing: bool = True) -> bool:
         logger.error(f"Error loading data to database: {str(e)}")
         raise
 
+def load_chunks_to_database(chunks: Iterable[pd.DataFrame], clear_existing: bool = False,
+                            method: Optional[str] = None, batch_size: Optional[int] = None,
+                            fingerprint: Optional[Dict[str, Any]] = None,
+                            replace_months: Optional[Iterable[date]] = None,
+                            drop_partitions: bool = False) -> int:
+    """
+    Load a stream of transformed dataframes into PostgreSQL in one transaction.
+    Only the chunk currently being written is held in memory.
+    
+    With replace_months the partitions of those months are emptied in the
+    same transaction first, so readers see either the old or the new month.
+    
+    Args:
+        chunks: Iterable of transformed dataframes
+        clear_existing: Whether to clear existing data before loading
+        method: 'copy' for COPY FROM STDIN or 'orm' for per-row inserts (defaults to LOAD_METHOD)
+        batch_size: Rows per COPY statement when method is 'copy'
+        fingerprint: Source file fingerprint; its ledger entry is committed with the rows
+        replace_months: First day of each month whose trips the load replaces
+        drop_partitions: Detach and drop the replaced partitions instead of truncating them
+        
+    Returns:
+        int: Total number of rows loaded
+    """
+    try:
+        method = _resolve_method(method)
+        logger.info(f"Starting streaming database load using {method}")
+
+        db = _create_session()
+
+        try:
+            if clear_existing:
+                _clear_existing(db)
+
+            if replace_months:
+                _clear_months(db, replace_months, drop=drop_partitions)
+                if fingerprint is not None:
+                    # A reload may bring back the very same file
+                    db.query(IngestedFile).filter(
+                        (IngestedFile.file_path == fingerprint['path'])
+                        | (IngestedFile.content_hash == fingerprint['content_hash'])
+                    ).delete(synchronize_session=False)
+
+            # A retried task may reach a file that an earlier attempt already committed
+            if fingerprint is not None and is_file_ingested(db, fingerprint):
+                logger.info(f"Skipping {fingerprint['path']}: already ingested")
+                return 0
+
+            # Duration sketches are kept per source file and day
+            source = os.path.basename(fingerprint['path']) if fingerprint is not None else ''
+            total_rows = 0
+            total_seconds = 0.0
+            for chunk in chunks:
+                started = time.perf_counter()
+                rows = _write_rows(db, chunk, method, batch_size, source)
+                if method == 'orm':
+                    db.flush()
+                    db.expunge_all()
+                elapsed = time.perf_counter() - started
+                etl_metrics.record('load', rows, elapsed)
+                total_rows += rows
+                total_seconds += elapsed
+                logger.info(
+                    f"[load] chunk of {rows} rows in {elapsed:.2f}s "
+                    f"({rows / elapsed if elapsed else 0:.0f} rows/s)"
+                )
+
+            if fingerprint is not None:
+                record_ingested_file(db, fingerprint, total_rows)
+
+            if total_rows or replace_months:
+                _bump_dataset_version(db)
+
+            db.commit()
+            logger.info(
+                f"[load] loaded {total_rows} rows in {total_seconds:.2f}s "
+                f"({total_rows / total_seconds if total_seconds else 0:.0f} rows/s)"
+            )
+            return total_rows
+
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Database transaction failed: {str(e)}")
+            raise
+
+        finally:
+            db.close()
+
+    except Exception as e:
+        logger.error(f"Error loading data to database: {str(e)}")
+        raise
+
+def rebuild_rollups() -> None:
+    """Recompute the rollup tables from bike_trips, e.g. after loading data outside the ETL"""
+    db = _create_session()
+    try:
+        rebuild_hour_rollup(db)
+        rebuild_station_pair_rollup(db)
+        rebuild_duration_sketches(db)
+        rebuild_distinct_sketches(db)
+        rebuild_trip_count(db)
+        _bump_dataset_version(db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def get_pending_files(file_paths: List[str]) -> List[Dict[str, Any]]:
+    """
+    Check CSV files against the ingestion ledger
+    
+    Args:
+        file_paths: Candidate CSV files
+        
+    Returns:
+        List[Dict[str, Any]]: Fingerprints of files that have not been ingested yet
+    """
+    db = _create_session()
+    try:
+        return filter_new_files(db, file_paths)
+    finally:
+        db.close()
+
 def validate_database_connection() -> bool:
     """
     Validate database connection
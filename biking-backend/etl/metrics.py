@@ -0,0 +1,201 @@
+import os
+import sys
+import time
+import logging
+import resource
+import functools
+from typing import Callable, Dict, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# node_exporter textfile collector directory; each task writes <job>_<task>.prom there
+METRICS_TEXTFILE_DIR = os.getenv("ETL_METRICS_TEXTFILE_DIR")
+
+# Pushgateway base URL, e.g. http://pushgateway:9091; each task pushes its own group
+METRICS_PUSHGATEWAY_URL = os.getenv("ETL_METRICS_PUSHGATEWAY_URL")
+
+METRICS_JOB = os.getenv("ETL_METRICS_JOB", "biking_etl")
+
+# Upper bounds (seconds) of the per-chunk latency histogram buckets
+CHUNK_SECONDS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+def peak_memory_bytes() -> int:
+    """
+    Peak resident set size of this process or of its largest finished
+    child (parallel pipeline workers), whichever is higher
+
+    Returns:
+        int: Peak RSS in bytes
+    """
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    unit = 1 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) * unit
+
+class StageMetrics:
+    """Rows, bytes, wall time, chunk latencies and peak memory of one ETL stage"""
+
+    def __init__(self):
+        self.rows = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.chunks = 0
+        self.bucket_counts = [0] * len(CHUNK_SECONDS_BUCKETS)
+        self.peak_memory = 0
+
+    def observe(self, rows: int, seconds: float, bytes_read: int = 0) -> None:
+        self.rows += rows
+        self.bytes += bytes_read
+        self.seconds += seconds
+        self.chunks += 1
+        for i, bound in enumerate(CHUNK_SECONDS_BUCKETS):
+            if seconds <= bound:
+                self.bucket_counts[i] += 1
+        self.peak_memory = max(self.peak_memory, peak_memory_bytes())
+
+class EtlMetrics:
+    """
+    Metrics of the ETL stages run by the current task process. Values
+    describe the task's latest run and are published when it ends, to a
+    textfile for node_exporter and/or to a Prometheus Pushgateway, so they
+    outlive the short-lived Airflow task process.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, StageMetrics] = {}
+
+    def reset(self) -> None:
+        """Forget the stages recorded by an earlier task in this process"""
+        self.stages = {}
+
+    def record(self, stage: str, rows: int, seconds: float, bytes_read: int = 0) -> None:
+        """
+        Record one chunk (or file) processed by a stage
+
+        Args:
+            stage: Stage name, e.g. extract, transform, load or move
+            rows: Rows the chunk held
+            seconds: Wall time spent on the chunk
+            bytes_read: Bytes of input read for the chunk
+        """
+        self.stages.setdefault(stage, StageMetrics()).observe(rows, seconds, bytes_read)
+
+    def add_bytes(self, stage: str, bytes_read: int) -> None:
+        """Count input bytes read by a stage whose chunks are recorded separately"""
+        self.stages.setdefault(stage, StageMetrics()).bytes += bytes_read
+
+    def render(self, success: bool, labels: Optional[Dict[str, str]] = None) -> str:
+        """
+        Render the metrics in the Prometheus text exposition format
+
+        Args:
+            success: Whether the task finished without raising
+            labels: Extra labels added to every sample (e.g. task for textfiles)
+
+        Returns:
+            str: Exposition text
+        """
+        labels = labels or {}
+
+        def sample(name: str, value: float, **extra: str) -> str:
+            merged = {**labels, **extra}
+            label_text = ",".join(f'{key}="{label}"' for key, label in merged.items())
+            return f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}"
+
+        lines = []
+
+        def family(name: str, kind: str, help_text: str) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        gauges = [
+            ("etl_stage_rows", "Rows processed by the stage", lambda m: m.rows),
+            ("etl_stage_duration_seconds", "Wall time spent in the stage", lambda m: m.seconds),
+            ("etl_stage_rows_per_second", "Stage throughput", lambda m: m.rows / m.seconds if m.seconds else 0.0),
+            ("etl_stage_bytes_read", "Input bytes read by the stage", lambda m: m.bytes),
+            ("etl_stage_peak_memory_bytes", "Peak RSS of the process running the stage", lambda m: m.peak_memory),
+        ]
+        for name, help_text, value in gauges:
+            family(name, "gauge", f"{help_text} in the task's last run")
+            for stage, metrics in self.stages.items():
+                lines.append(sample(name, value(metrics), stage=stage))
+
+        family("etl_stage_chunk_duration_seconds", "histogram", "Latency of the chunks or files a stage processed")
+        for stage, metrics in self.stages.items():
+            for bound, count in zip(CHUNK_SECONDS_BUCKETS, metrics.bucket_counts):
+                lines.append(sample("etl_stage_chunk_duration_seconds_bucket", count, stage=stage, le=str(bound)))
+            lines.append(sample("etl_stage_chunk_duration_seconds_bucket", metrics.chunks, stage=stage, le="+Inf"))
+            lines.append(sample("etl_stage_chunk_duration_seconds_sum", metrics.seconds, stage=stage))
+            lines.append(sample("etl_stage_chunk_duration_seconds_count", metrics.chunks, stage=stage))
+
+        family("etl_task_success", "gauge", "1 if the task's last run succeeded, 0 if it failed")
+        lines.append(sample("etl_task_success", int(success)))
+        family("etl_task_last_run_timestamp_seconds", "gauge", "Unix time the task's last run ended")
+        lines.append(sample("etl_task_last_run_timestamp_seconds", time.time()))
+        family("etl_task_peak_memory_bytes", "gauge", "Peak RSS of the task process")
+        lines.append(sample("etl_task_peak_memory_bytes", peak_memory_bytes()))
+        return "\n".join(lines) + "\n"
+
+    def publish(self, task: str, success: bool = True) -> None:
+        """
+        Write the metrics to ETL_METRICS_TEXTFILE_DIR and/or push them to
+        ETL_METRICS_PUSHGATEWAY_URL. Publishing failures are logged and
+        never fail the task.
+
+        Args:
+            task: Task the metrics belong to, one file or push group each
+            success: Whether the task finished without raising
+        """
+        if METRICS_TEXTFILE_DIR:
+            try:
+                os.makedirs(METRICS_TEXTFILE_DIR, exist_ok=True)
+                path = os.path.join(METRICS_TEXTFILE_DIR, f"{METRICS_JOB}_{task}.prom")
+                # node_exporter may read at any time: write aside, then rename atomically
+                with open(f"{path}.tmp", "w") as f:
+                    f.write(self.render(success, {"task": task}))
+                os.replace(f"{path}.tmp", path)
+            except OSError as e:
+                logger.warning(f"Could not write ETL metrics to {METRICS_TEXTFILE_DIR}: {str(e)}")
+
+        if METRICS_PUSHGATEWAY_URL:
+            # job and task come from the grouping key; PUT replaces the task's previous group
+            url = f"{METRICS_PUSHGATEWAY_URL.rstrip('/')}/metrics/job/{METRICS_JOB}/task/{task}"
+            try:
+                response = requests.put(
+                    url, data=self.render(success).encode(),
+                    headers={"Content-Type": "text/plain; version=0.0.4"}, timeout=10,
+                )
+                response.raise_for_status()
+            except requests.RequestException as e:
+                logger.warning(f"Could not push ETL metrics to {url}: {str(e)}")
+
+# Metrics of the current task process
+etl_metrics = EtlMetrics()
+
+def publish_task_metrics(task: str) -> Callable:
+    """
+    Decorate an Airflow task callable so the stages it runs are published
+    as the task's metrics when it returns or raises
+
+    Args:
+        task: Task name used for the textfile and the push group
+
+    Returns:
+        Callable: Decorator
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            etl_metrics.reset()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                etl_metrics.publish(task, success=False)
+                raise
+            etl_metrics.publish(task)
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,113 @@
+import os
+import sys
+import logging
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, Tuple
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# Add the app directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from app.models import BikeTrip
+
+logger = logging.getLogger(__name__)
+
+def month_start(value) -> date:
+    """Return the first day of the month containing value"""
+    value = pd.Timestamp(value)
+    return date(value.year, value.month, 1)
+
+def next_month(month: date) -> date:
+    """Return the first day of the month after month"""
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+def partition_name(month: date) -> str:
+    """Name of the bike_trips partition holding trips that start in month"""
+    return f"{BikeTrip.__tablename__}_y{month.year:04d}m{month.month:02d}"
+
+def months_in(df: pd.DataFrame) -> List[date]:
+    """
+    List the distinct start_time months of a transformed dataframe
+
+    Args:
+        df: Dataframe with a start_time column
+
+    Returns:
+        List[date]: First day of each month, ascending
+    """
+    months = np.unique(df['start_time'].dropna().to_numpy(dtype='datetime64[M]'))
+    return [month_start(month) for month in months]
+
+def ensure_partitions(db: Session, months: Iterable[date]) -> List[str]:
+    """
+    Create the bike_trips partitions for the given months if missing, within
+    the caller's transaction. Creating a partition locks bike_trips until
+    commit, so existing partitions are looked up first and left alone.
+
+    Args:
+        db: Database session
+        months: First day of each month to cover
+
+    Returns:
+        List[str]: Names of the partitions created
+    """
+    created = []
+    for month in months:
+        name = partition_name(month)
+        if db.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is not None:
+            continue
+        logger.info(f"Creating partition {name}")
+        db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {BikeTrip.__tablename__} "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+        ))
+        created.append(name)
+    return created
+
+def list_partitions(db: Session) -> List[str]:
+    """Return the names of the attached bike_trips partitions in month order"""
+    rows = db.execute(text("""
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = to_regclass(:table)
+        ORDER BY child.relname
+    """), {"table": BikeTrip.__tablename__}).scalars().all()
+    return list(rows)
+
+def clear_partition(db: Session, month: date, drop: bool = False) -> int:
+    """
+    Empty the partition of one month within the caller's transaction, either
+    by truncating it or by detaching and dropping it. Both avoid the row by
+    row DELETE and leave no dead tuples behind.
+
+    Args:
+        db: Database session
+        month: First day of the month to clear
+        drop: Detach and drop the partition instead of truncating it; the
+            loader recreates it when the month is loaded again
+
+    Returns:
+        int: Number of trips removed
+    """
+    name = partition_name(month)
+    if db.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is None:
+        return 0
+
+    removed = db.execute(text(f"SELECT count(*) FROM {name}")).scalar()
+    if drop:
+        logger.info(f"Detaching and dropping partition {name} ({removed} rows)")
+        db.execute(text(f"ALTER TABLE {BikeTrip.__tablename__} DETACH PARTITION {name}"))
+        db.execute(text(f"DROP TABLE {name}"))
+    else:
+        logger.info(f"Truncating partition {name} ({removed} rows)")
+        db.execute(text(f"TRUNCATE {name}"))
+    return removed
+
+def month_window(month: date) -> Tuple[datetime, datetime]:
+    """Hour buckets a month's trips can contribute to: the month plus the following 24 hours"""
+    end = next_month(month)
+    return datetime(month.year, month.month, 1), datetime(end.year, end.month, 1) + timedelta(hours=24)
@@ -0,0 +1,224 @@
+import os
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+from typing import Iterator, Iterable, Optional, Tuple, List, Dict, Any
+import pandas as pd
+
+from etl.extract import extract_csv_data, iter_csv_chunks, list_csv_files, CHUNK_SIZE
+from etl.transform import transform_dataframe
+from etl.load import load_chunks_to_database, get_pending_files, clear_existing_data
+from etl.ledger import file_fingerprint
+from etl.partitions import months_in
+from etl.schema import RENAME_MAP, parse_datetime_column
+from etl.metrics import etl_metrics
+
+logger = logging.getLogger(__name__)
+
+# Worker processes used by the parallel pipeline
+WORKERS = int(os.getenv("ETL_WORKERS", str(os.cpu_count() or 1)))
+
+class StageStats:
+    """Accumulates row counts and wall time for one pipeline stage"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.rows = 0
+        self.seconds = 0.0
+        self.chunks = 0
+
+    def record(self, rows: int, seconds: float) -> None:
+        """Record one processed chunk in the stage's metrics and log its throughput"""
+        self.rows += rows
+        self.seconds += seconds
+        self.chunks += 1
+        etl_metrics.record(self.name, rows, seconds)
+        logger.info(f"[{self.name}] chunk {self.chunks}: {rows} rows in {seconds:.2f}s ({self.rate(rows, seconds):.0f} rows/s)")
+
+    def log_summary(self) -> None:
+        """Log totals for the stage"""
+        logger.info(
+            f"[{self.name}] {self.rows} rows in {self.chunks} chunks, {self.seconds:.2f}s "
+            f"({self.rate(self.rows, self.seconds):.0f} rows/s)"
+        )
+
+    @staticmethod
+    def rate(rows: int, seconds: float) -> float:
+        return rows / seconds if seconds else 0.0
+
+def iter_transformed_chunks(chunks: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    """
+    Pass extracted chunks through transform_dataframe one at a time,
+    timing the extract and transform stages separately
+
+    Args:
+        chunks: Iterable of raw extracted dataframes
+
+    Yields:
+        pd.DataFrame: Transformed chunk
+    """
+    extract_stats = StageStats("extract")
+    transform_stats = StageStats("transform")
+    iterator = iter(chunks)
+
+    while True:
+        started = time.perf_counter()
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            break
+        extract_stats.record(len(chunk), time.perf_counter() - started)
+
+        started = time.perf_counter()
+        transformed = transform_dataframe(chunk)
+        transform_stats.record(len(transformed), time.perf_counter() - started)
+
+        # Release the raw chunk before the loader consumes the transformed one
+        del chunk
+        yield transformed
+
+    extract_stats.log_summary()
+    transform_stats.log_summary()
+
+def _pending_files(directory_path: str, clear_existing: bool) -> List[Dict[str, Any]]:
+    """Clear existing data if requested and return fingerprints of files still to ingest"""
+    if clear_existing:
+        clear_existing_data()
+    return get_pending_files(list_csv_files(directory_path))
+
+def run_streaming_pipeline(directory_path: str, chunk_size: Optional[int] = None,
+                           clear_existing: bool = False, method: Optional[str] = None) -> int:
+    """
+    Extract, transform and load every new CSV in a directory chunk by chunk.
+    Peak memory is bounded by chunk_size rather than by total input size.
+    Each file is committed in its own transaction together with its
+    ingestion ledger entry; files already in the ledger are skipped.
+
+    Args:
+        directory_path: Path to directory containing CSV files
+        chunk_size: Rows per chunk (defaults to CHUNK_SIZE)
+        clear_existing: Whether to clear existing data before loading
+        method: Load method passed to the loader
+
+    Returns:
+        int: Total number of rows loaded
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    logger.info(f"Starting streaming pipeline over {directory_path} with chunk size {chunk_size}")
+
+    loaded = 0
+    for fingerprint in _pending_files(directory_path, clear_existing):
+        etl_metrics.add_bytes("extract", fingerprint["size"])
+        chunks = iter_transformed_chunks(iter_csv_chunks(fingerprint["path"], chunk_size))
+        loaded += load_chunks_to_database(chunks, method=method, fingerprint=fingerprint)
+    return loaded
+
+def _extract_and_transform(file_path: str) -> Tuple[str, pd.DataFrame, float, float]:
+    """Extract and transform one CSV file inside a worker process"""
+    started = time.perf_counter()
+    df = extract_csv_data(file_path)
+    extract_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    transformed = transform_dataframe(df)
+    transform_seconds = time.perf_counter() - started
+
+    return file_path, transformed, extract_seconds, transform_seconds
+
+def iter_parallel_transformed_files(csv_files: List[str], workers: Optional[int] = None) -> Iterator[Tuple[str, pd.DataFrame]]:
+    """
+    Extract and transform CSV files on a process pool, yielding each
+    file's transformed dataframe as soon as it finishes. The rows are the
+    same as in the serial extract/transform path; only the order in which
+    files arrive depends on completion time.
+
+    Args:
+        csv_files: Paths of the CSV files to process
+        workers: Number of worker processes (defaults to WORKERS)
+
+    Yields:
+        Tuple[str, pd.DataFrame]: File path and its transformed dataframe
+    """
+    workers = workers or WORKERS
+    if not csv_files:
+        logger.warning("No CSV files to process")
+        return
+
+    logger.info(f"Processing {len(csv_files)} CSV files with {workers} workers")
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=min(workers, len(csv_files))) as executor:
+        futures = [executor.submit(_extract_and_transform, file_path) for file_path in csv_files]
+        for future in as_completed(futures):
+            file_path, transformed, extract_seconds, transform_seconds = future.result()
+            etl_metrics.record("extract", len(transformed), extract_seconds, bytes_read=os.path.getsize(file_path))
+            etl_metrics.record("transform", len(transformed), transform_seconds)
+            logger.info(
+                f"[{os.path.basename(file_path)}] {len(transformed)} rows, "
+                f"extract {extract_seconds:.2f}s, transform {transform_seconds:.2f}s, "
+                f"done at {time.perf_counter() - started:.2f}s"
+            )
+            yield file_path, transformed
+
+    logger.info(f"Processed {len(csv_files)} CSV files in {time.perf_counter() - started:.2f}s")
+
+def run_parallel_pipeline(directory_path: str, workers: Optional[int] = None,
+                          clear_existing: bool = False, method: Optional[str] = None) -> int:
+    """
+    Extract and transform new CSV files on a process pool and load each
+    file as soon as its transform finishes, committing it together with
+    its ingestion ledger entry
+
+    Args:
+        directory_path: Path to directory containing CSV files
+        workers: Number of worker processes (defaults to WORKERS)
+        clear_existing: Whether to clear existing data before loading
+        method: Load method passed to the loader
+
+    Returns:
+        int: Total number of rows loaded
+    """
+    fingerprints = {fp["path"]: fp for fp in _pending_files(directory_path, clear_existing)}
+
+    loaded = 0
+    for file_path, transformed in iter_parallel_transformed_files(list(fingerprints), workers):
+        loaded += load_chunks_to_database([transformed], method=method, fingerprint=fingerprints[file_path])
+    return loaded
+
+def _file_months(file_path: str, chunk_size: int) -> List[date]:
+    """Read only the start time column of a CSV and return the months it covers"""
+    header = pd.read_csv(file_path, nrows=0).columns
+    start_column = next(column for column in header if RENAME_MAP.get(column.lower()) == 'start_time')
+
+    months = set()
+    for chunk in pd.read_csv(file_path, usecols=[start_column], chunksize=chunk_size):
+        starts = parse_datetime_column(chunk[start_column])
+        months.update(months_in(pd.DataFrame({'start_time': starts})))
+    return sorted(months)
+
+def reload_file(file_path: str, months: Optional[List[date]] = None, chunk_size: Optional[int] = None,
+                method: Optional[str] = None, drop_partitions: bool = False) -> int:
+    """
+    Replace the trips of the months covered by a CSV with the file's rows.
+    The month partitions are emptied and refilled in one transaction, and the
+    file is loaded even if it was ingested before.
+
+    Args:
+        file_path: CSV file holding the corrected months
+        months: First day of each month to replace (defaults to the months in the file)
+        chunk_size: Rows per chunk (defaults to CHUNK_SIZE)
+        method: Load method passed to the loader
+        drop_partitions: Detach and drop the old partitions instead of truncating them
+
+    Returns:
+        int: Number of rows loaded
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    months = months or _file_months(file_path, chunk_size)
+    logger.info(f"Reloading {', '.join(month.strftime('%Y-%m') for month in months)} from {file_path}")
+
+    chunks = iter_transformed_chunks(iter_csv_chunks(file_path, chunk_size))
+    return load_chunks_to_database(
+        chunks, method=method, fingerprint=file_fingerprint(file_path),
+        replace_months=months, drop_partitions=drop_partitions
+    )
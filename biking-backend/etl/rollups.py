@@ -0,0 +1,251 @@
+import os
+import sys
+import logging
+from datetime import date, datetime
+from typing import Optional
+import numpy as np
+import pandas as pd
+from sqlalchemy import text, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+# Add the app directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from app.models import BikeTrip, TripHourRollup, StationPairDayRollup, TableRowCount
+
+logger = logging.getLogger(__name__)
+
+HOUR = np.timedelta64(1, 'h')
+
+# Hour buckets a trip can contribute to, counted from the hour it starts in
+MAX_HOUR_OFFSETS = 24
+
+# Rows per upsert statement, well below PostgreSQL's bind parameter limit
+UPSERT_BATCH_SIZE = 10000
+
+def hour_bucket_counts(df: pd.DataFrame) -> pd.Series:
+    """
+    Count trips per calendar hour they overlap. A trip counts towards the
+    hour it starts in and each following hour that begins before it stops,
+    up to 24 hours, which is the overlap rule of the hour-range statistic.
+
+    Args:
+        df: Dataframe with start_time and stop_time columns
+
+    Returns:
+        pd.Series: Trip counts indexed by hour start
+    """
+    start = df['start_time'].to_numpy(dtype='datetime64[ns]')
+    stop = df['stop_time'].to_numpy(dtype='datetime64[ns]')
+    start_hour = start.astype('datetime64[h]').astype('datetime64[ns]')
+
+    # Number of hour boundaries reached: ceil((stop - start_hour) / 1h), capped
+    hours = -((start_hour - stop) // HOUR)
+    buckets = np.where(stop > start, np.minimum(hours, MAX_HOUR_OFFSETS), 0).astype(np.int64)
+
+    total = int(buckets.sum())
+    if total == 0:
+        return pd.Series([], index=pd.DatetimeIndex([]), dtype=np.int64)
+
+    # Expand each trip into its consecutive hour buckets
+    offsets = np.arange(total) - np.repeat(np.cumsum(buckets) - buckets, buckets)
+    bucket_starts = np.repeat(start_hour, buckets) + offsets * HOUR
+    return pd.Series(bucket_starts).value_counts().sort_index()
+
+def update_hour_rollup(db: Session, df: pd.DataFrame) -> int:
+    """
+    Add a batch of newly loaded trips to trip_hour_rollup within the
+    caller's transaction
+
+    Args:
+        db: Database session
+        df: Transformed dataframe that was just written to bike_trips
+
+    Returns:
+        int: Number of hour buckets touched
+    """
+    counts = hour_bucket_counts(df)
+    if counts.empty:
+        return 0
+
+    rows = [
+        {"bucket_start": bucket.to_pydatetime(), "ride_count": int(count)}
+        for bucket, count in counts.items()
+    ]
+    for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+        stmt = insert(TripHourRollup).values(rows[start:start + UPSERT_BATCH_SIZE])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[TripHourRollup.bucket_start],
+            set_={"ride_count": TripHourRollup.ride_count + stmt.excluded.ride_count},
+        )
+        db.execute(stmt)
+    return len(rows)
+
+def rebuild_hour_rollup(db: Session, start: Optional[datetime] = None, end: Optional[datetime] = None) -> None:
+    """
+    Recompute trip_hour_rollup from bike_trips, e.g. to backfill trips loaded
+    before the rollup existed. With start and end only the hour buckets in
+    [start, end) are recomputed, from the trips that can reach them, which
+    lets a reloaded month be repaired without a full scan. The caller commits.
+
+    Args:
+        db: Database session
+        start: First hour bucket to recompute (hour aligned), or None for all
+        end: End of the hour buckets to recompute, or None for all
+    """
+    if start is None or end is None:
+        logger.info("Rebuilding trip_hour_rollup from bike_trips")
+        db.execute(text("DELETE FROM trip_hour_rollup"))
+        window = ""
+        params = {"max_offset": MAX_HOUR_OFFSETS - 1}
+    else:
+        logger.info(f"Rebuilding trip_hour_rollup between {start} and {end}")
+        db.execute(
+            text("DELETE FROM trip_hour_rollup WHERE bucket_start >= :start AND bucket_start < :end"),
+            {"start": start, "end": end}
+        )
+        # Trips starting up to MAX_HOUR_OFFSETS - 1 hours before start still reach it
+        window = """
+          AND start_time >= :start - make_interval(hours => :max_offset)
+          AND start_time < :end
+          AND date_trunc('hour', start_time) + make_interval(hours => k) >= :start
+          AND date_trunc('hour', start_time) + make_interval(hours => k) < :end
+        """
+        params = {"max_offset": MAX_HOUR_OFFSETS - 1, "start": start, "end": end}
+
+    db.execute(text(f"""
+        INSERT INTO trip_hour_rollup (bucket_start, ride_count)
+        SELECT date_trunc('hour', start_time) + make_interval(hours => k) AS bucket_start,
+               count(*) AS ride_count
+        FROM bike_trips
+        CROSS JOIN generate_series(0, :max_offset) AS k
+        WHERE stop_time > start_time
+          AND date_trunc('hour', start_time) + make_interval(hours => k) < stop_time
+          {window}
+        GROUP BY 1
+    """), params)
+
+def station_pair_counts(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Count trips per start day and (start station, end station) pair. Trips
+    missing either station id are left out.
+
+    Args:
+        df: Dataframe with start_time, start_station_id and end_station_id columns
+
+    Returns:
+        pd.DataFrame: day, start_station_id, end_station_id and trip_count columns
+    """
+    pairs = df[['start_time', 'start_station_id', 'end_station_id']].dropna()
+    if pairs.empty:
+        return pd.DataFrame(columns=['day', 'start_station_id', 'end_station_id', 'trip_count'])
+
+    pairs = pd.DataFrame({
+        'day': pairs['start_time'].dt.floor('D'),
+        'start_station_id': pairs['start_station_id'].astype('int64'),
+        'end_station_id': pairs['end_station_id'].astype('int64'),
+    })
+    return pairs.groupby(['day', 'start_station_id', 'end_station_id']).size().reset_index(name='trip_count')
+
+def update_station_pair_rollup(db: Session, df: pd.DataFrame) -> int:
+    """
+    Add a batch of newly loaded trips to station_pair_day_rollup within the
+    caller's transaction
+
+    Args:
+        db: Database session
+        df: Transformed dataframe that was just written to bike_trips
+
+    Returns:
+        int: Number of (day, station pair) rows touched
+    """
+    counts = station_pair_counts(df)
+    if counts.empty:
+        return 0
+
+    rows = [
+        {
+            "day": row.day.date(),
+            "start_station_id": int(row.start_station_id),
+            "end_station_id": int(row.end_station_id),
+            "trip_count": int(row.trip_count),
+        }
+        for row in counts.itertuples(index=False)
+    ]
+    for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+        stmt = insert(StationPairDayRollup).values(rows[start:start + UPSERT_BATCH_SIZE])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[
+                StationPairDayRollup.day, StationPairDayRollup.start_station_id, StationPairDayRollup.end_station_id
+            ],
+            set_={"trip_count": StationPairDayRollup.trip_count + stmt.excluded.trip_count},
+        )
+        db.execute(stmt)
+    return len(rows)
+
+def rebuild_station_pair_rollup(db: Session, start: Optional[date] = None, end: Optional[date] = None) -> None:
+    """
+    Recompute station_pair_day_rollup from bike_trips. With start and end
+    only the days in [start, end) are recomputed, which reads
+    just the partitions of those days. The caller commits.
+
+    Args:
+        db: Database session
+        start: First day to recompute, or None for all
+        end: End of the days to recompute, or None for all
+    """
+    if start is None or end is None:
+        logger.info("Rebuilding station_pair_day_rollup from bike_trips")
+        db.execute(text("DELETE FROM station_pair_day_rollup"))
+        window = ""
+        params = {}
+    else:
+        logger.info(f"Rebuilding station_pair_day_rollup between {start} and {end}")
+        db.execute(
+            text("DELETE FROM station_pair_day_rollup WHERE day >= :start AND day < :end"),
+            {"start": start, "end": end}
+        )
+        window = "AND start_time >= :start AND start_time < :end"
+        params = {"start": start, "end": end}
+
+    db.execute(text(f"""
+        INSERT INTO station_pair_day_rollup (day, start_station_id, end_station_id, trip_count)
+        SELECT start_time::date, start_station_id, end_station_id, count(*)
+        FROM bike_trips
+        WHERE start_station_id IS NOT NULL AND end_station_id IS NOT NULL
+          {window}
+        GROUP BY 1, 2, 3
+    """), params)
+
+def add_trip_count(db: Session, delta: int) -> None:
+    """
+    Add newly loaded trips to the maintained bike_trips row count within
+    the caller's transaction
+
+    Args:
+        db: Database session
+        delta: Number of rows written to bike_trips
+    """
+    stmt = insert(TableRowCount).values(table_name=BikeTrip.__tablename__, row_count=delta)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[TableRowCount.table_name],
+        set_={"row_count": TableRowCount.row_count + stmt.excluded.row_count, "updated_at": func.now()},
+    )
+    db.execute(stmt)
+
+def rebuild_trip_count(db: Session) -> None:
+    """
+    Reset the maintained bike_trips row count to an exact count of the
+    table, e.g. after deleting all trips or to backfill it. The caller commits.
+
+    Args:
+        db: Database session
+    """
+    total = db.query(func.count(BikeTrip.id)).scalar()
+    stmt = insert(TableRowCount).values(table_name=BikeTrip.__tablename__, row_count=total)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[TableRowCount.table_name],
+        set_={"row_count": stmt.excluded.row_count, "updated_at": func.now()},
+    )
+    db.execute(stmt)
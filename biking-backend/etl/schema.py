@@ -0,0 +1,114 @@
+import os
+import logging
+from typing import Dict, Any, List
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Timestamp layout of the Citi Bike trip files, e.g. 2019-01-01 00:01:47.4010
+DATETIME_FORMAT = os.getenv("ETL_DATETIME_FORMAT", "%Y-%m-%d %H:%M:%S.%f")
+
+# Declarative layout of a Citi Bike trip CSV shared by extract and transform.
+# source: CSV header (matched case-insensitively), name: bike_trips column,
+# kind: how the column is parsed and stored in memory
+TRIP_SCHEMA: List[Dict[str, str]] = [
+    {"source": "tripduration", "name": "tripduration", "kind": "int"},
+    {"source": "starttime", "name": "start_time", "kind": "datetime"},
+    {"source": "stoptime", "name": "stop_time", "kind": "datetime"},
+    {"source": "start station id", "name": "start_station_id", "kind": "int"},
+    {"source": "start station name", "name": "start_station_name", "kind": "category"},
+    {"source": "start station latitude", "name": "start_station_latitude", "kind": "float"},
+    {"source": "start station longitude", "name": "start_station_longitude", "kind": "float"},
+    {"source": "end station id", "name": "end_station_id", "kind": "int"},
+    {"source": "end station name", "name": "end_station_name", "kind": "category"},
+    {"source": "end station latitude", "name": "end_station_latitude", "kind": "float"},
+    {"source": "end station longitude", "name": "end_station_longitude", "kind": "float"},
+    {"source": "bikeid", "name": "bike_id", "kind": "int"},
+    {"source": "usertype", "name": "user_type", "kind": "category"},
+    {"source": "birth year", "name": "birth_year", "kind": "int"},
+    {"source": "gender", "name": "gender", "kind": "int"},
+]
+
+RENAME_MAP = {spec["source"]: spec["name"] for spec in TRIP_SCHEMA}
+INT_COLUMNS = [spec["name"] for spec in TRIP_SCHEMA if spec["kind"] == "int"]
+FLOAT_COLUMNS = [spec["name"] for spec in TRIP_SCHEMA if spec["kind"] == "float"]
+DATETIME_COLUMNS = [spec["name"] for spec in TRIP_SCHEMA if spec["kind"] == "datetime"]
+TEXT_COLUMNS = [spec["name"] for spec in TRIP_SCHEMA if spec["kind"] == "category"]
+
+# dtype requested from the CSV parser for each kind. Integers are read as
+# float64, which holds NULLs and is far cheaper for the C parser than Int64;
+# transform converts them to nullable integers. Datetimes are left to the
+# parser as strings and parsed with DATETIME_FORMAT in transform.
+READ_DTYPES = {"int": "float64", "float": "float64", "category": "category"}
+
+# Nullable integer types tried, narrowest first, when downcasting
+_INT_DTYPES = [("Int8", np.int8), ("Int16", np.int16), ("Int32", np.int32), ("Int64", np.int64)]
+
+def build_read_options(header: List[str], typed: bool = True) -> Dict[str, Any]:
+    """
+    Build pd.read_csv keyword arguments for a trip file from its header
+
+    Args:
+        header: Column names found in the CSV file
+        typed: Request explicit numeric dtypes; when False numeric columns
+            are read as strings and coerced later by transform
+
+    Returns:
+        Dict[str, Any]: usecols and dtype arguments for pd.read_csv
+    """
+    specs = {spec["source"]: spec for spec in TRIP_SCHEMA}
+    usecols = []
+    dtype = {}
+    for column in header:
+        spec = specs.get(column.lower())
+        if spec is None:
+            continue
+        usecols.append(column)
+        if spec["kind"] == "category" or (typed and spec["kind"] in READ_DTYPES):
+            dtype[column] = READ_DTYPES[spec["kind"]]
+    return {"usecols": usecols, "dtype": dtype}
+
+def parse_datetime_column(series: pd.Series) -> pd.Series:
+    """
+    Parse a timestamp column with DATETIME_FORMAT, falling back to
+    per-value inference for files that use a different layout
+
+    Args:
+        series: Raw timestamp column
+
+    Returns:
+        pd.Series: datetime64 column with NaT for unparseable values
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    try:
+        return pd.to_datetime(series, format=DATETIME_FORMAT)
+    except (ValueError, TypeError):
+        logger.info(f"Column {series.name} does not match {DATETIME_FORMAT}, inferring format")
+        return pd.to_datetime(series, errors='coerce')
+
+def downcast_integer_column(series: pd.Series) -> pd.Series:
+    """
+    Downcast a nullable integer column to the narrowest type holding its range
+
+    Args:
+        series: Nullable integer column
+
+    Returns:
+        pd.Series: Column stored as Int8, Int16, Int32 or Int64
+    """
+    values = series.dropna()
+    if values.empty:
+        return series.astype("Int8")
+
+    low, high = values.min(), values.max()
+    for dtype, np_type in _INT_DTYPES:
+        info = np.iinfo(np_type)
+        if info.min <= low and high <= info.max:
+            return series.astype(dtype)
+    return series
+
+def memory_usage_mb(df: pd.DataFrame) -> float:
+    """Return the resident size of a dataframe in MB, including string payloads"""
+    return df.memory_usage(deep=True).sum() / (1024 * 1024)
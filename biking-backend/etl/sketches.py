@@ -0,0 +1,207 @@
+import os
+import sys
+import logging
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, Optional, Tuple
+import numpy as np
+import pandas as pd
+from sqlalchemy import text, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+# Add the app directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from app.models import TripDurationSketch, TripDistinctSketch
+from app.sketches import TDigest, HyperLogLog
+from etl.partitions import month_start, next_month
+
+logger = logging.getLogger(__name__)
+
+# bike_trips columns with a distinct-count sketch per day
+DISTINCT_DIMENSIONS = ('bike_id', 'start_station_id', 'end_station_id')
+
+def duration_digests(df: pd.DataFrame) -> Dict[date, TDigest]:
+    """
+    Build one t-digest of trip durations per start day
+
+    Args:
+        df: Dataframe with start_time and tripduration columns
+
+    Returns:
+        Dict[date, TDigest]: Digest of each start day present in df
+    """
+    if df.empty:
+        return {}
+    days = df['start_time'].dt.floor('D')
+    return {
+        day.date(): TDigest.from_values(durations.to_numpy())
+        for day, durations in df['tripduration'].groupby(days)
+    }
+
+def _upsert_sketches(db: Session, digests: Dict[date, TDigest], source: str) -> None:
+    rows = [
+        {"day": day, "source": source, "trip_count": digest.count, "digest": digest.to_bytes()}
+        for day, digest in digests.items()
+    ]
+    if not rows:
+        return
+    stmt = insert(TripDurationSketch).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[TripDurationSketch.day, TripDurationSketch.source],
+        set_={"trip_count": stmt.excluded.trip_count, "digest": stmt.excluded.digest, "updated_at": func.now()},
+    )
+    db.execute(stmt)
+
+def update_duration_sketches(db: Session, df: pd.DataFrame, source: str = '') -> int:
+    """
+    Merge a batch of newly loaded trips into the duration sketches of their
+    start days and source file within the caller's transaction
+
+    Args:
+        db: Database session
+        df: Transformed dataframe that was just written to bike_trips
+        source: File name the batch was read from ('' if unknown)
+
+    Returns:
+        int: Number of day sketches written
+    """
+    digests = duration_digests(df)
+    if not digests:
+        return 0
+
+    # Earlier chunks of the same file may already have sketches for these days
+    existing = db.query(TripDurationSketch).filter(
+        TripDurationSketch.source == source,
+        TripDurationSketch.day.in_(list(digests)),
+    ).with_for_update().all()
+    for sketch in existing:
+        digests[sketch.day] = TDigest.merge_all([TDigest.from_bytes(sketch.digest), digests[sketch.day]])
+
+    _upsert_sketches(db, digests, source)
+    return len(digests)
+
+def _read_months(db: Session, columns: list, start: date, end: date) -> Iterator[pd.DataFrame]:
+    """Read start_time and columns of the trips starting in [start, end), one month at a time"""
+    window_start = start
+    while window_start < end:
+        window_end = min(next_month(month_start(window_start)), end)
+        yield pd.read_sql_query(
+            text(f"SELECT start_time, {', '.join(columns)} FROM bike_trips "
+                 "WHERE start_time >= :start AND start_time < :end"),
+            db.connection(),
+            params={"start": datetime.combine(window_start, datetime.min.time()),
+                    "end": datetime.combine(window_end, datetime.min.time())},
+        )
+        window_start = window_end
+
+def _rebuild_window(db: Session, model, start: Optional[date], end: Optional[date]) -> Optional[Tuple[date, date]]:
+    """Delete the sketches of model in [start, end), or all of them and return the days bike_trips spans"""
+    if start is None or end is None:
+        logger.info(f"Rebuilding {model.__tablename__} from bike_trips")
+        db.query(model).delete()
+        first, last = db.execute(text("SELECT min(start_time), max(start_time) FROM bike_trips")).one()
+        if first is None:
+            return None
+        return first.date(), last.date() + timedelta(days=1)
+    logger.info(f"Rebuilding {model.__tablename__} between {start} and {end}")
+    db.query(model).filter(model.day >= start, model.day < end).delete(synchronize_session=False)
+    return start, end
+
+def rebuild_duration_sketches(db: Session, start: Optional[date] = None, end: Optional[date] = None) -> None:
+    """
+    Recompute trip_duration_sketches from bike_trips, one month at a time,
+    e.g. to backfill trips loaded before the sketches existed. With start
+    and end only the days in [start, end) are recomputed. Rebuilt sketches
+    have no source file. The caller commits.
+
+    Args:
+        db: Database session
+        start: First day to recompute, or None for all
+        end: End of the days to recompute, or None for all
+    """
+    window = _rebuild_window(db, TripDurationSketch, start, end)
+    if window is None:
+        return
+    for df in _read_months(db, ['tripduration'], *window):
+        _upsert_sketches(db, duration_digests(df), '')
+
+def distinct_sketches(df: pd.DataFrame) -> Dict[Tuple[date, str], HyperLogLog]:
+    """
+    Build one HyperLogLog per start day of each column in DISTINCT_DIMENSIONS
+
+    Args:
+        df: Dataframe with start_time and the DISTINCT_DIMENSIONS columns
+
+    Returns:
+        Dict[Tuple[date, str], HyperLogLog]: Sketch of each (start day, column) present in df
+    """
+    if df.empty:
+        return {}
+    days = df['start_time'].dt.floor('D')
+    sketches = {}
+    for day, group in df[list(DISTINCT_DIMENSIONS)].groupby(days):
+        for dimension in DISTINCT_DIMENSIONS:
+            # Ids are nullable Int columns; missing ones become NaN, which the sketch skips
+            values = group[dimension].to_numpy(dtype='float64', na_value=np.nan)
+            sketches[(day.date(), dimension)] = HyperLogLog.from_values(values)
+    return sketches
+
+def _upsert_distinct_sketches(db: Session, sketches: Dict[Tuple[date, str], HyperLogLog]) -> None:
+    rows = [
+        {"day": day, "dimension": dimension, "registers": sketch.to_bytes()}
+        for (day, dimension), sketch in sketches.items()
+    ]
+    if not rows:
+        return
+    stmt = insert(TripDistinctSketch).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[TripDistinctSketch.day, TripDistinctSketch.dimension],
+        set_={"registers": stmt.excluded.registers, "updated_at": func.now()},
+    )
+    db.execute(stmt)
+
+def update_distinct_sketches(db: Session, df: pd.DataFrame) -> int:
+    """
+    Merge a batch of newly loaded trips into the distinct bike and station
+    sketches of their start days within the caller's transaction. Adding
+    trips that are already sketched leaves a sketch unchanged.
+
+    Args:
+        db: Database session
+        df: Transformed dataframe that was just written to bike_trips
+
+    Returns:
+        int: Number of sketches written
+    """
+    sketches = distinct_sketches(df)
+    if not sketches:
+        return 0
+
+    existing = db.query(TripDistinctSketch).filter(
+        TripDistinctSketch.day.in_({day for day, _ in sketches}),
+    ).with_for_update().all()
+    for row in existing:
+        key = (row.day, row.dimension)
+        if key in sketches:
+            sketches[key] = HyperLogLog.union([HyperLogLog.from_bytes(row.registers), sketches[key]])
+
+    _upsert_distinct_sketches(db, sketches)
+    return len(sketches)
+
+def rebuild_distinct_sketches(db: Session, start: Optional[date] = None, end: Optional[date] = None) -> None:
+    """
+    Recompute trip_distinct_sketches from bike_trips, one month at a time.
+    With start and end only the days in [start, end) are recomputed. The
+    caller commits.
+
+    Args:
+        db: Database session
+        start: First day to recompute, or None for all
+        end: End of the days to recompute, or None for all
+    """
+    window = _rebuild_window(db, TripDistinctSketch, start, end)
+    if window is None:
+        return
+    for df in _read_months(db, list(DISTINCT_DIMENSIONS), *window):
+        _upsert_distinct_sketches(db, distinct_sketches(df))
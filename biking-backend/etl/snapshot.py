@@ -0,0 +1,188 @@
+import os
+import sys
+import json
+import shutil
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+# Add the app directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from app.db import DATABASE_URL
+from app.snapshot import SNAPSHOT_DIR, SNAPSHOT_COLUMNS, MANIFEST_NAME
+
+logger = logging.getLogger(__name__)
+
+# Snapshot directories kept besides the current one, for API workers still reading them
+SNAPSHOT_KEEP = int(os.getenv("SNAPSHOT_KEEP", "1"))
+
+# Rows fetched from bike_trips per round trip while writing a snapshot
+SNAPSHOT_FETCH_SIZE = int(os.getenv("SNAPSHOT_FETCH_SIZE", "200000"))
+
+# Analytic columns of bike_trips in the snapshot's layout and order
+SNAPSHOT_SQL = """
+    SELECT (extract(epoch FROM start_time) * 1000000)::bigint AS start_us,
+           (extract(epoch FROM stop_time) * 1000000)::bigint AS stop_us,
+           tripduration,
+           coalesce(start_station_id, -1) AS start_station_id,
+           coalesce(end_station_id, -1) AS end_station_id,
+           user_type,
+           coalesce(gender, -1) AS gender
+    FROM bike_trips
+    ORDER BY start_time, id
+"""
+
+def read_manifest(snapshot_dir: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Read the manifest of the current snapshot
+
+    Args:
+        snapshot_dir: Snapshot root (defaults to SNAPSHOT_DIR)
+
+    Returns:
+        Optional[Dict[str, Any]]: The manifest, or None if no snapshot was written
+    """
+    try:
+        with open(os.path.join(snapshot_dir or SNAPSHOT_DIR, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def write_snapshot_frames(frames: Iterable[pd.DataFrame], rows: int, version: int,
+                          snapshot_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Write trips into a new snapshot directory and publish it. Each column
+    is a .npy file filled in place through a memory map, so only one frame
+    is held at a time. The manifest is replaced atomically once every file
+    is complete, which is when API workers switch to the new snapshot.
+
+    Args:
+        frames: Dataframes in SNAPSHOT_SQL's layout, in start time order
+        rows: Total number of rows in frames
+        version: Dataset version the trips belong to
+        snapshot_dir: Snapshot root (defaults to SNAPSHOT_DIR)
+
+    Returns:
+        Dict[str, Any]: The published manifest
+    """
+    snapshot_dir = snapshot_dir or SNAPSHOT_DIR
+    created_at = datetime.now(timezone.utc)
+    name = f"v{version:010d}-{created_at:%Y%m%dT%H%M%S%f}"
+    tmp_path = os.path.join(snapshot_dir, f".tmp-{name}")
+    os.makedirs(tmp_path)
+
+    try:
+        arrays = {
+            column: np.lib.format.open_memmap(
+                os.path.join(tmp_path, f"{column}.npy"), mode="w+", dtype=dtype, shape=(rows,)
+            )
+            for column, dtype in SNAPSHOT_COLUMNS.items()
+        }
+        user_types: List[str] = []
+        codes: Dict[str, int] = {}
+        # -1 marks a missing user type, so codes run from 0 to the dtype's maximum
+        max_user_types = int(np.iinfo(SNAPSHOT_COLUMNS["user_type"]).max) + 1
+        offset = 0
+        for df in frames:
+            end = offset + len(df)
+            if end > rows:
+                raise ValueError(f"Snapshot source returned more than the expected {rows} rows")
+            for column in SNAPSHOT_COLUMNS:
+                if column == "user_type":
+                    for value in df[column].dropna().unique():
+                        if value not in codes:
+                            if len(user_types) == max_user_types:
+                                raise ValueError(
+                                    f"Snapshot user_type codes hold at most {max_user_types} distinct user types"
+                                )
+                            codes[value] = len(user_types)
+                            user_types.append(value)
+                    values = df[column].map(codes).fillna(-1)
+                else:
+                    values = df[column]
+                arrays[column][offset:end] = values.to_numpy()
+            offset = end
+
+        if offset != rows:
+            raise ValueError(f"Snapshot source returned {offset} rows, expected {rows}")
+        for array in arrays.values():
+            array.flush()
+        del arrays
+
+        os.rename(tmp_path, os.path.join(snapshot_dir, name))
+    except Exception:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+    manifest = {
+        "version": version,
+        "path": name,
+        "rows": rows,
+        "user_types": user_types,
+        "columns": SNAPSHOT_COLUMNS,
+        "created_at": created_at.isoformat(),
+    }
+    manifest_tmp = os.path.join(snapshot_dir, f".{MANIFEST_NAME}.tmp")
+    with open(manifest_tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(manifest_tmp, os.path.join(snapshot_dir, MANIFEST_NAME))
+    logger.info(f"Published trip snapshot {name} with {rows} rows")
+
+    _prune_snapshots(snapshot_dir, name)
+    return manifest
+
+def _prune_snapshots(snapshot_dir: str, current: str) -> None:
+    """Remove snapshot directories older than the SNAPSHOT_KEEP most recent ones before current"""
+    older = sorted(
+        entry for entry in os.listdir(snapshot_dir)
+        if entry.startswith("v") and entry != current and os.path.isdir(os.path.join(snapshot_dir, entry))
+    )
+    stale = older[:-SNAPSHOT_KEEP] if SNAPSHOT_KEEP > 0 else older
+    for entry in stale:
+        # Workers that still map these files keep their pages until they swap
+        shutil.rmtree(os.path.join(snapshot_dir, entry), ignore_errors=True)
+        logger.info(f"Removed trip snapshot {entry}")
+
+def write_snapshot(snapshot_dir: Optional[str] = None, force: bool = False) -> Dict[str, Any]:
+    """
+    Write a columnar snapshot of bike_trips for the API's snapshot engine.
+    The row count, the rows and the dataset version are read in one
+    REPEATABLE READ transaction, so they describe the same data. Nothing is
+    written when the current snapshot already has the dataset version and
+    the current column layout.
+
+    Args:
+        snapshot_dir: Snapshot root (defaults to SNAPSHOT_DIR)
+        force: Write a new snapshot even if the version did not change
+
+    Returns:
+        Dict[str, Any]: Manifest of the current snapshot
+    """
+    snapshot_dir = snapshot_dir or SNAPSHOT_DIR
+    os.makedirs(snapshot_dir, exist_ok=True)
+
+    engine = create_engine(DATABASE_URL)
+    try:
+        with engine.connect() as conn:
+            conn = conn.execution_options(isolation_level="REPEATABLE READ", stream_results=True)
+            with conn.begin():
+                version = conn.execute(text("SELECT version FROM dataset_version WHERE id = 1")).scalar() or 0
+                current = read_manifest(snapshot_dir)
+                # A snapshot in an older column layout is rewritten even at the same version
+                if (current is not None and current["version"] == version
+                        and current.get("columns") == SNAPSHOT_COLUMNS and not force):
+                    logger.info(f"Trip snapshot is up to date at version {version}")
+                    return current
+
+                rows = conn.execute(text("SELECT count(*) FROM bike_trips")).scalar()
+                logger.info(f"Writing trip snapshot of {rows} rows at version {version}")
+                frames = pd.read_sql_query(text(SNAPSHOT_SQL), conn, chunksize=SNAPSHOT_FETCH_SIZE)
+                return write_snapshot_frames(frames, rows, version, snapshot_dir)
+    finally:
+        engine.dispose()
@@ -0,0 +1,122 @@
+import os
+import re
+import shutil
+import logging
+from typing import Dict, Any, Iterator, List, Optional
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+# Root directory for run-scoped staging files shared between DAG tasks
+STAGING_DIR = os.getenv(
+    "ETL_STAGING_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'staging')
+)
+
+def run_staging_dir(run_id: str, staging_dir: Optional[str] = None) -> str:
+    """
+    Resolve the staging directory for one pipeline run
+
+    Args:
+        run_id: Airflow run id (or any unique run identifier)
+        staging_dir: Staging root (defaults to STAGING_DIR)
+
+    Returns:
+        str: Path of the run-scoped staging directory
+    """
+    safe_run_id = re.sub(r'[^A-Za-z0-9_.-]', '_', run_id)
+    return os.path.join(staging_dir or STAGING_DIR, safe_run_id)
+
+class StageWriter:
+    """
+    Writes the output of one pipeline stage as a set of Parquet part files
+    and builds the manifest that is handed to the next task through XCom
+    """
+
+    def __init__(self, run_id: str, stage: str, staging_dir: Optional[str] = None):
+        self.stage = stage
+        self.path = os.path.join(run_staging_dir(run_id, staging_dir), stage)
+        self.files: List[Dict[str, Any]] = []
+
+        # A retried task starts from a clean stage directory
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.makedirs(self.path, exist_ok=True)
+
+    def write(self, df: pd.DataFrame, source: Optional[str] = None,
+              fingerprint: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Write one dataframe as the next part file
+
+        Args:
+            df: Dataframe to stage
+            source: Optional name of the input the part came from
+            fingerprint: Optional ingestion ledger fingerprint of the source file
+
+        Returns:
+            str: Path of the written part file
+        """
+        file_path = os.path.join(self.path, f"part-{len(self.files):05d}.parquet")
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        pq.write_table(table, file_path)
+        self.files.append({
+            "path": file_path,
+            "rows": table.num_rows,
+            "source": source,
+            "fingerprint": fingerprint,
+        })
+        logger.info(f"Staged {table.num_rows} rows for {self.stage} at {file_path}")
+        return file_path
+
+    def manifest(self) -> Dict[str, Any]:
+        """Return the JSON-serializable manifest describing the staged parts"""
+        return {
+            "stage": self.stage,
+            "path": self.path,
+            "files": self.files,
+            "row_count": sum(f["rows"] for f in self.files),
+        }
+
+def iter_stage(manifest: Dict[str, Any], columns: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+    """
+    Read the parts of a staged output one file at a time
+
+    Args:
+        manifest: Manifest produced by StageWriter.manifest
+        columns: Optional subset of columns to read
+
+    Yields:
+        pd.DataFrame: Contents of the next part file
+    """
+    for part in manifest.get("files", []):
+        table = pq.read_table(part["path"], columns=columns, memory_map=True)
+        yield table.to_pandas()
+
+def read_stage(manifest: Dict[str, Any], columns: Optional[List[str]] = None) -> Optional[pd.DataFrame]:
+    """
+    Read a staged output into a single dataframe
+
+    Args:
+        manifest: Manifest produced by StageWriter.manifest
+        columns: Optional subset of columns to read
+
+    Returns:
+        Optional[pd.DataFrame]: Combined dataframe, or None if nothing was staged
+    """
+    frames = list(iter_stage(manifest, columns))
+    if not frames:
+        return None
+    return pd.concat(frames, ignore_index=True)
+
+def cleanup_run(run_id: str, staging_dir: Optional[str] = None) -> None:
+    """
+    Remove all staged files of a pipeline run
+
+    Args:
+        run_id: Run identifier used when staging
+        staging_dir: Staging root (defaults to STAGING_DIR)
+    """
+    path = run_staging_dir(run_id, staging_dir)
+    shutil.rmtree(path, ignore_errors=True)
+    logger.info(f"Removed staging directory {path}")
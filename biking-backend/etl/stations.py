@@ -0,0 +1,106 @@
+import os
+import sys
+import logging
+import pandas as pd
+from sqlalchemy import and_, func, or_, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+# Add the app directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from app.models import Station
+
+logger = logging.getLogger(__name__)
+
+# Station attributes kept in the stations dimension instead of on every trip
+STATION_ATTRIBUTES = ['name', 'latitude', 'longitude']
+
+# Rows per upsert statement, well below PostgreSQL's bind parameter limit
+UPSERT_BATCH_SIZE = 5000
+
+def station_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Collect the distinct stations referenced by a batch of trips from its
+    start_station_* and end_station_* columns. When a station appears with
+    different attributes, the values from its latest trip win.
+
+    Args:
+        df: Transformed dataframe
+
+    Returns:
+        pd.DataFrame: One row per station id with name, latitude, longitude
+            and last_seen, the start_time of the trip they were taken from
+    """
+    frames = []
+    for prefix in ('start', 'end'):
+        id_column = f'{prefix}_station_id'
+        if id_column not in df.columns:
+            continue
+        columns = {id_column: 'id', 'start_time': 'start_time'}
+        columns.update({
+            f'{prefix}_station_{attribute}': attribute
+            for attribute in STATION_ATTRIBUTES if f'{prefix}_station_{attribute}' in df.columns
+        })
+        frames.append(df[list(columns)].rename(columns=columns))
+
+    if not frames:
+        return pd.DataFrame(columns=['id'] + STATION_ATTRIBUTES + ['last_seen'])
+
+    stations = pd.concat(frames, ignore_index=True).dropna(subset=['id'])
+    stations = stations.sort_values('start_time', kind='stable').drop_duplicates('id', keep='last')
+    stations = stations.rename(columns={'start_time': 'last_seen'})
+    stations = stations.reindex(columns=['id'] + STATION_ATTRIBUTES + ['last_seen'])
+    stations['id'] = stations['id'].astype('int64')
+    return stations.sort_values('id')
+
+def upsert_stations(db: Session, df: pd.DataFrame) -> int:
+    """
+    Insert or update the stations referenced by a batch of trips within the
+    caller's transaction. A station is only updated from a batch whose trips
+    are at least as recent as its last_seen, so the values of the latest
+    trip win whatever order months are loaded in; stations whose attributes
+    and last_seen did not change are not rewritten.
+
+    Args:
+        db: Database session
+        df: Transformed dataframe about to be written to bike_trips
+
+    Returns:
+        int: Number of distinct stations in the batch
+    """
+    stations = station_frame(df)
+    if stations.empty:
+        return 0
+
+    rows = [
+        {
+            "id": int(row.id),
+            "name": None if pd.isna(row.name) else str(row.name),
+            "latitude": None if pd.isna(row.latitude) else float(row.latitude),
+            "longitude": None if pd.isna(row.longitude) else float(row.longitude),
+            "last_seen": None if pd.isna(row.last_seen) else pd.Timestamp(row.last_seen).to_pydatetime(),
+        }
+        for row in stations.itertuples(index=False)
+    ]
+    for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+        stmt = insert(Station).values(rows[start:start + UPSERT_BATCH_SIZE])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Station.id],
+            set_={
+                "name": stmt.excluded.name,
+                "latitude": stmt.excluded.latitude,
+                "longitude": stmt.excluded.longitude,
+                "last_seen": stmt.excluded.last_seen,
+                "updated_at": func.now(),
+            },
+            where=and_(
+                or_(Station.last_seen.is_(None), stmt.excluded.last_seen >= Station.last_seen),
+                tuple_(Station.name, Station.latitude, Station.longitude, Station.last_seen).is_distinct_from(
+                    tuple_(stmt.excluded.name, stmt.excluded.latitude, stmt.excluded.longitude,
+                           stmt.excluded.last_seen)
+                ),
+            ),
+        )
+        db.execute(stmt)
+    return len(rows)
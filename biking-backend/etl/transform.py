@@ -1,10 +1,19 @@
+import numpy as np
 import pandas as pd
 import logging
 from typing import Dict, Any, List
 import re
 
+from etl.schema import (
+    RENAME_MAP, INT_COLUMNS, FLOAT_COLUMNS, DATETIME_COLUMNS, TEXT_COLUMNS,
+    parse_datetime_column, downcast_integer_column,
+)
+
 logger = logging.getLogger(__name__)
 
+# Integer columns validated with validate_numeric_value's rules (no negatives, at most 1e10)
+VALIDATED_COLUMNS = ['tripduration', 'bike_id']
+
 def clean_text(text: str) -> str:
     """
     Clean and normalize text data
@@ -58,12 +67,82 @@ def validate_numeric_value(value: Any) -> float:
         logger.warning(f"Invalid numeric value: {value}, setting to 0")
         return 0.0
 
+def clean_text_values(values: pd.Index) -> np.ndarray:
+    """
+    Vectorized clean_text over distinct non-null values
+    
+    Args:
+        values: Distinct values to clean
+        
+    Returns:
+        np.ndarray: Cleaned strings in the same order
+    """
+    text = pd.Series(values, dtype=object).astype(str)
+    return text.str.strip().str.replace(r'\s+', ' ', regex=True).to_numpy(dtype=object)
+
+def clean_text_column(series: pd.Series) -> pd.Series:
+    """
+    Apply clean_text semantics to a whole column. Each distinct value is
+    cleaned once, which pays off because station names repeat heavily.
+    Categorical columns stay categorical; missing values become "".
+    
+    Args:
+        series: Text column, either object or categorical
+        
+    Returns:
+        pd.Series: Cleaned column
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy()
+        uniques = series.cat.categories
+    else:
+        codes, uniques = pd.factorize(series)
+
+    # The extra trailing entry is what missing values (code -1) map to
+    cleaned = np.append(clean_text_values(uniques), "")
+
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        inverse, categories = pd.factorize(cleaned)
+        return pd.Series(pd.Categorical.from_codes(inverse[codes], categories), index=series.index, name=series.name)
+
+    return pd.Series(cleaned[codes], index=series.index, name=series.name, dtype=object)
+
+def validate_numeric_column(series: pd.Series) -> pd.Series:
+    """
+    Vectorized validate_numeric_value: missing or invalid values and
+    negatives become 0.0, values above 1e10 are clamped to 1e10
+    
+    Args:
+        series: Column to validate
+        
+    Returns:
+        pd.Series: float64 column
+    """
+    if not pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+        # Mixed or text input: run the scalar rules once per distinct value
+        codes, uniques = pd.factorize(series)
+        validated = np.append(np.array([validate_numeric_value(v) for v in uniques], dtype=float), 0.0)
+        return pd.Series(validated[codes], index=series.index, name=series.name)
+
+    values = series.astype('float64').to_numpy(na_value=np.nan)
+    negative = values < 0
+    too_large = values > 1e10
+    if negative.any():
+        logger.warning(f"{int(negative.sum())} negative values found in {series.name}, setting to 0")
+    if too_large.any():
+        logger.warning(f"{int(too_large.sum())} very large values found in {series.name}")
+
+    values = np.where(np.isnan(values) | negative, 0.0, np.minimum(values, 1e10))
+    return pd.Series(values, index=series.index, name=series.name)
+
 def transform_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     """
     Transform the extracted dataframe for Citi Bike trips.
     - Renames columns to snake_case
     - Parses datetimes
     - Coerces numeric types and handles nulls
+    - Validates durations and bike ids with validate_numeric_column
+    - Downcasts integer columns to the narrowest safe width
     
     Args:
         df: Input dataframe
@@ -74,23 +153,7 @@ def transform_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     try:
         logger.info(f"Starting transformation of {len(df)} records")
 
-        rename_map = {
-            'tripduration': 'tripduration',
-            'starttime': 'start_time',
-            'stoptime': 'stop_time',
-            'start station id': 'start_station_id',
-            'start station name': 'start_station_name',
-            'start station latitude': 'start_station_latitude',
-            'start station longitude': 'start_station_longitude',
-            'end station id': 'end_station_id',
-            'end station name': 'end_station_name',
-            'end station latitude': 'end_station_latitude',
-            'end station longitude': 'end_station_longitude',
-            'bikeid': 'bike_id',
-            'usertype': 'user_type',
-            'birth year': 'birth_year',
-            'gender': 'gender',
-        }
+        rename_map = RENAME_MAP
 
         # Lowercase columns to match keys in rename_map
         df_columns_lower = {c: c.lower() for c in df.columns}
@@ -103,28 +166,24 @@ def transform_dataframe(df: pd.DataFrame) -> pd.DataFrame:
         expected_cols = list(rename_map.values())
         transformed_df = transformed_df[[c for c in expected_cols if c in transformed_df.columns]]
 
-        # Parse datetimes
-        for dt_col in ['start_time', 'stop_time']:
+        # Parse datetimes (no-op for columns the extractor already typed)
+        for dt_col in DATETIME_COLUMNS:
             if dt_col in transformed_df.columns:
-                transformed_df[dt_col] = pd.to_datetime(transformed_df[dt_col], errors='coerce')
+                transformed_df[dt_col] = parse_datetime_column(transformed_df[dt_col])
 
         # Coerce numeric fields
-        int_cols = ['tripduration', 'start_station_id', 'end_station_id', 'bike_id', 'birth_year', 'gender']
-        float_cols = ['start_station_latitude', 'start_station_longitude', 'end_station_latitude', 'end_station_longitude']
-
-        for col in int_cols:
+        for col in INT_COLUMNS:
             if col in transformed_df.columns:
                 transformed_df[col] = pd.to_numeric(transformed_df[col], errors='coerce').astype('Int64')
 
-        for col in float_cols:
+        for col in FLOAT_COLUMNS:
             if col in transformed_df.columns:
                 transformed_df[col] = pd.to_numeric(transformed_df[col], errors='coerce')
 
         # Clean text columns
-        text_cols = ['start_station_name', 'end_station_name', 'user_type']
-        for col in text_cols:
+        for col in TEXT_COLUMNS:
             if col in transformed_df.columns:
-                transformed_df[col] = transformed_df[col].apply(clean_text)
+                transformed_df[col] = clean_text_column(transformed_df[col])
 
         # Drop rows missing essential datetimes or duration
         essential = ['tripduration', 'start_time', 'stop_time']
@@ -134,6 +193,19 @@ def transform_dataframe(df: pd.DataFrame) -> pd.DataFrame:
         if missing_before != missing_after:
             logger.info(f"Dropped {missing_before - missing_after} rows with missing essential fields")
 
+        # Durations and bike ids follow validate_numeric_value's rules. Missing
+        # bike ids stay missing, and coordinates are left alone since NYC
+        # longitudes are negative
+        for col in VALIDATED_COLUMNS:
+            if col in transformed_df.columns:
+                validated = validate_numeric_column(transformed_df[col]).round().astype('Int64')
+                transformed_df[col] = validated.mask(transformed_df[col].isna())
+
+        # Store integers in the narrowest type that holds their range
+        for col in INT_COLUMNS:
+            if col in transformed_df.columns:
+                transformed_df[col] = downcast_integer_column(transformed_df[col])
+
         logger.info(f"Transformation completed. Final record count: {len(transformed_df)}")
         return transformed_df
     except Exception as e:
@@ -16,5 +16,5 @@ CREATE DATABASE airflow;
 -- Create extensions if needed
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 
--- The tables will be created by SQLAlchemy when the application starts
+-- The tables are created by the Alembic migrations in migrations/ (alembic upgrade head)
 
@@ -0,0 +1,84 @@
+import os
+import sys
+import time
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import engine_from_config, pool, text
+
+# The models live in app/ in the repository and at the image root in the
+# API container; both layouts import them as top-level modules
+ROOT_DIR = os.path.join(os.path.dirname(__file__), '..')
+for path in (ROOT_DIR, os.path.join(ROOT_DIR, 'app')):
+    if path not in sys.path:
+        sys.path.append(path)
+
+from db import Base, DATABASE_URL
+
+# The ETL imports the models as app.models before migrating; importing them
+# again under another name would redefine their tables on the same metadata
+if "bike_trips" not in Base.metadata.tables:
+    import models  # noqa: F401
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+if not config.get_main_option("sqlalchemy.url"):
+    config.set_main_option("sqlalchemy.url", DATABASE_URL)
+
+target_metadata = Base.metadata
+
+# Advisory lock key serializing migration runs. The API container and the
+# first ETL session both upgrade on start, and a fresh deploy must not run
+# 0003's table copy and swap or 0002's concurrent index builds twice at once.
+MIGRATION_LOCK_KEY = 4_210_917_003
+
+# Seconds between attempts to take the migration lock
+MIGRATION_LOCK_POLL_SECONDS = 1.0
+
+
+def include_object(obj, name, type_, reflected, compare_to):
+    """Leave views mapped for reading (info is_view) out of autogenerate"""
+    return not (type_ == "table" and obj.info.get("is_view"))
+
+
+def run_migrations_offline() -> None:
+    """Emit the migration SQL without connecting to the database"""
+    context.configure(
+        url=config.get_main_option("sqlalchemy.url"),
+        target_metadata=target_metadata,
+        include_object=include_object,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    """Apply the migrations over a database connection"""
+    connectable = engine_from_config(
+        config.get_section(config.config_ini_section, {}),
+        prefix="sqlalchemy.",
+        poolclass=pool.NullPool,
+    )
+    # The lock is held by its own idle autocommit connection and polled for
+    # rather than waited on: a session blocked in pg_advisory_lock holds a
+    # snapshot, which CREATE INDEX CONCURRENTLY in the holder would wait for
+    with connectable.connect().execution_options(isolation_level="AUTOCOMMIT") as lock_connection:
+        while not lock_connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY}).scalar():
+            time.sleep(MIGRATION_LOCK_POLL_SECONDS)
+        try:
+            with connectable.connect() as connection:
+                context.configure(connection=connection, target_metadata=target_metadata, include_object=include_object)
+                with context.begin_transaction():
+                    context.run_migrations()
+        finally:
+            lock_connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,96 @@
+"""Initial schema
+
+Tables that were previously created by Base.metadata.create_all. Databases
+created that way already have some or all of them, so each table is only
+created when missing and those databases can simply be upgraded.
+
+Revision ID: 0001_initial_schema
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+revision = '0001_initial_schema'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _missing(table_name: str) -> bool:
+    if context.is_offline_mode():
+        return True
+    return not sa.inspect(op.get_bind()).has_table(table_name)
+
+
+def upgrade() -> None:
+    if _missing('bike_trips'):
+        op.create_table(
+            'bike_trips',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('tripduration', sa.Integer(), nullable=False),
+            sa.Column('start_time', sa.DateTime(timezone=False), nullable=False),
+            sa.Column('stop_time', sa.DateTime(timezone=False), nullable=False),
+            sa.Column('start_station_id', sa.Integer(), nullable=True),
+            sa.Column('start_station_name', sa.String(255), nullable=True),
+            sa.Column('start_station_latitude', sa.Float(), nullable=True),
+            sa.Column('start_station_longitude', sa.Float(), nullable=True),
+            sa.Column('end_station_id', sa.Integer(), nullable=True),
+            sa.Column('end_station_name', sa.String(255), nullable=True),
+            sa.Column('end_station_latitude', sa.Float(), nullable=True),
+            sa.Column('end_station_longitude', sa.Float(), nullable=True),
+            sa.Column('bike_id', sa.Integer(), nullable=True),
+            sa.Column('user_type', sa.String(50), nullable=True),
+            sa.Column('birth_year', sa.Integer(), nullable=True),
+            sa.Column('gender', sa.Integer(), nullable=True),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        )
+        op.create_index('ix_bike_trips_id', 'bike_trips', ['id'])
+
+    if _missing('ingested_files'):
+        op.create_table(
+            'ingested_files',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('file_path', sa.String(1024), nullable=False),
+            sa.Column('file_size', sa.BigInteger(), nullable=False),
+            sa.Column('file_mtime', sa.Float(), nullable=False),
+            sa.Column('content_hash', sa.String(64), nullable=False),
+            sa.Column('row_count', sa.Integer(), nullable=False),
+            sa.Column('ingested_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.UniqueConstraint('content_hash', name='uq_ingested_files_content_hash'),
+        )
+        op.create_index('ix_ingested_files_id', 'ingested_files', ['id'])
+        op.create_index('ix_ingested_files_file_path', 'ingested_files', ['file_path'])
+
+    if _missing('trip_hour_rollup'):
+        op.create_table(
+            'trip_hour_rollup',
+            sa.Column('bucket_start', sa.DateTime(timezone=False), primary_key=True),
+            sa.Column('ride_count', sa.BigInteger(), nullable=False),
+        )
+
+    if _missing('dataset_version'):
+        op.create_table(
+            'dataset_version',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('version', sa.BigInteger(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+
+    if _missing('table_row_counts'):
+        op.create_table(
+            'table_row_counts',
+            sa.Column('table_name', sa.String(255), primary_key=True),
+            sa.Column('row_count', sa.BigInteger(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('table_row_counts')
+    op.drop_table('dataset_version')
+    op.drop_table('trip_hour_rollup')
+    op.drop_table('ingested_files')
+    op.drop_table('bike_trips')
@@ -0,0 +1,40 @@
+"""Index bike_trips on start time and station ids
+
+- B-tree on start_time for ORDER BY start_time LIMIT n and selective ranges
+- BRIN on start_time for wide time ranges; trips are loaded in start time
+  order, so block ranges are tight and the index is a few pages
+- B-trees on start and end station ids for per-station filters
+
+The indexes are built CONCURRENTLY so that loaded tables stay writable.
+
+Revision ID: 0002_bike_trips_indexes
+Revises: 0001_initial_schema
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+
+revision = '0002_bike_trips_indexes'
+down_revision = '0001_initial_schema'
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    'ix_bike_trips_start_time': 'btree (start_time)',
+    'brin_bike_trips_start_time': 'brin (start_time)',
+    'ix_bike_trips_start_station_id': 'btree (start_station_id)',
+    'ix_bike_trips_end_station_id': 'btree (end_station_id)',
+}
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, definition in INDEXES.items():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON bike_trips USING {definition}")
+    op.execute("ANALYZE bike_trips")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name in INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
@@ -0,0 +1,122 @@
+"""Partition bike_trips by start_time month
+
+bike_trips becomes a RANGE partitioned table with one partition per month,
+named bike_trips_yYYYYmMM; the ETL loader creates partitions for new months.
+The primary key becomes (id, start_time) since it has to include the
+partition key, and ids keep coming from bike_trips_id_seq.
+
+Existing rows are copied into the new partitions, so the upgrade rewrites
+the table and should run while no load is in progress.
+
+Revision ID: 0003_partition_bike_trips
+Revises: 0002_bike_trips_indexes
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0003_partition_bike_trips'
+down_revision = '0002_bike_trips_indexes'
+branch_labels = None
+depends_on = None
+
+COLUMNS = (
+    "id, tripduration, start_time, stop_time, start_station_id, start_station_name, "
+    "start_station_latitude, start_station_longitude, end_station_id, end_station_name, "
+    "end_station_latitude, end_station_longitude, bike_id, user_type, birth_year, gender, "
+    "created_at, updated_at"
+)
+
+INDEXES = {
+    'ix_bike_trips_id': 'btree (id)',
+    'ix_bike_trips_start_time': 'btree (start_time)',
+    'brin_bike_trips_start_time': 'brin (start_time)',
+    'ix_bike_trips_start_station_id': 'btree (start_station_id)',
+    'ix_bike_trips_end_station_id': 'btree (end_station_id)',
+}
+
+
+def _trip_columns():
+    return [
+        sa.Column('id', sa.Integer(), nullable=False,
+                  server_default=sa.text("nextval('bike_trips_id_seq'::regclass)")),
+        sa.Column('tripduration', sa.Integer(), nullable=False),
+        sa.Column('start_time', sa.DateTime(timezone=False), nullable=False),
+        sa.Column('stop_time', sa.DateTime(timezone=False), nullable=False),
+        sa.Column('start_station_id', sa.Integer(), nullable=True),
+        sa.Column('start_station_name', sa.String(255), nullable=True),
+        sa.Column('start_station_latitude', sa.Float(), nullable=True),
+        sa.Column('start_station_longitude', sa.Float(), nullable=True),
+        sa.Column('end_station_id', sa.Integer(), nullable=True),
+        sa.Column('end_station_name', sa.String(255), nullable=True),
+        sa.Column('end_station_latitude', sa.Float(), nullable=True),
+        sa.Column('end_station_longitude', sa.Float(), nullable=True),
+        sa.Column('bike_id', sa.Integer(), nullable=True),
+        sa.Column('user_type', sa.String(50), nullable=True),
+        sa.Column('birth_year', sa.Integer(), nullable=True),
+        sa.Column('gender', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    ]
+
+
+def _set_aside_old_table(old_name: str) -> None:
+    # Free the table, constraint and index names for the replacement
+    op.execute(f"ALTER TABLE bike_trips RENAME TO {old_name}")
+    op.execute(f"ALTER TABLE {old_name} RENAME CONSTRAINT bike_trips_pkey TO {old_name}_pkey")
+    for name in INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+def _create_indexes() -> None:
+    for name, definition in INDEXES.items():
+        op.execute(f"CREATE INDEX {name} ON bike_trips USING {definition}")
+
+
+def upgrade() -> None:
+    _set_aside_old_table('bike_trips_unpartitioned')
+
+    op.create_table(
+        'bike_trips',
+        *_trip_columns(),
+        sa.PrimaryKeyConstraint('id', 'start_time', name='bike_trips_pkey'),
+        postgresql_partition_by='RANGE (start_time)',
+    )
+
+    op.execute("""
+        DO $$
+        DECLARE month date;
+        BEGIN
+            FOR month IN SELECT DISTINCT date_trunc('month', start_time)::date FROM bike_trips_unpartitioned LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF bike_trips FOR VALUES FROM (%L) TO (%L)',
+                    'bike_trips_y' || to_char(month, 'YYYY') || 'm' || to_char(month, 'MM'),
+                    month, (month + interval '1 month')::date
+                );
+            END LOOP;
+        END $$
+    """)
+
+    op.execute(f"INSERT INTO bike_trips ({COLUMNS}) SELECT {COLUMNS} FROM bike_trips_unpartitioned")
+    op.execute("ALTER SEQUENCE bike_trips_id_seq OWNED BY bike_trips.id")
+    op.drop_table('bike_trips_unpartitioned')
+    _create_indexes()
+    op.execute("ANALYZE bike_trips")
+
+
+def downgrade() -> None:
+    _set_aside_old_table('bike_trips_partitioned')
+
+    op.create_table(
+        'bike_trips',
+        *_trip_columns(),
+        sa.PrimaryKeyConstraint('id', name='bike_trips_pkey'),
+    )
+
+    op.execute(f"INSERT INTO bike_trips ({COLUMNS}) SELECT {COLUMNS} FROM bike_trips_partitioned")
+    op.execute("ALTER SEQUENCE bike_trips_id_seq OWNED BY bike_trips.id")
+    # Dropping the partitioned table drops its partitions with it
+    op.drop_table('bike_trips_partitioned')
+    _create_indexes()
+    op.execute("ANALYZE bike_trips")
@@ -0,0 +1,50 @@
+"""Index bike_trips on (start_time, id) for keyset pagination
+
+Exports page through trips with WHERE (start_time, id) > (...) ORDER BY
+start_time, id, which needs both columns in the index. The new index also
+serves everything ix_bike_trips_start_time did, so that one is dropped.
+
+The index is created on the partitioned table only, then built
+CONCURRENTLY on each partition and attached, so loads are not blocked.
+
+Revision ID: 0004_start_time_id_index
+Revises: 0003_partition_bike_trips
+Create Date: 2026-10-17
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+revision = '0004_start_time_id_index'
+down_revision = '0003_partition_bike_trips'
+branch_labels = None
+depends_on = None
+
+PARTITIONS_SQL = """
+    SELECT child.relname
+    FROM pg_inherits
+    JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+    WHERE pg_inherits.inhparent = 'bike_trips'::regclass
+"""
+
+
+def upgrade() -> None:
+    if context.is_offline_mode():
+        op.execute("CREATE INDEX ix_bike_trips_start_time_id ON bike_trips (start_time, id)")
+    else:
+        op.execute("CREATE INDEX IF NOT EXISTS ix_bike_trips_start_time_id ON ONLY bike_trips (start_time, id)")
+        partitions = op.get_bind().execute(sa.text(PARTITIONS_SQL)).scalars().all()
+        with op.get_context().autocommit_block():
+            for partition in partitions:
+                op.execute(
+                    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition}_start_time_id_idx "
+                    f"ON {partition} (start_time, id)"
+                )
+        for partition in partitions:
+            op.execute(f"ALTER INDEX ix_bike_trips_start_time_id ATTACH PARTITION {partition}_start_time_id_idx")
+    op.execute("DROP INDEX IF EXISTS ix_bike_trips_start_time")
+
+
+def downgrade() -> None:
+    op.execute("CREATE INDEX IF NOT EXISTS ix_bike_trips_start_time ON bike_trips (start_time)")
+    op.execute("DROP INDEX IF EXISTS ix_bike_trips_start_time_id")
@@ -0,0 +1,95 @@
+"""Move station names and coordinates into a stations dimension
+
+bike_trips repeated the name, latitude and longitude of both stations on
+every trip. They now live once per station in stations, keyed by station
+id, and bike_trips keeps only start_station_id and end_station_id. The
+bike_trips_detailed view joins them back into the previous trip layout.
+
+Stations are filled from the existing trips, taking the most recent name
+and coordinates seen for each id. Dropped columns only release their space
+once a partition is rewritten, e.g. by reloading the month or by
+VACUUM FULL on the partition.
+
+Revision ID: 0005_stations_dimension
+Revises: 0004_start_time_id_index
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0005_stations_dimension'
+down_revision = '0004_start_time_id_index'
+branch_labels = None
+depends_on = None
+
+STATION_COLUMNS = ('name', 'latitude', 'longitude')
+
+DETAILED_VIEW = """
+    CREATE VIEW bike_trips_detailed AS
+    SELECT t.id, t.tripduration, t.start_time, t.stop_time,
+           t.start_station_id,
+           s.name AS start_station_name,
+           s.latitude AS start_station_latitude,
+           s.longitude AS start_station_longitude,
+           t.end_station_id,
+           e.name AS end_station_name,
+           e.latitude AS end_station_latitude,
+           e.longitude AS end_station_longitude,
+           t.bike_id, t.user_type, t.birth_year, t.gender, t.created_at, t.updated_at
+    FROM bike_trips t
+    LEFT JOIN stations s ON s.id = t.start_station_id
+    LEFT JOIN stations e ON e.id = t.end_station_id
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        'stations',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column('name', sa.String(255), nullable=True),
+        sa.Column('latitude', sa.Float(), nullable=True),
+        sa.Column('longitude', sa.Float(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+
+    op.execute("""
+        INSERT INTO stations (id, name, latitude, longitude)
+        SELECT DISTINCT ON (id) id, name, latitude, longitude
+        FROM (
+            SELECT start_station_id AS id, start_station_name AS name,
+                   start_station_latitude AS latitude, start_station_longitude AS longitude, start_time
+            FROM bike_trips WHERE start_station_id IS NOT NULL
+            UNION ALL
+            SELECT end_station_id, end_station_name,
+                   end_station_latitude, end_station_longitude, start_time
+            FROM bike_trips WHERE end_station_id IS NOT NULL
+        ) seen
+        ORDER BY id, start_time DESC
+    """)
+
+    for prefix in ('start', 'end'):
+        for column in STATION_COLUMNS:
+            op.drop_column('bike_trips', f'{prefix}_station_{column}')
+
+    op.execute(DETAILED_VIEW)
+    op.execute("ANALYZE stations")
+
+
+def downgrade() -> None:
+    op.execute("DROP VIEW IF EXISTS bike_trips_detailed")
+
+    for prefix in ('start', 'end'):
+        op.add_column('bike_trips', sa.Column(f'{prefix}_station_name', sa.String(255), nullable=True))
+        op.add_column('bike_trips', sa.Column(f'{prefix}_station_latitude', sa.Float(), nullable=True))
+        op.add_column('bike_trips', sa.Column(f'{prefix}_station_longitude', sa.Float(), nullable=True))
+        op.execute(f"""
+            UPDATE bike_trips t
+            SET {prefix}_station_name = s.name,
+                {prefix}_station_latitude = s.latitude,
+                {prefix}_station_longitude = s.longitude
+            FROM stations s
+            WHERE s.id = t.{prefix}_station_id
+        """)
+
+    op.drop_table('stations')
@@ -0,0 +1,45 @@
+"""Add the per-day station pair rollup
+
+station_pair_day_rollup holds the number of trips per start day and
+(start station, end station) pair. The ETL loader adds each loaded batch
+to it, so top stations and origin-destination flows over a window are
+read from a few rows per day instead of grouping bike_trips.
+
+The table is backfilled from the trips already loaded.
+
+Revision ID: 0006_station_pair_day_rollup
+Revises: 0005_stations_dimension
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0006_station_pair_day_rollup'
+down_revision = '0005_stations_dimension'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'station_pair_day_rollup',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('start_station_id', sa.Integer(), nullable=False, autoincrement=False),
+        sa.Column('end_station_id', sa.Integer(), nullable=False, autoincrement=False),
+        sa.Column('trip_count', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('day', 'start_station_id', 'end_station_id'),
+    )
+
+    op.execute("""
+        INSERT INTO station_pair_day_rollup (day, start_station_id, end_station_id, trip_count)
+        SELECT start_time::date, start_station_id, end_station_id, count(*)
+        FROM bike_trips
+        WHERE start_station_id IS NOT NULL AND end_station_id IS NOT NULL
+        GROUP BY 1, 2, 3
+    """)
+    op.execute("ANALYZE station_pair_day_rollup")
+
+
+def downgrade() -> None:
+    op.drop_table('station_pair_day_rollup')
@@ -0,0 +1,38 @@
+"""Add per-day t-digest sketches of trip durations
+
+trip_duration_sketches holds one t-digest of trip durations per start day
+and source file. The ETL loader merges every loaded batch into it, and
+the API merges the sketches of a day range to estimate duration
+percentiles without sorting bike_trips.
+
+Existing trips are not sketched here, since the digests are built in
+Python; backfill them with etl.load.rebuild_rollups().
+
+Revision ID: 0007_trip_duration_sketches
+Revises: 0006_station_pair_day_rollup
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0007_trip_duration_sketches'
+down_revision = '0006_station_pair_day_rollup'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'trip_duration_sketches',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('source', sa.String(255), nullable=False),
+        sa.Column('trip_count', sa.BigInteger(), nullable=False),
+        sa.Column('digest', sa.LargeBinary(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint('day', 'source'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('trip_duration_sketches')
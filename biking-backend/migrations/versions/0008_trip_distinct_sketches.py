@@ -0,0 +1,38 @@
+"""Add per-day HyperLogLog sketches of distinct bikes and stations
+
+trip_distinct_sketches holds one HyperLogLog per start day for each of
+bike_id, start_station_id and end_station_id. The ETL loader merges every
+loaded batch into them, and the API unions the sketches of a day range to
+estimate distinct bikes and stations without COUNT(DISTINCT) over
+bike_trips.
+
+Existing trips are not sketched here, since the sketches are built in
+Python; backfill them with etl.load.rebuild_rollups().
+
+Revision ID: 0008_trip_distinct_sketches
+Revises: 0007_trip_duration_sketches
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0008_trip_distinct_sketches'
+down_revision = '0007_trip_duration_sketches'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'trip_distinct_sketches',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('dimension', sa.String(32), nullable=False),
+        sa.Column('registers', sa.LargeBinary(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint('day', 'dimension'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('trip_distinct_sketches')
@@ -0,0 +1,45 @@
+"""Track when each station was last seen on a trip
+
+stations.last_seen holds the latest start_time of the trips its current
+name and coordinates came from. Upserts only replace them from trips at
+least as recent, so loading or reloading an older month no longer
+overwrites the values of a newer one.
+
+Existing stations are filled from the latest trip starting or ending at
+them.
+
+Revision ID: 0009_stations_last_seen
+Revises: 0008_trip_distinct_sketches
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0009_stations_last_seen'
+down_revision = '0008_trip_distinct_sketches'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('stations', sa.Column('last_seen', sa.DateTime(timezone=False), nullable=True))
+
+    op.execute("""
+        UPDATE stations
+        SET last_seen = seen.last_seen
+        FROM (
+            SELECT id, max(start_time) AS last_seen
+            FROM (
+                SELECT start_station_id AS id, start_time FROM bike_trips WHERE start_station_id IS NOT NULL
+                UNION ALL
+                SELECT end_station_id, start_time FROM bike_trips WHERE end_station_id IS NOT NULL
+            ) trips
+            GROUP BY id
+        ) seen
+        WHERE stations.id = seen.id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_column('stations', 'last_seen')
@@ -0,0 +1,15 @@
+import os
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), '..')
+
+# The API imports its modules top-level (import models) and the ETL as
+# app.models; both define the tables on db.Base, so tests importing both
+# sides share the one models module
+for path in (BACKEND_DIR, os.path.join(BACKEND_DIR, 'app')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import models  # noqa: E402
+
+sys.modules.setdefault('app.models', models)
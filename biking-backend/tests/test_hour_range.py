@@ -0,0 +1,116 @@
+"""
+Parity of the hour range computations with the original query's rule: a
+trip counts towards every hour bucket its [start, stop) range overlaps,
+over at most 24 buckets from its start hour.
+"""
+import asyncio
+from collections import Counter, namedtuple
+from datetime import datetime, timedelta
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import crud
+from etl.rollups import hour_bucket_counts
+
+HOUR = timedelta(hours=1)
+
+TRIPS = [
+    # zero-length
+    ("2019-01-01 08:15:00", "2019-01-01 08:15:00"),
+    # stop before start
+    ("2019-01-01 08:15:00", "2019-01-01 08:10:00"),
+    # within one hour
+    ("2019-01-01 08:10:00", "2019-01-01 08:40:00"),
+    # ending exactly on the hour
+    ("2019-01-01 08:10:00", "2019-01-01 09:00:00"),
+    # starting exactly on the hour
+    ("2019-01-01 09:00:00", "2019-01-01 09:30:00"),
+    # a microsecond past the hour
+    ("2019-01-01 07:59:59.500000", "2019-01-01 08:00:00.000001"),
+    # crossing midnight
+    ("2019-01-01 23:50:00", "2019-01-02 00:20:00"),
+    # exactly 24 hours from an hour start
+    ("2019-01-01 05:00:00", "2019-01-02 05:00:00"),
+    # over 24 hours
+    ("2019-01-01 10:30:00", "2019-01-03 12:00:00"),
+]
+
+
+def random_trips(n: int = 2000, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    base = datetime(2019, 1, 1)
+    trips = []
+    for _ in range(n):
+        start = base + timedelta(microseconds=int(rng.integers(0, 30 * 86400 * 10**6)))
+        stop = start + timedelta(microseconds=int(rng.integers(-10**8, 50 * 3600 * 10**6)))
+        trips.append((start, stop))
+    return trips
+
+
+def parse(trips):
+    return [(pd.Timestamp(start).to_pydatetime(), pd.Timestamp(stop).to_pydatetime()) for start, stop in trips]
+
+
+def reference_counts(trips) -> dict:
+    """Rides per hour of the day, checking each trip against 24 hour buckets"""
+    counts = Counter()
+    for start, stop in trips:
+        # tsrange: an empty [start, stop) overlaps nothing, and stop < start is rejected
+        if stop <= start:
+            continue
+        start_hour = start.replace(minute=0, second=0, microsecond=0)
+        for offset in range(24):
+            bucket = start_hour + offset * HOUR
+            if bucket < stop and start < bucket + HOUR:
+                counts[bucket.hour] += 1
+    return dict(counts)
+
+
+Row = namedtuple("Row", ["start_hour", "span_hours", "ride_count"])
+
+
+class GroupedTrips:
+    """Session answering the arithmetic engine's (start hour, span) grouping for fixed trips"""
+
+    def __init__(self, trips):
+        groups = Counter()
+        for start, stop in trips:
+            if stop > start:
+                start_hour = start.replace(minute=0, second=0, microsecond=0)
+                span = min(math.ceil((stop - start_hour) / HOUR), 24)
+                groups[(start.hour, span)] += 1
+        self.rows = [Row(hour, span, count) for (hour, span), count in groups.items()]
+
+    async def execute(self, stmt):
+        return self
+
+    def all(self):
+        return self.rows
+
+
+def by_hour(result: dict) -> dict:
+    return dict(zip(result["hour_bucket"], result["count"]))
+
+
+@pytest.mark.parametrize("trips", [parse(TRIPS), random_trips()], ids=["edge cases", "random"])
+def test_arithmetic_engine_matches_overlap_reference(trips):
+    result = asyncio.run(crud.get_trip_hourrange_stats_arithmetic(GroupedTrips(trips)))
+    assert by_hour(result) == reference_counts(trips)
+
+
+@pytest.mark.parametrize("trips", [parse(TRIPS), random_trips()], ids=["edge cases", "random"])
+def test_rollup_buckets_match_overlap_reference(trips):
+    df = pd.DataFrame(trips, columns=["start_time", "stop_time"])
+    counts = hour_bucket_counts(df)
+    assert counts.groupby(counts.index.hour).sum().to_dict() == reference_counts(trips)
+
+
+def test_edge_cases_cover_expected_hours():
+    # Two trips cover the whole day; the rest add to the hours they overlap
+    assert reference_counts(parse(TRIPS)) == {
+        **{hour: 2 for hour in range(24)},
+        0: 3, 7: 3, 8: 5, 9: 3, 23: 3,
+    }
@@ -0,0 +1,101 @@
+"""
+Planned shapes of the bike_trips queries the API depends on (the checks of
+benchmarks/explain_plans.py): each must use one of its indexes, never a
+sequential scan of bike_trips, and /top/{n} must not sort under its LIMIT.
+
+Runs against the PostgreSQL database in DATABASE_URL, which is migrated to
+head first. Fixture trips are inserted and analyzed in a transaction that
+is rolled back afterwards. Skipped when DATABASE_URL is not set.
+"""
+import os
+import sys
+import json
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from db import upgrade_database
+from etl.partitions import ensure_partitions
+from explain_plans import PLAN_CHECKS, PARTITION_INDEXES_SQL
+
+pytestmark = pytest.mark.skipif(not os.getenv("DATABASE_URL"), reason="DATABASE_URL is not set")
+
+FIXTURE_MONTHS = [date(2019, 1, 1), date(2019, 2, 1), date(2019, 3, 1)]
+FIXTURE_ROWS = 60000
+
+# Trips spread evenly over the fixture months, 20 per start and end station
+FIXTURE_SQL = """
+    INSERT INTO bike_trips (tripduration, start_time, stop_time, start_station_id, end_station_id,
+                            bike_id, user_type, gender)
+    SELECT 600, start_time, start_time + interval '10 minutes', 72 + i % 3000, 72 + (i * 7) % 3000,
+           i % 20000, 'Subscriber', i % 3
+    FROM (
+        SELECT i, timestamp '2019-01-01' + (i * interval '90 days') / :rows AS start_time
+        FROM generate_series(0, :rows - 1) AS i
+    ) AS trips
+"""
+
+INDEX_NODE_TYPES = {"Index Scan", "Index Only Scan", "Bitmap Index Scan"}
+
+
+def walk(plan):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from walk(child)
+
+
+@pytest.fixture(scope="module")
+def plans():
+    """JSON plan of each PLAN_CHECKS query over the analyzed fixture trips, and the partition index parents"""
+    url = os.environ["DATABASE_URL"]
+    upgrade_database(url)
+
+    engine = create_engine(url)
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            ensure_partitions(Session(bind=connection), FIXTURE_MONTHS)
+            connection.execute(text(FIXTURE_SQL), {"rows": FIXTURE_ROWS})
+            connection.execute(text("ANALYZE bike_trips"))
+
+            parent_indexes = dict(connection.execute(text(PARTITION_INDEXES_SQL)).all())
+            result = {}
+            for name, (query, _) in PLAN_CHECKS.items():
+                plan = connection.execute(text(f"EXPLAIN (FORMAT JSON) {query}")).scalar()
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                result[name] = plan[0]["Plan"]
+            yield result, parent_indexes
+        finally:
+            transaction.rollback()
+    engine.dispose()
+
+
+@pytest.mark.parametrize("name", list(PLAN_CHECKS))
+def test_query_uses_an_index(plans, name):
+    plan_by_name, parent_indexes = plans
+    nodes = list(walk(plan_by_name[name]))
+
+    seq_scans = [
+        node["Relation Name"] for node in nodes
+        if node["Node Type"] == "Seq Scan" and node.get("Relation Name", "").startswith("bike_trips")
+    ]
+    assert not seq_scans, f"sequential scan on {', '.join(seq_scans)}"
+
+    # Partition scans name the partition's index; map it to the bike_trips index it is attached to
+    used = {
+        parent_indexes.get(node["Index Name"], node["Index Name"])
+        for node in nodes if node["Node Type"] in INDEX_NODE_TYPES
+    }
+    assert used & PLAN_CHECKS[name][1], f"none of {sorted(PLAN_CHECKS[name][1])} used, only {sorted(used)}"
+
+
+@pytest.mark.parametrize("name", [name for name, (query, _) in PLAN_CHECKS.items() if "LIMIT" in query])
+def test_limit_is_not_fed_by_a_sort(plans, name):
+    plan = plans[0][name]
+    assert plan["Node Type"] == "Limit"
+    assert not [node for node in walk(plan) if node["Node Type"] in ("Sort", "Incremental Sort")]
@@ -0,0 +1,62 @@
+"""
+Filters of the snapshot engine (app/snapshot.py) over a snapshot written by
+etl/snapshot.py, compared with what the SQL filters of crud match.
+"""
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+import schemas
+from snapshot import TripSnapshot
+from etl.snapshot import write_snapshot_frames
+
+
+def epoch_us(values):
+    return pd.to_datetime(values, format="ISO8601").to_numpy(dtype="datetime64[us]").astype("int64")
+
+
+# Trips in SNAPSHOT_SQL's layout; -1 codes a missing station id or gender.
+# The filters and the last stop below fall within a millisecond of a start
+# time or an hour, which epoch milliseconds would not tell apart.
+TRIPS = pd.DataFrame({
+    "start_us": epoch_us(["2019-01-01 00:00:00", "2019-01-01 01:00:00", "2019-01-01 02:00:00"]),
+    "stop_us": epoch_us(["2019-01-01 00:10:00", "2019-01-01 01:10:00", "2019-01-01 03:00:00.000400"]),
+    "tripduration": [600, 600, 3600],
+    "start_station_id": [72, -1, 79],
+    "end_station_id": [79, 72, -1],
+    "user_type": ["Subscriber", "Customer", None],
+    "gender": [1, -1, 2],
+})
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    manifest = write_snapshot_frames([TRIPS], len(TRIPS), version=1, snapshot_dir=str(tmp_path))
+    return TripSnapshot(str(tmp_path / manifest["path"]), manifest)
+
+
+@pytest.mark.parametrize("filters, expected", [
+    (schemas.TripFilters(), 3),
+    (schemas.TripFilters(station_id=72), 2),
+    (schemas.TripFilters(station_id=79), 2),
+    (schemas.TripFilters(gender=2), 1),
+    (schemas.TripFilters(user_type="Customer"), 1),
+    (schemas.TripFilters(user_type="Dependent"), 0),
+    # station_id = -1 and gender = -1 match no row in SQL, NULLs included
+    (schemas.TripFilters(station_id=-1), 0),
+    (schemas.TripFilters(gender=-1), 0),
+    (schemas.TripFilters(station_id=72, gender=-1), 0),
+    (schemas.TripFilters(start=datetime(2019, 1, 1, 1, 0, 0, 400)), 1),
+    (schemas.TripFilters(end=datetime(2019, 1, 1, 2, 0, 0, 1)), 3),
+])
+def test_count_matches_sql_filters(snapshot, filters, expected):
+    assert snapshot.count(filters) == expected
+
+
+def test_hour_span_counts_resolve_microseconds(snapshot):
+    counts = snapshot.hour_span_counts()
+    # The third trip ends 400 microseconds into hour 3, so it covers hours 2 and 3
+    assert {(hour, span): int(counts[hour, span]) for hour, span in zip(*counts.nonzero())} == {
+        (0, 1): 1, (1, 1): 1, (2, 2): 1,
+    }
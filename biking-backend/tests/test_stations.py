@@ -0,0 +1,60 @@
+"""
+Station upserts of the ETL loader (etl/stations.py): the values of the
+latest trip win whatever order batches are loaded in. The upsert test runs
+against the PostgreSQL database in DATABASE_URL, migrated to head, in a
+transaction that is rolled back; it is skipped when DATABASE_URL is not set.
+"""
+import os
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from db import upgrade_database
+from etl.stations import station_frame, upsert_stations
+
+STATION_ID = 999001
+
+
+def trips(start_times, names):
+    return pd.DataFrame({
+        "start_time": pd.to_datetime(start_times),
+        "start_station_id": [STATION_ID] * len(names),
+        "start_station_name": names,
+        "end_station_id": [None] * len(names),
+    })
+
+
+def test_station_frame_keeps_the_latest_trip():
+    stations = station_frame(trips(["2019-06-01", "2019-03-01", "2019-05-01"], ["June", "March", "May"]))
+    assert stations[["id", "name", "last_seen"]].values.tolist() == [
+        [STATION_ID, "June", pd.Timestamp("2019-06-01")],
+    ]
+
+
+@pytest.mark.skipif(not os.getenv("DATABASE_URL"), reason="DATABASE_URL is not set")
+def test_older_batches_do_not_overwrite_a_station():
+    url = os.environ["DATABASE_URL"]
+    upgrade_database(url)
+
+    engine = create_engine(url)
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            db = Session(bind=connection)
+            seen = []
+            for start_time, name in [("2019-06-01", "June"), ("2019-03-01", "March"), ("2019-07-01", "July")]:
+                upsert_stations(db, trips([start_time], [name]))
+                seen.append(tuple(connection.execute(
+                    text("SELECT name, last_seen FROM stations WHERE id = :id"), {"id": STATION_ID}
+                ).one()))
+        finally:
+            transaction.rollback()
+    engine.dispose()
+
+    assert seen == [
+        ("June", pd.Timestamp("2019-06-01")),
+        ("June", pd.Timestamp("2019-06-01")),
+        ("July", pd.Timestamp("2019-07-01")),
+    ]